@@ -0,0 +1,183 @@
+# app/cache.py
+"""
+    кэши в памяти процесса: LRU с ограничением числа записей и временем жизни (TTL).
+    кэш у каждого воркера свой, запись другим воркером сбрасывает его только по истечении TTL
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional, Sequence
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+
+class TTLCache:
+    """
+    LRU + TTL. generation увеличивается при каждой инвалидации: значение, прочитанное из базы
+    до инвалидации, не записывается в кэш (set с устаревшим generation игнорируется)
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._data: OrderedDict = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.get(key)
+        if item is None or item[0] < time.monotonic():
+            if item is not None:
+                del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return item[1]
+
+    def set(self, key: Hashable, value: Any, generation: Optional[int] = None, ttl: Optional[float] = None):
+        if generation is not None and generation != self.generation:
+            return
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, keys: Iterable[Hashable]):
+        self.generation += 1
+        for key in keys:
+            if self._data.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        self.generation += 1
+        self.invalidations += len(self._data)
+        self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        requests = self.hits + self.misses
+        return {'size': len(self._data), 'maxsize': self.maxsize, 'ttl': self.ttl, 'hits': self.hits,
+                'misses': self.misses, 'hit_ratio': round(self.hits / requests, 4) if requests else None,
+                'evictions': self.evictions, 'invalidations': self.invalidations}
+
+
+class ResponseCache:
+    """
+    кэш ответов GET с stale-while-revalidate. запись хранит версии таблиц, из которых построен ответ:
+    после записи в таблицу (table_changed) ответ не отдается даже устаревшим.
+    в окне stale ответ отдается сразу, а одна фоновая задача на ключ пересчитывает его в своей сессии.
+    session_factory - сессии primary: в кэш не попадают ответы, прочитанные с реплики
+    """
+
+    def __init__(self, maxsize: int, stale_ttl: float):
+        self.stale_ttl = stale_ttl
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.refreshes = 0
+        self._cache = TTLCache(maxsize, 0)
+        self._refreshing: Dict[Hashable, asyncio.Task] = {}
+
+    async def get_or_compute(
+            self, key: Hashable, tables: Sequence[str], ttl: float,
+            compute: Callable[[AsyncSession], Awaitable[Any]], session: AsyncSession,
+            session_factory: async_sessionmaker
+    ) -> Any:
+        versions = get_versions(tables)
+        entry = self._cache.get(key)
+        now = time.monotonic()
+        if entry is not None and entry[0] == versions:
+            if now < entry[1]:
+                self.hits += 1
+                return entry[3]
+            if now < entry[2]:
+                self.hits += 1
+                self.stale_hits += 1
+                if key not in self._refreshing:
+                    task = asyncio.create_task(self.refresh(key, tables, ttl, compute, session_factory))
+                    self._refreshing[key] = task
+                    task.add_done_callback(lambda _: self._refreshing.pop(key, None))
+                return entry[3]
+        self.misses += 1
+        if session.info.get('replica'):
+            # реплика может еще не содержать записи, уже учтенные в versions - промах считается на primary
+            async with session_factory() as primary:
+                value = await compute(primary)
+        else:
+            value = await compute(session)
+        self.store(key, versions, ttl, value)
+        return value
+
+    async def refresh(self, key, tables, ttl, compute, session_factory: async_sessionmaker):
+        versions = get_versions(tables)
+        try:
+            async with session_factory() as session:
+                value = await compute(session)
+        except Exception:
+            self._cache.delete([key])
+            return
+        self.refreshes += 1
+        self.store(key, versions, ttl, value)
+
+    def store(self, key, versions: tuple, ttl: float, value: Any):
+        now = time.monotonic()
+        self._cache.set(key, (versions, now + ttl, now + ttl + self.stale_ttl, value), ttl=ttl + self.stale_ttl)
+
+    def stats(self) -> Dict[str, Any]:
+        requests = self.hits + self.misses
+        return {'size': self._cache.stats()['size'], 'maxsize': self._cache.maxsize, 'stale_ttl': self.stale_ttl,
+                'hits': self.hits, 'misses': self.misses,
+                'hit_ratio': round(self.hits / requests, 4) if requests else None, 'stale_hits': self.stale_hits,
+                'refreshes': self.refreshes, 'refreshing': len(self._refreshing), 'evictions': self._cache.evictions}
+
+
+_caches: Dict[str, Any] = {}
+# версии таблиц: увеличиваются при каждой записи, входят в проверку кэша ответов
+_versions: Dict[str, int] = {}
+
+
+def get_cache(name: str, maxsize: int, ttl: float) -> TTLCache:
+    """ именованный кэш процесса, создается при первом обращении """
+    cache = _caches.get(name)
+    if cache is None:
+        cache = _caches[name] = TTLCache(maxsize, ttl)
+    return cache
+
+
+def get_response_cache(name: str, maxsize: int, stale_ttl: float) -> ResponseCache:
+    """ именованный кэш ответов процесса, создается при первом обращении """
+    cache = _caches.get(name)
+    if cache is None:
+        cache = _caches[name] = ResponseCache(maxsize, stale_ttl)
+    return cache
+
+
+def get_versions(tables: Sequence[str]) -> tuple:
+    return tuple(_versions.get(table, 0) for table in tables)
+
+
+def table_changed(table: str, ids: Optional[Iterable[Hashable]] = None):
+    """
+    запись в таблицу: новая версия таблицы для кэша ответов и сброс кэша записей (ids None - всех)
+    """
+    _versions[table] = _versions.get(table, 0) + 1
+    invalidate(f'entity:{table}', ids)
+
+
+def invalidate(name: str, keys: Optional[Iterable[Hashable]] = None):
+    """ сброс ключей keys кэша name, None - всего кэша """
+    cache = _caches.get(name)
+    if cache is None:
+        return
+    if keys is None:
+        cache.clear()
+    else:
+        cache.delete(keys)
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: cache.stats() for name, cache in _caches.items()}
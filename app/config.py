@@ -2,7 +2,7 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from app.utils import get_path_to_root
 from pydantic import PostgresDsn
-from typing import Optional
+from typing import Dict, List, Optional
 
 
 class Settings(BaseSettings):
@@ -56,6 +56,95 @@ class Settings(BaseSettings):
     VERSION: str
     DEBUG: bool
     CORS_ALLOWED_ORIGINS: str
+    # POOL: пул соединений postgres. pre-ping - лишний запрос на каждое получение соединения,
+    # по умолчанию выключен, разорванные соединения отсекаются по POOL_RECYCLE (секунды)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = False
+    # REPLICAS: строки подключения реплик для GET маршрутов (JSON список), пусто - все читается с primary.
+    # реплика с отставанием больше MAX_LAG секунд пропускается, отставание проверяется раз в LAG_CHECK_INTERVAL.
+    # после своей записи клиент READ_YOUR_WRITES_SECONDS читает с primary
+    DB_REPLICA_URLS: List[str] = []
+    DB_REPLICA_MAX_LAG: float = 5.0
+    DB_REPLICA_LAG_CHECK_INTERVAL: float = 5.0
+    READ_YOUR_WRITES_SECONDS: float = 5.0
+    # STATEMENT CACHE: кэш скомпилированных запросов SQLAlchemy (query_cache_size движка)
+    # и prepared statements asyncpg на одно соединение
+    DB_QUERY_CACHE_SIZE: int = 1200
+    DB_PREPARED_STATEMENT_CACHE_SIZE: int = 500
+    # запросы, собранные репозиториями (Repository.get_statement), LRU
+    REPOSITORY_STATEMENT_CACHE_SIZE: int = 500
+    # FULL TEXT SEARCH по rawdata.body_html (конфигурация to_tsvector, задается при создании таблицы)
+    RAWDATA_FTS_CONFIG: str = 'simple'
+    # RAWDATA: размер части body_html в /rawdata/{id}/body, символов
+    RAWDATA_BODY_CHUNK_SIZE: int = 256 * 1024
+    # RAWDATA: хранение body_html сжатым zstd (нужен пакет zstandard). у сжатых записей body_html NULL:
+    # полнотекстовый поиск их находит (body_tsv из текста), поиск подстроки по body_html отключается
+    RAWDATA_COMPRESSION: bool = False
+    RAWDATA_ZSTD_LEVEL: int = 3
+    # размер словаря zstd, байт, и число последних записей для его обучения
+    RAWDATA_ZSTD_DICT_SIZE: int = 112640
+    RAWDATA_ZSTD_DICT_SAMPLES: int = 2000
+    # RAWDATA VERSIONS: история body_html по name_id - полные снимки и дельты к предыдущей версии
+    RAWDATA_VERSIONS_ENABLED: bool = True
+    # дельт подряд после снимка, следующая версия - снимок
+    RAWDATA_VERSION_MAX_CHAIN: int = 20
+    # версии старше (дней) удаляются компакцией, последняя версия хранится всегда. 0 - хранить все
+    RAWDATA_VERSION_RETENTION_DAYS: int = 0
+    # интервал фоновой компакции истории (секунды) и страниц за проход. 0 - только POST /rawdata/history/compact
+    RAWDATA_VERSION_COMPACT_INTERVAL: float = 3600.0
+    RAWDATA_VERSION_COMPACT_BATCH: int = 100
+    # BULK: размер порции многострочного INSERT (одна транзакция на порцию)
+    BULK_CHUNK_SIZE: int = 1000
+    BULK_MAX_CHUNK_SIZE: int = 5000
+    # BULK: максимум строк, которые может изменить/удалить один PATCH / DELETE по фильтру
+    BULK_MAX_ROWS: int = 10000
+    # ENTITY CACHE: кэш Service.get_by_id по (таблица, id), LRU + TTL в памяти процесса
+    ENTITY_CACHE_ENABLED: bool = True
+    ENTITY_CACHE_MAXSIZE: int = 10000
+    ENTITY_CACHE_TTL: float = 60.0
+    # RESPONSE CACHE: кэш ответов GET списков и поиска. TTL по маршрутам в секундах, 0 - без кэша.
+    # после TTL ответ еще STALE_TTL секунд отдается устаревшим, пока фоновая задача его пересчитывает
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_MAXSIZE: int = 1000
+    RESPONSE_CACHE_TTL: Dict[str, float] = {'get_all': 5.0, 'search': 30.0}
+    RESPONSE_CACHE_STALE_TTL: float = 30.0
+    # QUEUE: очередь обработки codes/names (POST /{prefix}/claim): аренда по умолчанию и максимум, секунды;
+    # сколько записей можно забрать за раз; как часто фоновая задача возвращает в очередь просроченные аренды
+    QUEUE_LEASE_SECONDS: float = 300.0
+    QUEUE_MAX_LEASE_SECONDS: float = 86400.0
+    QUEUE_MAX_CLAIM: int = 1000
+    QUEUE_REAPER_INTERVAL: float = 60.0
+    # CHANGES: записи моложе CHANGES_SAFETY_LAG секунд не отдаются (их транзакции могут быть не видны),
+    # удаленные записи (tombstones) хранятся TOMBSTONE_RETENTION_DAYS дней
+    CHANGES_SAFETY_LAG: float = 5.0
+    CHANGES_MAX_LIMIT: int = 1000
+    TOMBSTONE_RETENTION_DAYS: int = 30
+    TOMBSTONE_PURGE_INTERVAL: float = 3600.0
+    # EVENTS: лента изменений GET /events (LISTEN на воркер). EVENTS_QUEUE_SIZE - событий в очереди подписчика,
+    # при переполнении подписчик получает resync и отключается; EVENTS_KEEPALIVE - секунд между keepalive
+    EVENTS_ENABLED: bool = True
+    EVENTS_QUEUE_SIZE: int = 1000
+    EVENTS_KEEPALIVE: float = 15.0
+    # PARTITIONING: таблицы (rawdata, images), секционированные по месяцам created_at. действует при создании
+    # таблиц init_db, существующие таблицы не преобразуются. секции создаются на PARTITION_PREMAKE_MONTHS вперед,
+    # секции старше PARTITION_RETENTION_MONTHS[таблица] месяцев удаляются целиком (нет или 0 - хранятся всегда)
+    PARTITIONED_TABLES: List[str] = []
+    PARTITION_PREMAKE_MONTHS: int = 3
+    PARTITION_RETENTION_MONTHS: Dict[str, int] = {}
+    PARTITION_MAINTENANCE_INTERVAL: float = 21600.0
+    # ARCHIVE: тела записей старше ARCHIVE_AFTER_DAYS[таблица] дней (по content_changed_at) переносятся сжатыми
+    # в коллекцию Mongo ARCHIVE_COLLECTION, в postgres остается ссылка. поддерживается rawdata, нет или 0 - выключено
+    ARCHIVE_AFTER_DAYS: Dict[str, int] = {}
+    ARCHIVE_COLLECTION: str = 'rawdata_archive'
+    ARCHIVE_BATCH: int = 100
+    ARCHIVE_INTERVAL: float = 3600.0
+    # EXPORT: строк в одной порции server-side курсора
+    EXPORT_YIELD_PER: int = 1000
+    # IMPORT: записей в одной порции COPY при загрузке дампов каталога
+    IMPORT_BATCH_SIZE: int = 10000
     # PAGING
     PAGE_DEFAULT: int = 20
     PAGE_MIN: int = 0
@@ -0,0 +1,47 @@
+# app/databases/pool.py
+"""
+    пул соединений postgres с учетом ожидания соединения:
+    видно, уходит ли время запроса на ожидание свободного соединения или на сам запрос
+"""
+import time
+from typing import Any, Dict
+
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# границы гистограммы времени ожидания соединения, секунды
+WAIT_BUCKETS = (0.001, 0.01, 0.1, 1.0)
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool, который считает время ожидания соединения (checkout) и таймауты"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.wait_buckets = [0] * (len(WAIT_BUCKETS) + 1)
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except TimeoutError:
+            self.timeouts += 1
+            raise
+        wait = time.perf_counter() - start
+        self.checkouts += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+        self.wait_buckets[sum(wait > bound for bound in WAIT_BUCKETS)] += 1
+        return connection
+
+    def stats(self) -> Dict[str, Any]:
+        bounds = [f'<={bound}s' for bound in WAIT_BUCKETS] + [f'>{WAIT_BUCKETS[-1]}s']
+        return {'size': self.size(), 'checked_out': self.checkedout(), 'checked_in': self.checkedin(),
+                'overflow': max(self.overflow(), 0), 'max_overflow': self._max_overflow, 'timeout': self._timeout,
+                'checkouts': self.checkouts, 'timeouts': self.timeouts,
+                'wait_avg': round(self.wait_total / self.checkouts, 6) if self.checkouts else None,
+                'wait_max': round(self.wait_max, 6), 'wait_histogram': dict(zip(bounds, self.wait_buckets))}
@@ -9,12 +9,21 @@ from sqlalchemy.orm import declarative_base
 from app.config import settings
 from contextlib import asynccontextmanager
 from app.models.base import Base
+from app.databases.pool import InstrumentedPool
 
 
 # 1.1.    Асинхронный двигатель
 engine: AsyncEngine = create_async_engine(settings.database_url,
                                           echo=settings.DB_ECHO_LOG,
-                                          pool_pre_ping=True,)
+                                          poolclass=InstrumentedPool,
+                                          pool_size=settings.DB_POOL_SIZE,
+                                          max_overflow=settings.DB_MAX_OVERFLOW,
+                                          pool_timeout=settings.DB_POOL_TIMEOUT,
+                                          pool_recycle=settings.DB_POOL_RECYCLE,
+                                          pool_pre_ping=settings.DB_POOL_PRE_PING,
+                                          query_cache_size=settings.DB_QUERY_CACHE_SIZE,
+                                          connect_args={'prepared_statement_cache_size':
+                                                        settings.DB_PREPARED_STATEMENT_CACHE_SIZE})
 
 # 1.2. Фабрика асинхронных сессий
 AsyncSessionLocal = async_sessionmaker(
@@ -34,6 +43,12 @@ async def get_db():
             await session.close()
 
 
+# 1.4. Зависимость - фабрика сессий для потоковых ответов:
+# сессия открывается в генераторе ответа и закрывается после его отправки
+async def get_sessionmaker():
+    return AsyncSessionLocal
+
+
 # 2.1. строка для синхронного подключения postgresql
 sync_database_url = settings.database_url.replace("postgresql+asyncpg://", "postgresql://")
 
@@ -41,7 +56,8 @@ sync_database_url = settings.database_url.replace("postgresql+asyncpg://", "post
 engine_sync = create_engine(
     sync_database_url,
     echo=settings.DB_ECHO_LOG,
-    pool_pre_ping=True,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
 )
 
 # 2.3. Синхронная фабрика сессий
@@ -66,6 +82,11 @@ async def init_db():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
 
+    # секции секционированных таблиц должны существовать до первой вставки
+    if settings.PARTITIONED_TABLES:
+        from app.services.partition_service import maintain_partitions
+        print(f"Partitions: {await maintain_partitions(engine)}")
+
     print("✅ База данных инициализирована")
 
 
@@ -0,0 +1,124 @@
+# app/databases/replicas.py
+"""
+    чтение с реплик postgres: GET маршруты берут сессию через get_db_read.
+    реплики перебираются по кругу, реплика с отставанием больше DB_REPLICA_MAX_LAG или недоступная
+    пропускается, если подходящих нет - чтение с primary.
+    после своей записи клиент READ_YOUR_WRITES_SECONDS читает с primary (cookie от read_your_writes_middleware)
+"""
+import asyncio
+import itertools
+import time
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import Request
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.config import settings
+from app.databases.pool import InstrumentedPool
+from app.databases.postgres import AsyncSessionLocal
+
+# cookie с моментом (unix time), до которого клиент читает с primary
+READ_PRIMARY_COOKIE = 'read_primary_until'
+WRITE_METHODS = {'POST', 'PUT', 'PATCH', 'DELETE'}
+# недоступная реплика не должна задерживать запрос дольше этого времени, секунды
+LAG_CHECK_TIMEOUT = 1.0
+
+# отставание реплики в секундах: 0 если все полученные WAL применены
+LAG_SQL = text("""
+    SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                ELSE coalesce(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0) END
+""")
+
+
+class ReplicaSet:
+    """Реплики для чтения: round-robin с проверкой отставания"""
+
+    def __init__(self, urls: List[str]):
+        self.engines = [create_async_engine(url, echo=settings.DB_ECHO_LOG, poolclass=InstrumentedPool,
+                                            pool_size=settings.DB_POOL_SIZE, max_overflow=settings.DB_MAX_OVERFLOW,
+                                            pool_timeout=settings.DB_POOL_TIMEOUT,
+                                            pool_recycle=settings.DB_POOL_RECYCLE,
+                                            pool_pre_ping=settings.DB_POOL_PRE_PING,
+                                            query_cache_size=settings.DB_QUERY_CACHE_SIZE,
+                                            connect_args={'prepared_statement_cache_size':
+                                                          settings.DB_PREPARED_STATEMENT_CACHE_SIZE})
+                        for url in urls]
+        self.sessionmakers = [async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False,
+                                                 autoflush=False) for engine in self.engines]
+        self._next = itertools.count()
+        # номер реплики -> (время проверки, отставание или None если реплика недоступна)
+        self._lag: Dict[int, Tuple[float, Optional[float]]] = {}
+        self.reads = [0] * len(self.engines)
+        self.fallbacks = 0
+
+    async def get_lag(self, index: int) -> Optional[float]:
+        """ отставание реплики, проверяется не чаще DB_REPLICA_LAG_CHECK_INTERVAL """
+        checked_at, lag = self._lag.get(index, (0.0, None))
+        now = time.monotonic()
+        if now - checked_at < settings.DB_REPLICA_LAG_CHECK_INTERVAL:
+            return lag
+        try:
+            lag = await asyncio.wait_for(self.query_lag(index), LAG_CHECK_TIMEOUT)
+        except Exception:
+            lag = None
+        self._lag[index] = (now, lag)
+        return lag
+
+    async def query_lag(self, index: int) -> float:
+        async with self.engines[index].connect() as connection:
+            return float((await connection.execute(LAG_SQL)).scalar())
+
+    async def choose(self) -> Optional[async_sessionmaker]:
+        """ фабрика сессий очередной подходящей реплики, None - читать с primary """
+        if not self.engines:
+            return None
+        start = next(self._next)
+        for offset in range(len(self.engines)):
+            index = (start + offset) % len(self.engines)
+            lag = await self.get_lag(index)
+            if lag is not None and lag <= settings.DB_REPLICA_MAX_LAG:
+                self.reads[index] += 1
+                return self.sessionmakers[index]
+        self.fallbacks += 1
+        return None
+
+    def stats(self) -> List[dict]:
+        return [{'pool': engine.sync_engine.pool.stats(), 'lag': self._lag.get(index, (0.0, None))[1],
+                 'reads': self.reads[index]} for index, engine in enumerate(self.engines)]
+
+    async def dispose(self):
+        for engine in self.engines:
+            await engine.dispose()
+
+
+replicas = ReplicaSet(settings.DB_REPLICA_URLS)
+
+
+def reads_primary(request: Request) -> bool:
+    """ клиент недавно писал - читает с primary """
+    try:
+        return float(request.cookies.get(READ_PRIMARY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+# Зависимость для GET маршрутов: сессия реплики или primary
+async def get_db_read(request: Request):
+    factory = None if reads_primary(request) else await replicas.choose()
+    async with (factory or AsyncSessionLocal)() as session:
+        # записи, прочитанные с реплики, не попадают в кэш get_by_id (могут отставать от primary)
+        session.info['replica'] = factory is not None
+        try:
+            yield session
+        finally:
+            await session.close()
+
+
+async def read_your_writes_middleware(request: Request, call_next):
+    """ после успешной записи клиент READ_YOUR_WRITES_SECONDS читает с primary """
+    response = await call_next(request)
+    if replicas.engines and request.method in WRITE_METHODS and response.status_code < 400:
+        response.set_cookie(READ_PRIMARY_COOKIE, str(time.time() + settings.READ_YOUR_WRITES_SECONDS),
+                            max_age=int(settings.READ_YOUR_WRITES_SECONDS) + 1, httponly=True)
+    return response
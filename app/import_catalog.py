@@ -0,0 +1,31 @@
+# app/import_catalog.py
+"""
+    загрузка дампа каталога из командной строки:
+        python -m app.import_catalog codes codes.csv
+        python -m app.import_catalog names names.ndjson
+"""
+import argparse
+import asyncio
+import json
+
+from app.databases.postgres import AsyncSessionLocal, engine
+from app.services.import_service import CATALOGS, ImportService
+
+
+async def main(table: str, path: str, fmt: str):
+    async with AsyncSessionLocal() as session:
+        with open(path, 'rb') as file:
+            report = await ImportService.import_file(table, file, fmt, session)
+    await engine.dispose()
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='COPY-загрузка дампа каталога')
+    parser.add_argument('table', choices=list(CATALOGS))
+    parser.add_argument('path')
+    parser.add_argument('--format', choices=['csv', 'ndjson'], default=None,
+                        help='по умолчанию - по расширению файла')
+    args = parser.parse_args()
+    fmt = args.format or ('ndjson' if args.path.endswith(('.ndjson', '.jsonl')) else 'csv')
+    asyncio.run(main(args.table, args.path, fmt))
@@ -1,12 +1,26 @@
 # app/main.py
+import asyncio
+
 from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.routers import CodeRouter, NameRouter, RawdataRouter, ImageRouter
-from app.databases.postgres import init_db, get_db, engine
+from app.config import settings
+from app.databases.postgres import init_db, get_db, engine, AsyncSessionLocal
 from app.databases.mongo import get_mongodb
 from app.routers.mongo_file_router import mongo_file_router
 from app.routers.cascade_file_router import cascade_file_router
+from app.routers.import_router import import_router
+from app.routers.metrics_router import metrics_router
+from app.routers.events_router import events_router
+from app.databases.replicas import read_your_writes_middleware, replicas
+from app.services.archive_service import run_archiver
+from app.services.changes_service import run_tombstone_purge
+from app.services.compression_service import CompressionService
+from app.services.events_service import change_feed
+from app.services.partition_service import run_partition_maintenance
+from app.services.queue_service import run_reaper
+from app.services.version_service import run_compaction
 
 
 app = FastAPI()
@@ -18,6 +32,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+if replicas.engines:
+    app.middleware("http")(read_your_writes_middleware)
 
 
 # Инициализация роутеров
@@ -33,13 +49,42 @@ app.include_router(rawdata_router.router)
 app.include_router(image_router.router)
 app.include_router(mongo_file_router)
 app.include_router(cascade_file_router)
+app.include_router(import_router)
+app.include_router(metrics_router)
+app.include_router(events_router)
 
 
 @app.on_event("startup")
 async def startup_event():
     """Создание таблиц при запуске приложения"""
     print("🚀 Запуск приложения...")
+    # без zstandard сжатие молча не выполнялось бы, а сжатые ранее записи не читались бы
+    if settings.RAWDATA_COMPRESSION and not CompressionService.is_available():
+        raise RuntimeError("RAWDATA_COMPRESSION requires the zstandard package (pip install zstandard)")
     await init_db()
+    # возврат в очередь записей с истекшей арендой
+    app.state.queue_reaper = asyncio.create_task(run_reaper(AsyncSessionLocal, settings.QUEUE_REAPER_INTERVAL))
+    # компакция истории rawdata
+    if settings.RAWDATA_VERSION_COMPACT_INTERVAL > 0:
+        app.state.history_compaction = asyncio.create_task(
+            run_compaction(AsyncSessionLocal, settings.RAWDATA_VERSION_COMPACT_INTERVAL)
+        )
+    # LISTEN ленты изменений GET /events
+    if settings.EVENTS_ENABLED:
+        app.state.change_feed = asyncio.create_task(change_feed.listen(engine, settings.EVENTS_KEEPALIVE))
+    # секции на месяцы вперед и удаление устаревших секций
+    if settings.PARTITIONED_TABLES and settings.PARTITION_MAINTENANCE_INTERVAL > 0:
+        app.state.partition_maintenance = asyncio.create_task(
+            run_partition_maintenance(engine, settings.PARTITION_MAINTENANCE_INTERVAL)
+        )
+    # перенос старых тел rawdata в холодный архив
+    if settings.ARCHIVE_AFTER_DAYS.get('rawdata', 0) > 0 and settings.ARCHIVE_INTERVAL > 0:
+        app.state.rawdata_archiver = asyncio.create_task(run_archiver(AsyncSessionLocal, settings.ARCHIVE_INTERVAL))
+    # удаление устаревших tombstones
+    if settings.TOMBSTONE_PURGE_INTERVAL > 0:
+        app.state.tombstone_purge = asyncio.create_task(
+            run_tombstone_purge(AsyncSessionLocal, settings.TOMBSTONE_PURGE_INTERVAL)
+        )
 
 
 @app.get("/")
@@ -67,6 +112,11 @@ async def health_check(db: AsyncSession = Depends(get_db)):
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    for name in ('queue_reaper', 'history_compaction', 'tombstone_purge', 'change_feed', 'partition_maintenance',
+                 'rawdata_archiver'):
+        if getattr(app.state, name, None):
+            getattr(app.state, name).cancel()
     mongodb_instance = await get_mongodb()
     await mongodb_instance.disconnect()
     await engine.dispose()
+    await replicas.dispose()
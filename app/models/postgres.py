@@ -1,67 +1,413 @@
 # app/models/postgres.py
 # app/models/postgres.py
-from sqlalchemy import String, Integer, Text, ForeignKey, DateTime
-from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
+from sqlalchemy import (BigInteger, DDL, String, Integer, LargeBinary, Text, ForeignKey, DateTime, Index,
+                        UniqueConstraint, event, text)
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import Mapped, declared_attr, mapped_column, relationship
+from sqlalchemy.schema import CreateIndex
 from sqlalchemy.sql import func
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Sequence
+from app.config import settings
+from app.models.base import Base
 
+# ограничение длины текста для to_tsvector (tsvector не может быть больше 1MB)
+FTS_MAX_TEXT_LENGTH = 500000
 
-class Base(DeclarativeBase):
-    pass
+
+def trgm_index(table: str, column: str) -> Index:
+    """ GIN триграммный индекс (pg_trgm) для поиска подстроки ILIKE '%...%' и по похожести """
+    return Index(f'ix_{table}_{column}_trgm', column, postgresql_using='gin',
+                 postgresql_ops={column: 'gin_trgm_ops'})
+
+
+def html_to_text_sql(column: str) -> str:
+    """ SQL выражение: текст html без тегов, содержимое script/style вырезается целиком """
+    return (f"regexp_replace(regexp_replace(coalesce({column}, ''), "
+            f"'<(script|style)[^>]*?>.*?</\\1>', ' ', 'gi'), '<[^>]+>', ' ', 'g')")
+
+
+def queue_indexes(table: str) -> tuple:
+    """
+    частичные индексы очереди (status pending -> in_progress): выборка ожидающих записей
+    и поиск просроченных аренд читают только свои строки при любом размере таблицы
+    """
+    return (Index(f'ix_{table}_pending', 'id', postgresql_where=text("status = 'pending'")),
+            Index(f'ix_{table}_lease', 'lease_expires_at', postgresql_where=text("status = 'in_progress'")))
+
+
+def changes_index(table: str) -> Index:
+    """ индекс keyset-порядка (updated_at, id) для GET /{prefix}/changes и order_by=updated_at """
+    return Index(f'ix_{table}_updated', 'updated_at', 'id')
+
+
+def upgrade_table(table: str, columns: Sequence[tuple] = (), indexes: Sequence[str] = ()):
+    """
+    колонки и индексы, добавленные в модель после создания таблицы: create_all существующие таблицы
+    не изменяет. columns - (имя, определение, SQL заполнения существующих строк или None), заполнение
+    выполняется один раз - вместе с добавлением колонки. для новых таблиц ничего не делает
+    """
+    for name, definition, backfill in columns:
+        if backfill is None:
+            ddl = DDL(f'ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {name} {definition}')
+        else:
+            ddl = DDL(f"""
+                DO $$ BEGIN
+                    IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_schema = current_schema()
+                                   AND table_name = '{table}' AND column_name = '{name}') THEN
+                        ALTER TABLE {table} ADD COLUMN {name} {definition};
+                        {backfill};
+                    END IF;
+                END $$
+            """)
+        event.listen(Base.metadata, 'after_create', ddl.execute_if(dialect='postgresql'))
+    for index in Base.metadata.tables[table].indexes:
+        if index.name in indexes:
+            event.listen(Base.metadata, 'after_create',
+                         CreateIndex(index, if_not_exists=True).execute_if(dialect='postgresql'))
+
+
+def is_partitioned(table: str) -> bool:
+    return table in settings.PARTITIONED_TABLES
+
+
+def partition_args(table: str) -> dict:
+    """
+    параметры секционированной по месяцам created_at таблицы. первичный ключ такой таблицы - (id, created_at),
+    для ORM ключом остается id (PartitionedMixin)
+    """
+    return {'postgresql_partition_by': 'RANGE (created_at)'} if is_partitioned(table) else {}
+
+
+class PartitionedMixin:
+    """id - ключ ORM и в секционированной таблице, где первичный ключ (id, created_at)"""
+
+    @declared_attr.directive
+    def __mapper_args__(cls):
+        return {'primary_key': [cls.__table__.c.id]}
+
+
+# расширение для триграммных индексов должно существовать до создания таблиц
+event.listen(Base.metadata, 'before_create',
+             DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql'))
+
+# таблицы, удаления из которых записываются в tombstones (в том числе каскадные)
+TOMBSTONE_TABLES = ('codes', 'names', 'rawdata', 'images')
+# триггеры создаются при каждом create_all - и для таблиц, созданных раньше
+event.listen(Base.metadata, 'after_create', DDL("""
+    CREATE OR REPLACE FUNCTION record_tombstones() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO tombstones (table_name, row_id) SELECT TG_TABLE_NAME, id FROM old_rows;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql
+""").execute_if(dialect='postgresql'))
+for _table in TOMBSTONE_TABLES:
+    event.listen(Base.metadata, 'after_create',
+                 DDL(f'DROP TRIGGER IF EXISTS {_table}_tombstones ON {_table}').execute_if(dialect='postgresql'))
+    event.listen(Base.metadata, 'after_create',
+                 DDL(f'CREATE TRIGGER {_table}_tombstones AFTER DELETE ON {_table} REFERENCING OLD TABLE AS old_rows '
+                     f'FOR EACH STATEMENT EXECUTE FUNCTION record_tombstones()').execute_if(dialect='postgresql'))
+    # индекс changes_index для таблиц, созданных до его появления: create_all не добавляет индексы в существующие
+    event.listen(Base.metadata, 'after_create',
+                 DDL(f'CREATE INDEX IF NOT EXISTS ix_{_table}_updated ON {_table} (updated_at, id)')
+                 .execute_if(dialect='postgresql'))
+
+# лента изменений (GET /events): канал NOTIFY, таблицы -> колонка статуса, id записей в одном уведомлении
+# (payload NOTIFY ограничен 8000 байт)
+CHANGES_CHANNEL = 'table_changes'
+NOTIFY_TABLES = {'codes': 'status', 'names': 'status', 'rawdata': None, 'images': None}
+NOTIFY_CHUNK = 500
+
+
+def notify_function(name: str, status: Optional[str]) -> DDL:
+    """
+    функция statement-триггера: pg_notify с id измененных записей порциями по NOTIFY_CHUNK,
+    сгруппированными по статусу. уведомления доставляются после фиксации транзакции
+    """
+    def batches(rows: str) -> str:
+        return (f"SELECT status, array_agg(id ORDER BY id) AS ids FROM "
+                f"(SELECT id, {status or 'NULL::text'} AS status, (row_number() OVER () - 1) / {NOTIFY_CHUNK} AS chunk "
+                f"FROM {rows}) r GROUP BY status, chunk")
+
+    notify = (f"PERFORM pg_notify('{CHANGES_CHANNEL}', json_build_object('table', TG_TABLE_NAME, 'op', lower(TG_OP), "
+              f"'status', batch.status, 'ids', batch.ids)::text);")
+    return DDL(f"""
+        CREATE OR REPLACE FUNCTION {name}() RETURNS trigger AS $$
+        DECLARE
+            batch record;
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                FOR batch IN {batches('old_rows')} LOOP
+                    {notify}
+                END LOOP;
+            ELSE
+                FOR batch IN {batches('new_rows')} LOOP
+                    {notify}
+                END LOOP;
+            END IF;
+            RETURN NULL;
+        END $$ LANGUAGE plpgsql
+    """)
+
+
+for _function, _status in (('notify_changes', None), ('notify_status_changes', 'status')):
+    event.listen(Base.metadata, 'after_create', notify_function(_function, _status).execute_if(dialect='postgresql'))
+for _table, _status in NOTIFY_TABLES.items():
+    # триггер с transition table - только на одно событие
+    for _op, _rows in (('insert', 'NEW'), ('update', 'NEW'), ('delete', 'OLD')):
+        event.listen(Base.metadata, 'after_create',
+                     DDL(f'DROP TRIGGER IF EXISTS {_table}_notify_{_op} ON {_table}').execute_if(dialect='postgresql'))
+        event.listen(Base.metadata, 'after_create',
+                     DDL(f'CREATE TRIGGER {_table}_notify_{_op} AFTER {_op.upper()} ON {_table} '
+                         f'REFERENCING {_rows} TABLE AS {_rows.lower()}_rows FOR EACH STATEMENT '
+                         f'EXECUTE FUNCTION {"notify_status_changes" if _status else "notify_changes"}()')
+                     .execute_if(dialect='postgresql'))
+
+# уникальность rawdata.name_id в секционированной таблице: проверка под advisory-блокировкой name_id
+# (ее же берет RawRepository.lock_names), ошибка - как у уникального индекса
+if is_partitioned('rawdata'):
+    event.listen(Base.metadata, 'after_create', DDL("""
+        CREATE OR REPLACE FUNCTION rawdata_unique_name() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_advisory_xact_lock(hashtext('rawdata'), NEW.name_id);
+            IF EXISTS (SELECT 1 FROM rawdata WHERE name_id = NEW.name_id AND id <> NEW.id) THEN
+                RAISE EXCEPTION USING ERRCODE = 'unique_violation',
+                    MESSAGE = 'duplicate key value violates unique constraint "rawdata_name_id_key"',
+                    DETAIL = format('Key (name_id)=(%%s) already exists.', NEW.name_id);
+            END IF;
+            RETURN NEW;
+        END $$ LANGUAGE plpgsql
+    """).execute_if(dialect='postgresql'))
+    event.listen(Base.metadata, 'after_create',
+                 DDL('DROP TRIGGER IF EXISTS rawdata_unique_name ON rawdata').execute_if(dialect='postgresql'))
+    event.listen(Base.metadata, 'after_create',
+                 DDL('CREATE TRIGGER rawdata_unique_name BEFORE INSERT OR UPDATE OF name_id ON rawdata '
+                     'FOR EACH ROW EXECUTE FUNCTION rawdata_unique_name()').execute_if(dialect='postgresql'))
+
+# tsvector полнотекстового поиска rawdata. body_tsv - обычная колонка, а не вычисляемая: у сжатых (body_zstd)
+# и архивных записей body_html NULL, их tsvector считается из текста приложением той же функцией
+event.listen(Base.metadata, 'after_create', DDL(f"""
+    CREATE OR REPLACE FUNCTION rawdata_tsvector(body text) RETURNS tsvector AS $$
+        SELECT to_tsvector('{settings.RAWDATA_FTS_CONFIG}'::regconfig,
+                           left({html_to_text_sql('body')}, {FTS_MAX_TEXT_LENGTH}))
+    $$ LANGUAGE sql IMMUTABLE
+""").execute_if(dialect='postgresql'))
+event.listen(Base.metadata, 'after_create', DDL("""
+    CREATE OR REPLACE FUNCTION rawdata_body_tsv() RETURNS trigger AS $$
+    BEGIN
+        IF NEW.body_html IS NULL THEN
+            IF NEW.body_zstd IS NULL AND NEW.archive_ref IS NULL THEN
+                NEW.body_tsv := NULL;
+            END IF;
+        ELSIF TG_OP = 'INSERT' THEN
+            NEW.body_tsv := rawdata_tsvector(NEW.body_html);
+        ELSIF NEW.body_html IS DISTINCT FROM OLD.body_html THEN
+            NEW.body_tsv := rawdata_tsvector(NEW.body_html);
+        END IF;
+        RETURN NEW;
+    END $$ LANGUAGE plpgsql
+""").execute_if(dialect='postgresql'))
+event.listen(Base.metadata, 'after_create',
+             DDL('DROP TRIGGER IF EXISTS rawdata_body_tsv ON rawdata').execute_if(dialect='postgresql'))
+event.listen(Base.metadata, 'after_create',
+             DDL('CREATE TRIGGER rawdata_body_tsv BEFORE INSERT OR UPDATE ON rawdata '
+                 'FOR EACH ROW EXECUTE FUNCTION rawdata_body_tsv()').execute_if(dialect='postgresql'))
+
+# документы холодного архива, на которые перестала ссылаться запись rawdata (новое содержимое, удаление),
+# записываются в archive_orphans - архиватор удаляет их из Mongo
+event.listen(Base.metadata, 'after_create', DDL("""
+    CREATE OR REPLACE FUNCTION record_archive_orphans() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            INSERT INTO archive_orphans (archive_ref) SELECT archive_ref FROM old_rows WHERE archive_ref IS NOT NULL;
+        ELSE
+            INSERT INTO archive_orphans (archive_ref)
+            SELECT o.archive_ref FROM old_rows o JOIN new_rows n ON n.id = o.id
+            WHERE o.archive_ref IS NOT NULL AND n.archive_ref IS DISTINCT FROM o.archive_ref;
+        END IF;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql
+""").execute_if(dialect='postgresql'))
+for _op, _rows in (('update', 'OLD TABLE AS old_rows NEW TABLE AS new_rows'), ('delete', 'OLD TABLE AS old_rows')):
+    event.listen(Base.metadata, 'after_create', DDL(f'DROP TRIGGER IF EXISTS rawdata_archive_orphans_{_op} ON rawdata')
+                 .execute_if(dialect='postgresql'))
+    event.listen(Base.metadata, 'after_create',
+                 DDL(f'CREATE TRIGGER rawdata_archive_orphans_{_op} AFTER {_op.upper()} ON rawdata '
+                     f'REFERENCING {_rows} FOR EACH STATEMENT EXECUTE FUNCTION record_archive_orphans()')
+                 .execute_if(dialect='postgresql'))
 
 
 class Code(Base):
     __tablename__ = "codes"
+    __table_args__ = (trgm_index('codes', 'code'), trgm_index('codes', 'url'), *queue_indexes('codes'),
+                      changes_index('codes'))
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     code: Mapped[str] = mapped_column(String(255), unique=True, index=True)
     url: Mapped[str] = mapped_column(String(255), unique=True, index=True)
     status: Mapped[str] = mapped_column(String(50))
+    # срок аренды записи обработчиком (status in_progress), см. POST /{prefix}/claim
+    lease_expires_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    # токен аренды: complete / fail принимаются только от обработчика, получившего запись в этой аренде.
+    # не загружается (в ответах только /claim)
+    lease_token: Mapped[Optional[str]] = mapped_column(String(36), nullable=True, deferred=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=func.now())
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
 
     # Relationships
-    names: Mapped[List["Name"]] = relationship("Name", back_populates="code", cascade="all, delete-orphan")
+    names: Mapped[List["Name"]] = relationship("Name", back_populates="code", cascade="all, delete-orphan",
+                                               passive_deletes=True)
 
 
 class Name(Base):
     __tablename__ = "names"
+    __table_args__ = (trgm_index('names', 'name'), trgm_index('names', 'url'), *queue_indexes('names'),
+                      changes_index('names'))
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     code_id: Mapped[int] = mapped_column(ForeignKey("codes.id", ondelete="CASCADE"))
     name: Mapped[str] = mapped_column(String(255), unique=True, index=True)
     url: Mapped[str] = mapped_column(String(255), unique=True, index=True)
     status: Mapped[str] = mapped_column(String(50))
+    # срок аренды записи обработчиком (status in_progress), см. POST /{prefix}/claim
+    lease_expires_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    # токен аренды: complete / fail принимаются только от обработчика, получившего запись в этой аренде.
+    # не загружается (в ответах только /claim)
+    lease_token: Mapped[Optional[str]] = mapped_column(String(36), nullable=True, deferred=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=func.now())
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
 
-    # Relationships с каскадным удалением
+    # Relationships с каскадным удалением: дочерние записи удаляет postgres (ON DELETE CASCADE),
+    # ORM их не загружает (passive_deletes)
     code: Mapped["Code"] = relationship("Code", back_populates="names")
-    raw_data: Mapped[Optional["Rawdata"]] = relationship("Rawdata", back_populates="name", cascade="all, delete-orphan", uselist=False)
-    images: Mapped[List["Image"]] = relationship("Image", back_populates="name", cascade="all, delete-orphan")
+    raw_data: Mapped[Optional["Rawdata"]] = relationship("Rawdata", back_populates="name", cascade="all, delete-orphan",
+                                                         uselist=False, passive_deletes=True)
+    images: Mapped[List["Image"]] = relationship("Image", back_populates="name", cascade="all, delete-orphan",
+                                                 passive_deletes=True)
 
 
-class Rawdata(Base):
+class Rawdata(PartitionedMixin, Base):
     __tablename__ = "rawdata"
+    __table_args__ = (Index('ix_rawdata_body_tsv', 'body_tsv', postgresql_using='gin'),
+                      Index('ix_rawdata_content_changed', 'content_changed_at', 'id'), changes_index('rawdata'),
+                      partition_args('rawdata'))
 
-    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
-    name_id: Mapped[int] = mapped_column(ForeignKey("names.id", ondelete="CASCADE"), unique=True)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True, autoincrement=True)
+    # в секционированной таблице уникальный индекс без created_at невозможен - уникальность держит триггер
+    name_id: Mapped[int] = mapped_column(ForeignKey("names.id", ondelete="CASCADE"),
+                                         unique=not is_partitioned('rawdata'), index=is_partitioned('rawdata'))
     body_html: Mapped[Optional[str]] = mapped_column(Text)
-    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=func.now())
+    # rawdata_tsvector(body_html): для body_html заполняет триггер rawdata_body_tsv, для сжатого тела - приложение
+    # (RawService.prepare_write). при сжатии и переносе в архив сохраняется. в обычных запросах не загружается
+    body_tsv: Mapped[Optional[str]] = mapped_column(TSVECTOR, deferred=True)
+    # сжатый zstd body_html (RAWDATA_COMPRESSION), у таких записей body_html NULL. распаковывается приложением
+    body_zstd: Mapped[Optional[bytes]] = mapped_column(LargeBinary, deferred=True)
+    # словарь, с которым сжат body_zstd, NULL - без словаря
+    body_dict_id: Mapped[Optional[int]] = mapped_column(ForeignKey("compression_dicts.id"))
+    # sha256 body_html: запись того же содержимого не обновляет строку
+    body_hash: Mapped[Optional[str]] = mapped_column(String(64))
+    # время последнего изменения содержимого body_html (в отличие от updated_at)
+    content_changed_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    # тело перенесено в холодный архив (ArchiveService): body_html и body_zstd NULL, archive_ref - ключ документа
+    archived_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+    archive_ref: Mapped[Optional[str]] = mapped_column(String(64))
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=func.now(),
+                                                 primary_key=is_partitioned('rawdata'))
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
 
     name: Mapped["Name"] = relationship("Name", back_populates="raw_data")
 
 
-class Image(Base):
+class RawdataVersion(Base):
+    """
+    история body_html страницы (name_id): chain 0 - полный текст, иначе дельта к предыдущей версии
+    (chain - номер дельты после снимка). data сжат zlib
+    """
+    __tablename__ = "rawdata_versions"
+    __table_args__ = (UniqueConstraint('name_id', 'version'),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name_id: Mapped[int] = mapped_column(ForeignKey("names.id", ondelete="CASCADE"))
+    version: Mapped[int] = mapped_column(Integer)
+    chain: Mapped[int] = mapped_column(Integer)
+    data: Mapped[bytes] = mapped_column(LargeBinary)
+    # длина текста версии, символов
+    size: Mapped[int] = mapped_column(Integer)
+    body_hash: Mapped[Optional[str]] = mapped_column(String(64))
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=func.now())
+
+
+class Tombstone(Base):
+    """удаленные записи для GET /{prefix}/changes, заполняется триггерами AFTER DELETE (TOMBSTONE_TABLES)"""
+    __tablename__ = "tombstones"
+    __table_args__ = (Index('ix_tombstones_table_deleted', 'table_name', 'deleted_at', 'id'),)
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    table_name: Mapped[str] = mapped_column(String(63))
+    row_id: Mapped[int] = mapped_column(Integer)
+    deleted_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+
+class ArchiveOrphan(Base):
+    """ключи документов холодного архива без ссылок из rawdata, заполняется триггерами rawdata_archive_orphans"""
+    __tablename__ = "archive_orphans"
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    archive_ref: Mapped[str] = mapped_column(String(64))
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+
+class CompressionDict(Base):
+    """словари zstd, обученные на body_html. словарь не изменяется и не удаляется, пока им сжаты записи"""
+    __tablename__ = "compression_dicts"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    data: Mapped[bytes] = mapped_column(LargeBinary)
+    samples: Mapped[int] = mapped_column(Integer)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=func.now())
+
+
+class Image(PartitionedMixin, Base):
     __tablename__ = "images"
+    __table_args__ = (trgm_index('images', 'file_id'), trgm_index('images', 'file_url'), changes_index('images'),
+                      partition_args('images'))
 
-    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True, autoincrement=True)
     name_id: Mapped[int] = mapped_column(ForeignKey("names.id", ondelete="CASCADE"))
     file_id: Mapped[Optional[str]] = mapped_column(String(255), index=True)
     file_url: Mapped[Optional[str]] = mapped_column(String(255), index=True)
-    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=func.now())
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=func.now(),
+                                                 primary_key=is_partitioned('images'))
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
 
-    name: Mapped["Name"] = relationship("Name", back_populates="images")
\ No newline at end of file
+    name: Mapped["Name"] = relationship("Name", back_populates="images")
+
+
+# колонки и индексы таблиц, созданных до их появления в моделях (init_db вызывает create_all при каждом запуске)
+for _table in ('codes', 'names'):
+    upgrade_table(_table, [('lease_expires_at', 'timestamptz', None), ('lease_token', 'varchar(36)', None)],
+                  [f'ix_{_table}_pending', f'ix_{_table}_lease'])
+# колонки rawdata добавляются до заполнения: триггеры rawdata при UPDATE заполнения обращаются к ним
+upgrade_table('rawdata', [('archived_at', 'timestamptz', None), ('archive_ref', 'varchar(64)', None)])
+upgrade_table('rawdata', [('body_zstd', 'bytea', None),
+                          ('body_dict_id', 'integer REFERENCES compression_dicts (id)', None),
+                          ('body_tsv', 'tsvector', 'UPDATE rawdata SET body_tsv = rawdata_tsvector(body_html) '
+                                                   'WHERE body_html IS NOT NULL')],
+              ['ix_rawdata_body_tsv'])
+# хеш содержимого как у content_hash (sha256 utf-8 текста, hex), время изменения содержимого - последнее изменение
+upgrade_table('rawdata', [('body_hash', 'varchar(64)',
+                           "UPDATE rawdata SET body_hash = encode(sha256(convert_to(body_html, 'UTF8')), 'hex') "
+                           "WHERE body_html IS NOT NULL"),
+                          ('content_changed_at', 'timestamptz NOT NULL DEFAULT now()',
+                           'UPDATE rawdata SET content_changed_at = updated_at')],
+              ['ix_rawdata_content_changed'])
+# body_tsv была вычисляемой колонкой to_tsvector(body_html): теперь ее заполняют триггер и приложение
+event.listen(Base.metadata, 'after_create', DDL("""
+    DO $$ BEGIN
+        IF EXISTS (SELECT 1 FROM information_schema.columns WHERE table_schema = current_schema()
+                   AND table_name = 'rawdata' AND column_name = 'body_tsv' AND is_generated = 'ALWAYS') THEN
+            ALTER TABLE rawdata ALTER COLUMN body_tsv DROP EXPRESSION;
+            UPDATE rawdata SET body_tsv = rawdata_tsvector(body_html) WHERE body_html IS NOT NULL;
+        END IF;
+    END $$
+""").execute_if(dialect='postgresql'))
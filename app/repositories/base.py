@@ -1,14 +1,35 @@
 # app/repositories/base.py
 from abc import ABCMeta
-from typing import Any, Dict, Optional, Type, Union, TypeVar
-from sqlalchemy.orm import DeclarativeMeta
-from sqlalchemy import and_, func, select
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Any, Callable, Dict, List, Optional, Sequence, Type, Union, TypeVar
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy.orm import DeclarativeMeta, joinedload, load_only, selectinload, undefer
+from sqlalchemy import (Interval, String, UniqueConstraint, and_, bindparam, case, cast, delete, exists, func, literal,
+                        or_, select, tuple_, union_all, update)
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
 from app.service_registry import register_repo
 
 ModelType = TypeVar("ModelType", bound=DeclarativeMeta)
 
+# максимальное число параметров в одном запросе postgres
+MAX_BIND_PARAMS = 32767
+# диалекты с поддержкой INSERT ... ON CONFLICT ... RETURNING
+DIALECT_INSERTS = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+# статусы записей очереди обработки (claim / complete / fail)
+STATUS_PENDING = 'pending'
+STATUS_IN_PROGRESS = 'in_progress'
+STATUS_DONE = 'done'
+STATUS_ERROR = 'error'
+# операторы фильтра массовых PATCH / DELETE
+FILTER_OPS = {'eq': lambda c, v: c == v, 'ne': lambda c, v: c != v, 'lt': lambda c, v: c < v,
+              'le': lambda c, v: c <= v, 'gt': lambda c, v: c > v, 'ge': lambda c, v: c >= v,
+              'in': lambda c, v: c.in_(v), 'like': lambda c, v: c.like(v), 'ilike': lambda c, v: c.ilike(v),
+              'is_null': lambda c, v: c.is_(None), 'not_null': lambda c, v: c.is_not(None)}
+
 
 class RepositoryMeta(ABCMeta):
     """ нужен для регистрации repo для того что бы потом обращаться к нему по имени"""
@@ -23,15 +44,102 @@ class RepositoryMeta(ABCMeta):
 
 class Repository(metaclass=RepositoryMeta):
     __abstract__ = True
+    # варианты сортировки keyset-пагинации: имя -> колонки ключа (по ним есть индексы, см. changes_index)
+    keyset_orders: Dict[str, tuple] = {'id': ('id',), 'updated_at': ('updated_at', 'id')}
+    # поля, по которым разрешен поиск search_by_field. пусто - любое поле модели
+    search_fields: tuple = ()
+    # большие колонки, которые в списках (get_all, search) не загружаются, пока не запрошены в fields
+    list_deferred: tuple = ()
+    # то же для связей include: связь -> большие колонки связанной модели (list_deferred ее репозитория)
+    include_deferred: Dict[str, tuple] = {}
+    # колонка хеша содержимого и колонки, которые он покрывает: UPDATE с теми же значениями не выполняется,
+    # колонки hashed_columns сравниваются по хешу. content_changed_column - время последнего изменения хеша
+    hash_column: Optional[str] = None
+    hashed_columns: tuple = ()
+    content_changed_column: Optional[str] = None
+    # собранные один раз запросы горячих методов с bindparam вместо значений: ключ -> statement.
+    # LRU на REPOSITORY_STATEMENT_CACHE_SIZE ключей: include и columns в ключе приходят из запроса
+    _statements: OrderedDict = OrderedDict()
+
+    @classmethod
+    def get_statement(cls, key: tuple, build: Callable[[], Any]):
+        """
+        запрос из кэша statement, build() вызывается один раз на ключ, пока ключ не вытеснен.
+        в ключ входит класс репозитория - get_query может быть переопределен
+        """
+        key = (cls, *key)
+        statements = Repository._statements
+        stmt = statements.get(key)
+        if stmt is None:
+            stmt = statements[key] = build()
+            while len(statements) > settings.REPOSITORY_STATEMENT_CACHE_SIZE:
+                statements.popitem(last=False)
+        else:
+            statements.move_to_end(key)
+        return stmt
 
     @classmethod
-    def get_query(cls, model: ModelType):
+    def get_query(cls, model: ModelType, include: Sequence[str] = (), columns: Optional[Sequence[str]] = None,
+                  list_view: bool = False):
         """
         Переопределяемый метод.
-        Возвращает select() с полными selectinload.
+        Возвращает select() с загрузкой связей include:
+        коллекции - selectinload (один дополнительный запрос на связь для всей страницы),
+        many-to-one / one-to-one - joinedload.
+        columns - загружаемые колонки (load_only, обращение к остальным - ошибка), None - все.
+        list_view - в связях не загружаются колонки include_deferred.
         По умолчанию — без связей.
         """
-        return select(model)
+        stmt = select(model)
+        if columns is not None:
+            stmt = stmt.options(load_only(*(getattr(model, name) for name in columns), raiseload=True))
+        for name in include:
+            relation = model.__mapper__.relationships[name]
+            loader = (selectinload if relation.uselist else joinedload)(getattr(model, name))
+            deferred = cls.include_deferred.get(name, ()) if list_view else ()
+            if deferred:
+                loader = loader.defer(*(getattr(relation.mapper.class_, column) for column in deferred))
+            stmt = stmt.options(loader)
+        return stmt
+
+    @classmethod
+    def get_columns(cls, model: ModelType, fields: Sequence[str] = (), list_view: bool = False) -> Optional[tuple]:
+        """
+        колонки для get_query: запрошенные fields, id и колонки keyset-сортировок (нужны для курсора и ETag).
+        без fields в списках - все, кроме list_deferred. None - все колонки модели
+        """
+        if fields:
+            names = {'id', *fields, *(name for order in cls.keyset_orders.values() for name in order)}
+        elif list_view and cls.list_deferred:
+            names = {prop.key for prop in model.__mapper__.column_attrs if not prop.deferred} - set(cls.list_deferred)
+        else:
+            return None
+        # порядок колонок модели: один statement на набор колонок независимо от порядка в запросе
+        return tuple(prop.key for prop in model.__mapper__.column_attrs if prop.key in names)
+
+    @classmethod
+    def get_change_values(cls, values: Dict[str, Any], model: ModelType) -> tuple:
+        """
+        условие UPDATE "значения отличаются от текущих" и дополнительные значения SET (время изменения
+        содержимого). значения values - параметры или выражения (excluded в ON CONFLICT).
+        (None, {}) - в values нет hash_column, запись обновляется всегда
+        """
+        if cls.hash_column is None or cls.hash_column not in values:
+            return None, {}
+        table = model.__table__
+        condition = or_(*(table.c[name].is_distinct_from(value) for name, value in values.items()
+                          if name in table.c and name not in cls.hashed_columns and name != 'updated_at'))
+        extra = {}
+        if cls.content_changed_column:
+            hash_changed = table.c[cls.hash_column].is_distinct_from(values[cls.hash_column])
+            extra[cls.content_changed_column] = case((hash_changed, func.now()),
+                                                     else_=table.c[cls.content_changed_column])
+        return condition, extra
+
+    @classmethod
+    def get_relations(cls, model: ModelType) -> List[str]:
+        """ имена связей модели, которые можно загрузить через include """
+        return list(model.__mapper__.relationships.keys())
 
     @classmethod
     async def create(cls, obj: ModelType, session: AsyncSession) -> ModelType:
@@ -57,16 +165,273 @@ class Repository(metaclass=RepositoryMeta):
             return obj
         except IntegrityError as e:
             await session.rollback()
-            error_str = str(e.orig).lower()
-            if 'unique constraint' in error_str or 'duplicate key' in error_str:
-                return "unique_constraint_violation"
-            elif 'foreign key constraint' in error_str:
-                return "foreign_key_violation"
-            return f"integrity_error: {error_str}"
+            return cls.get_integrity_error(e)
         except Exception as e:
             await session.rollback()
             return f"database_error: {str(e)}"
 
+    @classmethod
+    async def patch_by_id(
+        cls, id: int, data: Dict[str, Any], model: ModelType, session: AsyncSession, version: Any = None
+    ) -> Union[ModelType, str, None]:
+        """
+        редактирование записи одним запросом UPDATE ... WHERE id = :id RETURNING ...
+        version - ожидаемое значение updated_at (If-Match), проверяется в том же WHERE.
+        None если записи нет, версия не совпала или значения совпали с текущими (hash_column),
+        ошибки целостности - строкой как в patch
+        """
+        columns = model.__table__.c
+        values = {k: v for k, v in data.items() if k in columns}
+        changed, extra = cls.get_change_values(values, model)
+        stmt = update(model).where(model.id == id)
+        if version is not None:
+            stmt = stmt.where(model.updated_at == version)
+        if changed is not None:
+            stmt = stmt.where(changed)
+        stmt = stmt.values(**values, **extra).returning(*cls.get_load_columns(model))
+        try:
+            result = await session.execute(
+                select(model).from_statement(stmt).execution_options(populate_existing=True)
+            )
+            instance = result.scalars().one_or_none()
+            await session.commit()
+            return instance
+        except IntegrityError as e:
+            await session.rollback()
+            return cls.get_integrity_error(e)
+        except Exception as e:
+            await session.rollback()
+            return f"database_error: {str(e)}"
+
+    @classmethod
+    def get_integrity_error(cls, e: IntegrityError) -> str:
+        """ тип ошибки целостности в виде строки, как ее возвращают методы репозитория """
+        error_str = str(e.orig).lower()
+        if 'unique constraint' in error_str or 'duplicate key' in error_str:
+            return "unique_constraint_violation"
+        elif 'foreign key constraint' in error_str:
+            return "foreign_key_violation"
+        return f"integrity_error: {error_str}"
+
+    @classmethod
+    def get_unique_keys(cls, model: ModelType) -> List[tuple]:
+        """
+        наборы колонок уникальных ограничений и уникальных индексов модели (без первичного ключа)
+        """
+        table = model.__table__
+        keys = [tuple(column.name for column in constraint.columns)
+                for constraint in table.constraints if isinstance(constraint, UniqueConstraint)]
+        keys.extend(tuple(column.name for column in index.columns) for index in table.indexes
+                    if index.unique and index.dialect_options['postgresql'].get('where') is None)
+        return keys
+
+    @classmethod
+    def get_cascade_tables(cls, model: ModelType) -> List[str]:
+        """ таблицы, записи которых postgres удаляет каскадом (ON DELETE CASCADE) при удалении записей model """
+        tables = []
+        parents = [model.__table__]
+        while parents:
+            parent = parents.pop()
+            for table in model.metadata.sorted_tables:
+                if table.name in tables:
+                    continue
+                if any(fk.column.table is parent and (fk.ondelete or '').upper() == 'CASCADE'
+                       for fk in table.foreign_keys):
+                    tables.append(table.name)
+                    parents.append(table)
+        return tables
+
+    @classmethod
+    def get_load_columns(cls, model: ModelType) -> list:
+        """ колонки, которые загружает select(model) (без deferred) """
+        return [prop.columns[0] for prop in model.__mapper__.column_attrs if not prop.deferred]
+
+    @classmethod
+    def get_insert(cls, model: ModelType, session: AsyncSession):
+        """
+        dialect-aware INSERT с поддержкой ON CONFLICT. None если диалект его не поддерживает
+        """
+        insert = DIALECT_INSERTS.get(session.get_bind().dialect.name)
+        return insert(model) if insert else None
+
+    @classmethod
+    async def insert_or_get(cls, data: dict, model: ModelType, session: AsyncSession) -> Optional[ModelType]:
+        """
+        get_or_create за один запрос:
+            WITH ins AS (INSERT ... ON CONFLICT DO NOTHING RETURNING ...)
+            SELECT * FROM ins UNION ALL
+            SELECT ... WHERE <совпадение по любому уникальному ключу> AND NOT EXISTS (SELECT FROM ins)
+        None если диалект не поддерживает ON CONFLICT или в data нет ни одного уникального ключа -
+        тогда уникальность проверяется обычным поиском
+        """
+        insert = cls.get_insert(model, session)
+        keys = [key for key in cls.get_unique_keys(model) if all(name in data for name in key)]
+        if insert is None or not keys:
+            return None
+        table = model.__table__
+        columns = cls.get_load_columns(model)
+        key_condition = or_(*(and_(*(table.c[name] == data[name] for name in key)) for key in keys))
+        ins = insert.values(**data).on_conflict_do_nothing().returning(*columns).cte('ins')
+        existing = select(*columns).where(key_condition, ~exists(select(ins.c.id))).limit(1)
+        stmt = select(model).from_statement(union_all(select(ins), existing))
+        result = await session.execute(stmt.execution_options(populate_existing=True))
+        instance = result.scalars().first()
+        if instance is None:
+            # конкурентная вставка зафиксирована после снимка запроса - она видна следующему запросу
+            result = await session.execute(select(model).where(key_condition).limit(1))
+            instance = result.scalar_one()
+        await session.commit()
+        return instance
+
+    @classmethod
+    async def bulk_insert_or_get(cls, rows: List[dict], model: ModelType, session: AsyncSession) -> List[tuple]:
+        """
+        get_or_create для списка записей: один многострочный INSERT ... ON CONFLICT DO NOTHING RETURNING
+        и один SELECT существующих записей по уникальным ключам для невставленных строк
+        (без уникальных ключей в полях - bulk_get_or_insert, без ON CONFLICT в диалекте - bulk_get_or_add).
+        все строки должны иметь одинаковый набор полей. commit выполняет вызывающий
+        :return:    [(id, 'created' | 'existing'), ...] в порядке rows, id None если запись не найдена
+        """
+        insert = cls.get_insert(model, session)
+        if insert is None:
+            return await cls.bulk_get_or_add(rows, model, session)
+        table = model.__table__
+        names = list(rows[0])
+        keys = [key for key in cls.get_unique_keys(model) if all(name in names for name in key)]
+        if not keys:
+            return await cls.bulk_get_or_insert(rows, insert, model, session)
+        match_names = sorted({name for key in keys for name in key})
+        stmt = (insert.values(rows).on_conflict_do_nothing()
+                .returning(table.c.id, *(table.c[name] for name in match_names)))
+        result = await session.execute(stmt)
+        inserted: Dict[tuple, list] = {}
+        for row in result.all():
+            inserted.setdefault(tuple(row[1:]), []).append(row.id)
+
+        statuses: List[Optional[tuple]] = []
+        for row in rows:
+            ids = inserted.get(tuple(row[name] for name in match_names))
+            statuses.append((ids.pop(0), 'created') if ids else None)
+        missing = [row for row, status in zip(rows, statuses) if status is None]
+        if not missing:
+            return statuses
+
+        # строки не вставлены из-за конфликта - ищем существующие записи одним запросом
+        key_columns = sorted({name for key in keys for name in key})
+        conditions = [table.c[name].in_({row[name] for row in missing}) for name in key_columns]
+        result = await session.execute(select(table.c.id, *(table.c[name] for name in key_columns))
+                                       .where(or_(*conditions)))
+        existing = {}
+        for row in result.all():
+            for key in keys:
+                existing.setdefault((key, tuple(getattr(row, name) for name in key)), row.id)
+        for i, row in enumerate(rows):
+            if statuses[i] is None:
+                id = next((existing[(key, tuple(row[name] for name in key))] for key in keys
+                           if (key, tuple(row[name] for name in key)) in existing), None)
+                statuses[i] = (id, 'existing')
+        return statuses
+
+    @classmethod
+    async def bulk_get_or_add(cls, rows: List[dict], model: ModelType, session: AsyncSession) -> List[tuple]:
+        """
+        bulk_insert_or_get для диалектов без ON CONFLICT, как get_or_create: для каждой строки поиск
+        по уникальным ключам (без ключей в полях - по всем полям) и добавление в сессию с flush -
+        повторы внутри пакета находятся как существующие. commit выполняет вызывающий
+        """
+        table = model.__table__
+        names = list(rows[0])
+        unique_keys = [key for key in cls.get_unique_keys(model) if all(name in names for name in key)]
+        statuses = []
+        for row in rows:
+            # NULL в уникальном ключе не конфликтует, по всем полям NULL совпадает с NULL (IS NULL)
+            keys = [key for key in unique_keys if all(row[name] is not None for name in key)]
+            id = None
+            if keys or not unique_keys:
+                condition = or_(*(and_(*(table.c[name] == row[name] for name in key)) for key in keys or [names]))
+                result = await session.execute(select(table.c.id).where(condition).order_by(table.c.id).limit(1))
+                id = result.scalar()
+            if id is not None:
+                statuses.append((id, 'existing'))
+                continue
+            instance = model(**row)
+            session.add(instance)
+            await session.flush()
+            statuses.append((instance.id, 'created'))
+        return statuses
+
+    @classmethod
+    async def bulk_get_or_insert(cls, rows: List[dict], insert, model: ModelType, session: AsyncSession) -> List[tuple]:
+        """
+        bulk_insert_or_get для записей без уникального ключа, как get_or_create (get_by_fields + create):
+        существующие записи ищутся одним SELECT по совпадению всех полей, остальные вставляются одним INSERT,
+        повторы внутри пакета - один раз. уникальность не обеспечивается БД: параллельные пакеты
+        с одинаковыми строками могут вставить одинаковые записи
+        """
+        table = model.__table__
+        names = list(rows[0])
+        columns = [table.c[name] for name in names]
+        distinct = {tuple(row[name] for name in names): row for row in rows}
+        conditions = [and_(*(column.is_(None) if value is None else column == value
+                             for column, value in zip(columns, values))) for values in distinct]
+        result = await session.execute(select(table.c.id, *columns).where(or_(*conditions)).order_by(table.c.id))
+        existing: Dict[tuple, int] = {}
+        for row in result.all():
+            existing.setdefault(tuple(row[1:]), row.id)
+        new_rows = [row for values, row in distinct.items() if values not in existing]
+        created: Dict[tuple, int] = {}
+        if new_rows:
+            result = await session.execute(insert.values(new_rows).returning(table.c.id, *columns))
+            created = {tuple(row[1:]): row.id for row in result.all()}
+        statuses = []
+        for row in rows:
+            values = tuple(row[name] for name in names)
+            if values in created:
+                statuses.append((created.pop(values), 'created'))
+                existing[values] = statuses[-1][0]
+            else:
+                statuses.append((existing.get(values), 'existing'))
+        return statuses
+
+    @classmethod
+    async def upsert(
+        cls, lookup: Dict[str, Any], defaults: Dict[str, Any], model: ModelType, session: AsyncSession
+    ) -> Union[tuple, str, None]:
+        """
+        update_or_create за один запрос: INSERT ... ON CONFLICT (lookup) DO UPDATE SET defaults RETURNING ...
+        запись с теми же значениями (hash_column) не обновляется: (запись, changed).
+        None если lookup не совпадает с уникальным ключом модели или диалект не поддерживает ON CONFLICT.
+        ошибки целостности возвращаются строкой как в patch
+        """
+        insert = cls.get_insert(model, session)
+        unique_keys = {frozenset(key) for key in cls.get_unique_keys(model)}
+        if insert is None or not defaults or frozenset(lookup) not in unique_keys:
+            return None
+        stmt = insert.values(**lookup, **defaults)
+        values = {name: stmt.excluded[name] for name in defaults}
+        changed, extra = cls.get_change_values(values, model)
+        values.update(extra)
+        if 'updated_at' in model.__table__.c:
+            # onupdate колонки в ON CONFLICT DO UPDATE не применяется
+            values.setdefault('updated_at', func.now())
+        stmt = (stmt.on_conflict_do_update(index_elements=list(lookup), set_=values, where=changed)
+                .returning(*cls.get_load_columns(model)))
+        try:
+            result = await session.execute(
+                select(model).from_statement(stmt).execution_options(populate_existing=True)
+            )
+            instance = result.scalars().one_or_none()
+            if instance is None:
+                # значения совпали с текущими - строка не изменена и не возвращена
+                result = await session.execute(select(model).filter_by(**lookup))
+                await session.commit()
+                return result.scalars().one(), False
+            await session.commit()
+            return instance, True
+        except IntegrityError as e:
+            await session.rollback()
+            return cls.get_integrity_error(e)
+
     @classmethod
     async def delete(cls, obj: ModelType, session: AsyncSession) -> Union[bool, str]:
         """
@@ -87,12 +452,41 @@ class Repository(metaclass=RepositoryMeta):
             return f"database_error: {str(e)}"
 
     @classmethod
-    async def get_by_id(cls, id: int, model: ModelType, session: AsyncSession) -> Optional[ModelType]:
+    async def delete_by_id(cls, id: int, model: ModelType, session: AsyncSession) -> Union[bool, str, None]:
+        """
+        удаление записи одним запросом DELETE ... WHERE id = :id RETURNING id.
+        дочерние записи удаляются каскадом в postgres (ON DELETE CASCADE) без загрузки в ORM.
+        None если записи нет, ошибки - строкой как в delete
+        """
+        try:
+            result = await session.execute(delete(model).where(model.id == id).returning(model.id))
+            deleted = result.scalar_one_or_none()
+            await session.commit()
+            return None if deleted is None else True
+        except IntegrityError as e:
+            await session.rollback()
+            return cls.get_integrity_error(e)
+        except Exception as e:
+            await session.rollback()
+            return f"database_error: {str(e)}"
+
+    @classmethod
+    async def update_by_ids(cls, rows: List[dict], model: ModelType, session: AsyncSession):
+        """ UPDATE по первичному ключу для каждой строки rows (executemany) """
+        await session.execute(update(model), rows)
+        await session.commit()
+
+    @classmethod
+    async def get_by_id(
+        cls, id: int, model: ModelType, session: AsyncSession, include: Sequence[str] = (),
+        columns: Optional[Sequence[str]] = None
+    ) -> Optional[ModelType]:
         """
         get one record by id
         """
-        stmt = cls.get_query(model).where(model.id == id)
-        result = await session.execute(stmt)
+        stmt = cls.get_statement((model, 'get_by_id', tuple(include), columns),
+                                 lambda: cls.get_query(model, include, columns).where(model.id == bindparam('id')))
+        result = await session.execute(stmt, {'id': id})
         obj = result.scalar_one_or_none()
         return obj
 
@@ -111,12 +505,17 @@ class Repository(metaclass=RepositoryMeta):
 
     @classmethod
     async def get_all(
-        cls, skip: int, limit: int, model: ModelType, session: AsyncSession
+        cls, skip: int, limit: int, model: ModelType, session: AsyncSession, include: Sequence[str] = (),
+        columns: Optional[Sequence[str]] = None
     ) -> tuple:
         # Запрос с загрузкой связей и пагинацией
-        stmt = cls.get_query(model).offset(skip).limit(limit)
+        stmt = cls.get_statement(
+            (model, 'get_all', tuple(include), columns),
+            lambda: cls.get_query(model, include, columns, list_view=True).order_by(model.id)
+            .offset(bindparam('skip')).limit(bindparam('limit'))
+        )
         total = await cls.get_count(model, session)
-        result = await session.execute(stmt)
+        result = await session.execute(stmt, {'skip': skip, 'limit': limit})
         items = result.scalars().all()
         return items, total
 
@@ -158,16 +557,22 @@ class Repository(metaclass=RepositoryMeta):
             if not valid_fields:
                 return None
 
-            conditions = []
-            for key, value in valid_fields.items():
-                column = getattr(model, key)
-                if value is None:
-                    conditions.append(column.is_(None))
-                else:
-                    conditions.append(column == value)
+            # один запрос на набор полей: значения передаются параметрами, NULL - отдельная форма запроса
+            shape = tuple(sorted((key, value is None) for key, value in valid_fields.items()))
 
-            stmt = select(model).where(and_(*conditions)).limit(1)
-            result = await session.execute(stmt)
+            def build():
+                conditions = []
+                for key, is_null in shape:
+                    column = getattr(model, key)
+                    if is_null:
+                        conditions.append(column.is_(None))
+                    else:
+                        conditions.append(column == bindparam(f'f_{key}', type_=column.type))
+                return select(model).where(and_(*conditions)).limit(1)
+
+            stmt = cls.get_statement((model, 'get_by_fields', shape), build)
+            params = {f'f_{key}': value for key, value in valid_fields.items() if value is not None}
+            result = await session.execute(stmt, params)
             return result.scalar_one_or_none()
 
         except Exception as e:
@@ -178,7 +583,7 @@ class Repository(metaclass=RepositoryMeta):
     @classmethod
     async def get_count(cls, model: ModelType, session: AsyncSession) -> int:
         """ подсчет количества записей после указанной даты"""
-        count_stmt = select(func.count()).select_from(model)
+        count_stmt = cls.get_statement((model, 'count'), lambda: select(func.count()).select_from(model))
         count_result = await session.execute(count_stmt)
         total = count_result.scalar()
         return total
@@ -189,35 +594,250 @@ class Repository(metaclass=RepositoryMeta):
         count_stmt = select(func.count()).select_from(model)
         result = await session.execute(count_stmt)
         return result.scalar()
-    
-    # app/repositories/base.py
-    # Добавь этот метод в класс Repository
-    
+
     @classmethod
     async def search_by_field(cls, field_name: str, search_value: str, skip: int,
-                              limit: int, model: ModelType, session: AsyncSession) -> tuple:
+                              limit: Optional[int], model: ModelType, session: AsyncSession,
+                              mode: str = 'ilike', include: Sequence[str] = (),
+                              columns: Optional[Sequence[str]] = None) -> tuple:
         """
-        Простой поиск по полю (LIKE поиск)
+        Поиск по полю одним запросом: количество совпадений считается оконной функцией
+        mode='ilike' - подстрока, порядок по id
+        mode='trgm'  - подстрока или похожесть (pg_trgm), порядок по убыванию похожести
         """
         try:
-            if not hasattr(model, field_name):
-                # Если поле не существует, возвращаем пустой результат
+            condition = cls.get_search_condition(field_name, search_value, model, mode)
+            if condition is None:
+                # Если поле не существует или не разрешено, возвращаем пустой результат
                 return [], 0
-            
-            column = getattr(model, field_name)
-            stmt = cls.get_query(model).where(column.ilike(f"%{search_value}%")).offset(skip).limit(limit)
-            
-            # Получаем результаты
+
+            if mode == 'trgm':
+                order = (func.similarity(getattr(model, field_name), search_value).desc(), model.id)
+            else:
+                order = (model.id,)
+            stmt = (cls.get_query(model, include, columns, list_view=True)
+                    .add_columns(func.count().over().label('total'))
+                    .where(condition).order_by(*order).offset(skip).limit(limit))
             result = await session.execute(stmt)
-            items = result.scalars().all()
-            
-            # Считаем общее количество для пагинации
-            count_stmt = select(func.count()).select_from(model).where(column.ilike(f"%{search_value}%"))
+            rows = result.all()
+            if rows:
+                return [row[0] for row in rows], rows[0].total
+            if not skip:
+                return [], 0
+            # страница за пределами выборки - окно пустое, количество считаем отдельно
+            count_stmt = select(func.count()).select_from(model).where(condition)
             count_result = await session.execute(count_stmt)
-            total = count_result.scalar()
-            
-            return items, total
-        
+            return [], count_result.scalar()
+
         except Exception as e:
             print(f"Search error: {e}")
-            return [], 0
\ No newline at end of file
+            return [], 0
+
+    @classmethod
+    def get_search_condition(cls, field_name: str, search_value: str, model: ModelType, mode: str = 'ilike'):
+        """
+        условие поиска по полю. None если поля нет в модели или оно не входит в search_fields.
+        ILIKE '%...%' и оператор похожести % обслуживаются GIN триграммными индексами
+        """
+        if cls.search_fields and field_name not in cls.search_fields:
+            return None
+        if field_name not in model.__table__.columns:
+            return None
+        column = getattr(model, field_name)
+        condition = column.ilike(f"%{search_value}%")
+        if mode == 'trgm':
+            condition = or_(condition, column.op('%')(search_value))
+        return condition
+
+    @classmethod
+    def get_filter_condition(cls, field_name: str, op: str, value: Any, model: ModelType):
+        """
+        условие фильтра массовых операций. значение приводится к типу колонки
+        :raises:    ValueError если поля нет в модели, оператор неизвестен или значение не приводится
+        """
+        if field_name not in model.__table__.columns:
+            raise ValueError(f'unknown field: {field_name}')
+        if op not in FILTER_OPS:
+            raise ValueError(f'unknown operator: {op}')
+        column = model.__table__.c[field_name]
+        if op in ('is_null', 'not_null'):
+            return FILTER_OPS[op](column, None)
+        if value is None:
+            raise ValueError(f'{field_name} {op}: value is required')
+        python_type = str if op in ('like', 'ilike') else column.type.python_type
+        try:
+            value = TypeAdapter(List[python_type] if op == 'in' else python_type).validate_python(value)
+        except ValidationError:
+            raise ValueError(f'invalid value for {field_name} {op}: {value!r}')
+        return FILTER_OPS[op](column, value)
+
+    @classmethod
+    async def bulk_update(
+        cls, where: Sequence, values: Dict[str, Any], model: ModelType, session: AsyncSession, max_rows: int
+    ) -> Union[int, str]:
+        """
+        UPDATE записей по условию одним запросом. изменяется не больше max_rows + 1 строк,
+        если условию соответствует больше max_rows - откат и 'too_many_rows'
+        :return:    число измененных строк или строка ошибки как в patch
+        """
+        changed, extra = cls.get_change_values(values, model)
+        if changed is not None:
+            # записи с теми же значениями не изменяются и не считаются
+            where = (*where, changed)
+        ids = select(model.id).where(*where).order_by(model.id).limit(max_rows + 1).scalar_subquery()
+        stmt = update(model).where(model.id.in_(ids)).values(**values, **extra).returning(model.id)
+        return await cls.execute_bulk(stmt, session, max_rows)
+
+    @classmethod
+    async def bulk_delete(
+        cls, where: Sequence, model: ModelType, session: AsyncSession, max_rows: int
+    ) -> Union[int, str]:
+        """
+        DELETE записей по условию одним запросом, дочерние записи удаляются каскадом в базе данных.
+        ограничение max_rows как в bulk_update
+        """
+        ids = select(model.id).where(*where).order_by(model.id).limit(max_rows + 1).scalar_subquery()
+        stmt = delete(model).where(model.id.in_(ids)).returning(model.id)
+        return await cls.execute_bulk(stmt, session, max_rows)
+
+    @classmethod
+    async def execute_bulk(cls, stmt, session: AsyncSession, max_rows: int) -> Union[int, str]:
+        try:
+            result = await session.execute(stmt)
+            affected = len(result.all())
+            if affected > max_rows:
+                await session.rollback()
+                return 'too_many_rows'
+            await session.commit()
+            return affected
+        except IntegrityError as e:
+            await session.rollback()
+            return cls.get_integrity_error(e)
+        except Exception as e:
+            await session.rollback()
+            return f"database_error: {str(e)}"
+
+    @classmethod
+    def is_queue(cls, model: ModelType) -> bool:
+        """ модель поддерживает очередь обработки: есть status, lease_expires_at и lease_token """
+        return {'status', 'lease_expires_at', 'lease_token'} <= set(model.__table__.columns.keys())
+
+    @classmethod
+    async def claim(
+        cls, limit: int, lease_seconds: float, model: ModelType, session: AsyncSession
+    ) -> List[ModelType]:
+        """
+        аренда до limit ожидающих записей одним запросом: SELECT ... FOR UPDATE SKIP LOCKED
+        пропускает строки, которые в этот момент забирают другие обработчики, поэтому одна запись
+        достается одному обработчику. записи переводятся в in_progress до now() + lease_seconds
+        с новым lease_token - его требует finish
+        """
+        picked = (select(model.id).where(model.status == STATUS_PENDING).order_by(model.id).limit(limit)
+                  .with_for_update(skip_locked=True).cte('picked'))
+        stmt = (update(model).where(model.id == picked.c.id)
+                .values(status=STATUS_IN_PROGRESS,
+                        lease_expires_at=func.now() + literal(timedelta(seconds=lease_seconds), Interval),
+                        lease_token=cast(func.gen_random_uuid(), String))
+                .returning(*cls.get_load_columns(model), model.__table__.c.lease_token))
+        # lease_token не загружается (deferred) - в ответе /claim он нужен
+        result = await session.execute(
+            select(model).options(undefer(model.lease_token)).from_statement(stmt)
+            .execution_options(populate_existing=True)
+        )
+        items = sorted(result.scalars().all(), key=lambda item: item.id)
+        await session.commit()
+        return items
+
+    @classmethod
+    async def finish(
+        cls, id: int, lease_token: str, status: str, model: ModelType, session: AsyncSession
+    ) -> Optional[ModelType]:
+        """
+        завершение аренды записи: status done / error / pending (повтор).
+        None если записи нет, она не в аренде, аренда истекла (даже если запись еще не возвращена в очередь)
+        или выдана с другим lease_token - повторно арендованную запись прежний обработчик не завершит
+        """
+        stmt = (update(model)
+                .where(model.id == id, model.status == STATUS_IN_PROGRESS, model.lease_token == lease_token,
+                       model.lease_expires_at > func.now())
+                .values(status=status, lease_expires_at=None, lease_token=None)
+                .returning(*cls.get_load_columns(model)))
+        result = await session.execute(
+            select(model).from_statement(stmt).execution_options(populate_existing=True)
+        )
+        instance = result.scalars().one_or_none()
+        await session.commit()
+        return instance
+
+    @classmethod
+    async def reap(cls, model: ModelType, session: AsyncSession) -> List[int]:
+        """ возврат в очередь записей с истекшей арендой, возвращает их id """
+        stmt = (update(model)
+                .where(model.status == STATUS_IN_PROGRESS, model.lease_expires_at < func.now())
+                .values(status=STATUS_PENDING, lease_expires_at=None, lease_token=None).returning(model.id))
+        result = await session.execute(stmt)
+        ids = result.scalars().all()
+        await session.commit()
+        return ids
+
+    @classmethod
+    def get_key_types(cls, order_by: str, model: ModelType) -> tuple:
+        """ python-типы значений ключа keyset_orders[order_by] - для проверки курсора """
+        return tuple(model.__table__.c[name].type.python_type for name in cls.keyset_orders[order_by])
+
+    @classmethod
+    async def get_page(
+        cls, limit: int, model: ModelType, session: AsyncSession, order_by: str = 'id',
+        after: Optional[tuple] = None, where: Sequence = (), include: Sequence[str] = (),
+        columns: Optional[Sequence[str]] = None
+    ) -> tuple:
+        """
+        keyset-пагинация: записи после ключа after в порядке keyset_orders[order_by].
+        выбирается limit + 1 запись, чтобы без COUNT понять есть ли следующая страница
+        :return:    (items, ключ последней записи или None если страница последняя)
+        """
+        key_names = cls.keyset_orders[order_by]
+        key_columns = [getattr(model, name) for name in key_names]
+
+        def build():
+            stmt = cls.get_query(model, include, columns, list_view=True).where(*where)
+            if after:
+                stmt = stmt.where(tuple_(*key_columns) > tuple_(*(bindparam(f'k_{name}', type_=column.type)
+                                                                  for name, column in zip(key_names, key_columns))))
+            return stmt.order_by(*key_columns).limit(bindparam('limit'))
+
+        params = {'limit': limit + 1}
+        if after:
+            params.update({f'k_{name}': value for name, value in zip(key_names, after)})
+        if where:
+            # условия поиска содержат значения - такой запрос не кэшируется
+            stmt = build()
+        else:
+            stmt = cls.get_statement((model, 'get_page', order_by, bool(after), tuple(include), columns), build)
+        result = await session.execute(stmt, params)
+        items = result.scalars().all()
+        if len(items) <= limit:
+            return items, None
+        items = items[:limit]
+        return items, tuple(getattr(items[-1], name) for name in key_names)
+
+    @classmethod
+    def get_settled_condition(cls, column, lag: float):
+        """
+        время column старше lag секунд по часам БД: транзакции, начатые раньше и еще не зафиксированные,
+        могут записать меньшее время - такие записи GET /changes пока не отдает, чтобы курсор их не пропустил
+        """
+        return column < func.now() - literal(timedelta(seconds=lag), Interval)
+
+    @classmethod
+    async def stream_partitions(
+        cls, model: ModelType, session: AsyncSession, where: Sequence = (), yield_per: int = 1000
+    ):
+        """
+        строки таблицы (загружаемые колонки) порциями по yield_per через server-side курсор
+        """
+        stmt = (select(*cls.get_load_columns(model)).where(*where).order_by(model.id)
+                .execution_options(yield_per=yield_per))
+        result = await session.stream(stmt)
+        async for partition in result.partitions():
+            yield partition
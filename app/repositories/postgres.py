@@ -3,20 +3,325 @@
     репозитории создаютсяя для каждой модели <Имя модеоли>Repository
     при необходимости методы могут быть перегружены
 """
-from app.repositories.base import Repository
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+from sqlalchemy import (and_, bindparam, case, cast, delete, func, insert, literal, literal_column, or_, select, text,
+                        tuple_, update)
+from sqlalchemy.dialects.postgresql import REGCONFIG
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.postgres import FTS_MAX_TEXT_LENGTH, html_to_text_sql
+from app.repositories.base import ModelType, Repository
 
 
 class CodeRepository(Repository):
-    pass
+    search_fields = ('code', 'url', 'status')
 
 
 class NameRepository(Repository):
-    pass
+    search_fields = ('name', 'url', 'status')
+    include_deferred = {'raw_data': ('body_html',)}
 
 
 class RawRepository(Repository):
-    pass
+    search_fields = ('body_html',)
+    list_deferred = ('body_html',)
+    keyset_orders = {**Repository.keyset_orders, 'content_changed_at': ('content_changed_at', 'id')}
+    hash_column = 'body_hash'
+    hashed_columns = ('body_html', 'body_zstd', 'body_dict_id', 'body_tsv')
+    content_changed_column = 'content_changed_at'
+    # параметры фрагментов ts_headline
+    headline_options = 'MaxFragments=2, MaxWords=30, MinWords=10, StartSel=<b>, StopSel=</b>'
+
+    @classmethod
+    def get_change_values(cls, values: Dict[str, Any], model: ModelType) -> tuple:
+        """ новое содержимое записывается в postgres - ссылка на холодный архив сбрасывается """
+        condition, extra = super().get_change_values(values, model)
+        if condition is not None:
+            extra.update(archived_at=None, archive_ref=None)
+        return condition, extra
+
+    @classmethod
+    def is_partitioned(cls, model: ModelType) -> bool:
+        """ секционированная таблица (PARTITIONED_TABLES): уникального индекса name_id и ON CONFLICT нет """
+        return model.__table__.dialect_options['postgresql'].get('partition_by') is not None
+
+    @classmethod
+    async def lock_names(cls, name_ids: Sequence[int], model: ModelType, session: AsyncSession):
+        """
+        advisory-блокировки name_id до конца транзакции - те же, что берет триггер уникальности.
+        в порядке возрастания, чтобы параллельные пакеты не блокировали друг друга
+        """
+        await session.execute(text('SELECT pg_advisory_xact_lock(hashtext(:table), n) '
+                                   'FROM unnest(CAST(:ids AS integer[])) AS n'),
+                              {'table': model.__tablename__, 'ids': sorted(set(name_ids))})
+
+    @classmethod
+    async def insert_returning(cls, data: dict, model: ModelType, session: AsyncSession) -> ModelType:
+        stmt = insert(model).values(**data).returning(*cls.get_load_columns(model))
+        result = await session.execute(select(model).from_statement(stmt).execution_options(populate_existing=True))
+        return result.scalars().one()
+
+    @classmethod
+    async def insert_or_get(cls, data: dict, model: ModelType, session: AsyncSession) -> Optional[ModelType]:
+        """ в секционированной таблице: поиск и вставка под блокировкой name_id """
+        if not cls.is_partitioned(model) or 'name_id' not in data:
+            return await super().insert_or_get(data, model, session)
+        await cls.lock_names([data['name_id']], model, session)
+        result = await session.execute(select(model).filter_by(name_id=data['name_id']))
+        instance = result.scalars().one_or_none()
+        if instance is None:
+            instance = await cls.insert_returning(data, model, session)
+        await session.commit()
+        return instance
+
+    @classmethod
+    async def bulk_insert_or_get(cls, rows: List[dict], model: ModelType, session: AsyncSession) -> List[tuple]:
+        """ в секционированной таблице: блокировки name_id пакета, поиск существующих и вставка остальных """
+        if not cls.is_partitioned(model) or 'name_id' not in rows[0]:
+            return await super().bulk_insert_or_get(rows, model, session)
+        await cls.lock_names([row['name_id'] for row in rows], model, session)
+        result = await session.execute(select(model.name_id, model.id)
+                                       .where(model.name_id.in_({row['name_id'] for row in rows})))
+        existing = dict(result.all())
+        new_rows = list({row['name_id']: row for row in reversed(rows) if row['name_id'] not in existing}.values())
+        created = {}
+        if new_rows:
+            result = await session.execute(insert(model).values(new_rows).returning(model.name_id, model.id))
+            created = dict(result.all())
+        statuses = []
+        for row in rows:
+            name_id = row['name_id']
+            if name_id in created:
+                statuses.append((created.pop(name_id), 'created'))
+                existing[name_id] = statuses[-1][0]
+            else:
+                statuses.append((existing[name_id], 'existing'))
+        return statuses
+
+    @classmethod
+    async def upsert(
+        cls, lookup: Dict[str, Any], defaults: Dict[str, Any], model: ModelType, session: AsyncSession
+    ) -> Union[tuple, str, None]:
+        """ в секционированной таблице: UPDATE ... WHERE name_id или INSERT под блокировкой name_id """
+        if not cls.is_partitioned(model) or set(lookup) != {'name_id'} or not defaults:
+            return await super().upsert(lookup, defaults, model, session)
+        try:
+            await cls.lock_names([lookup['name_id']], model, session)
+            changed, extra = cls.get_change_values(defaults, model)
+            stmt = update(model).where(model.name_id == lookup['name_id'])
+            if changed is not None:
+                stmt = stmt.where(changed)
+            stmt = stmt.values(**defaults, **extra).returning(*cls.get_load_columns(model))
+            result = await session.execute(
+                select(model).from_statement(stmt).execution_options(populate_existing=True)
+            )
+            instance, is_changed = result.scalars().one_or_none(), True
+            if instance is None:
+                result = await session.execute(select(model).filter_by(**lookup))
+                instance = result.scalars().one_or_none()
+                if instance is None:
+                    instance = await cls.insert_returning({**lookup, **defaults}, model, session)
+                else:
+                    # значения совпали с текущими
+                    is_changed = False
+            await session.commit()
+            return instance, is_changed
+        except IntegrityError as e:
+            await session.rollback()
+            return cls.get_integrity_error(e)
+
+    @classmethod
+    async def full_text_search(
+        cls, query: str, limit: int, model: ModelType, session: AsyncSession, after: Optional[tuple] = None
+    ) -> tuple:
+        """
+        полнотекстовый поиск по body_tsv (GIN индекс), keyset-пагинация по (rank desc, id).
+        ts_headline считается только для строк страницы
+        :return:    (строки id, name_id, rank, headline;  ключ (rank, id) последней строки или None)
+        """
+        config = cast(literal(settings.RAWDATA_FTS_CONFIG), REGCONFIG)
+        ts_query = func.websearch_to_tsquery(config, query)
+        matches = (select(model.id, model.name_id, func.ts_rank_cd(model.body_tsv, ts_query).label('rank'))
+                   .where(model.body_tsv.op('@@')(ts_query)).subquery('matches'))
+        page = select(matches)
+        if after:
+            rank, id = after
+            page = page.where(or_(matches.c.rank < rank, and_(matches.c.rank == rank, matches.c.id > id)))
+        page = page.order_by(matches.c.rank.desc(), matches.c.id).limit(limit + 1).subquery('page')
+        text = literal_column(f"left({html_to_text_sql(f'{model.__tablename__}.body_html')}, {FTS_MAX_TEXT_LENGTH})")
+        headline = func.ts_headline(config, text, ts_query, cls.headline_options)
+        stmt = (select(page.c.id, page.c.name_id, page.c.rank, headline.label('headline'))
+                .join(model, model.id == page.c.id).order_by(page.c.rank.desc(), page.c.id))
+        result = await session.execute(stmt)
+        rows = result.all()
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, (rows[-1].rank, rows[-1].id)
+
+    @classmethod
+    async def get_headlines(cls, texts: Sequence[str], query: str, session: AsyncSession) -> List[str]:
+        """ ts_headline по текстам, прочитанным приложением (сжатые и архивные записи), в порядке texts """
+        stmt = text(f"SELECT ts_headline(CAST(:config AS regconfig), "
+                    f"left({html_to_text_sql('t.body')}, {FTS_MAX_TEXT_LENGTH}), "
+                    f"websearch_to_tsquery(CAST(:config AS regconfig), :query), :options) "
+                    f"FROM unnest(CAST(:texts AS text[])) WITH ORDINALITY AS t(body, n) ORDER BY t.n")
+        result = await session.execute(stmt, {'config': settings.RAWDATA_FTS_CONFIG, 'query': query,
+                                              'options': cls.headline_options, 'texts': list(texts)})
+        return list(result.scalars())
+
+    @classmethod
+    async def get_body_length(cls, id: int, model: ModelType, session: AsyncSession) -> Optional[int]:
+        """ длина body_html в символах, 0 для NULL. None если записи нет """
+        stmt = cls.get_statement((model, 'body_length'), lambda: select(
+            func.coalesce(func.length(model.body_html), 0)).where(model.id == bindparam('id')))
+        result = await session.execute(stmt, {'id': id})
+        return result.scalar_one_or_none()
+
+    @classmethod
+    async def get_body_chunk(cls, id: int, start: int, length: int, model: ModelType, session: AsyncSession) -> str:
+        """ часть body_html: length символов с позиции start (с 1) """
+        stmt = cls.get_statement((model, 'body_chunk'), lambda: select(
+            func.substr(model.body_html, bindparam('start'), bindparam('length'))).where(model.id == bindparam('id')))
+        result = await session.execute(stmt, {'id': id, 'start': start, 'length': length})
+        return result.scalar_one_or_none() or ''
+
+    @classmethod
+    async def get_packed_bodies(cls, ids: Sequence[int], model: ModelType, session: AsyncSession) -> list:
+        """ строки (id, body_zstd, body_dict_id, archive_ref) сжатых и архивных записей из ids """
+        stmt = (select(model.id, model.body_zstd, model.body_dict_id, model.archive_ref)
+                .where(model.id.in_(ids), or_(model.body_zstd.is_not(None), model.archive_ref.is_not(None))))
+        result = await session.execute(stmt)
+        return result.all()
+
+    @classmethod
+    async def get_plain_bodies(cls, limit: int, model: ModelType, session: AsyncSession) -> list:
+        """ строки (id, body_html, updated_at) несжатых записей, последние записи первыми """
+        stmt = (select(model.id, model.body_html, model.updated_at).where(model.body_html.is_not(None))
+                .order_by(model.id.desc()).limit(limit))
+        result = await session.execute(stmt)
+        return result.all()
+
+    @classmethod
+    async def get_archive_candidates(
+        cls, before: datetime, limit: int, model: ModelType, session: AsyncSession
+    ) -> list:
+        """ строки (id, name_id, body_html, body_zstd, body_dict_id, body_hash, updated_at) для архива """
+        stmt = (select(model.id, model.name_id, model.body_html, model.body_zstd, model.body_dict_id,
+                       model.body_hash, model.updated_at)
+                .where(model.archived_at.is_(None), model.content_changed_at < before,
+                       or_(model.body_html.is_not(None), model.body_zstd.is_not(None)))
+                .order_by(model.content_changed_at, model.id).limit(limit))
+        result = await session.execute(stmt)
+        return result.all()
+
+    @classmethod
+    async def mark_archived(cls, rows: Sequence[Any], refs: Sequence[str], model: ModelType,
+                            session: AsyncSession) -> List[int]:
+        """
+        тела записей rows (id, updated_at) перенесены в архив под ключами refs: тело очищается,
+        если запись не изменилась после чтения (updated_at тот же). updated_at не меняется.
+        :return:    id очищенных записей
+        """
+        ref = case(*((model.id == row.id, ref) for row, ref in zip(rows, refs)))
+        stmt = (update(model)
+                .where(tuple_(model.id, model.updated_at).in_([(row.id, row.updated_at) for row in rows]),
+                       model.archived_at.is_(None))
+                .values(body_html=None, body_zstd=None, body_dict_id=None, archived_at=func.now(), archive_ref=ref,
+                        updated_at=model.updated_at)
+                .returning(model.id))
+        result = await session.execute(stmt)
+        ids = list(result.scalars())
+        await session.commit()
+        return ids
+
+
+class RawVersionRepository(Repository):
+    """история body_html (RawdataVersion)"""
+
+    @classmethod
+    async def get_last(cls, name_id: int, model: ModelType, session: AsyncSession):
+        """ последняя версия страницы (version, chain, body_hash) или None """
+        stmt = cls.get_statement((model, 'last'), lambda: select(model.version, model.chain, model.body_hash)
+                                 .where(model.name_id == bindparam('name_id')).order_by(model.version.desc()).limit(1))
+        result = await session.execute(stmt, {'name_id': name_id})
+        return result.first()
+
+    @classmethod
+    async def get_chain(cls, name_id: int, version: int, model: ModelType, session: AsyncSession) -> list:
+        """ строки (version, chain, data) от последнего снимка до version включительно, пусто если версии нет """
+        def build():
+            snapshot = (select(func.max(model.version))
+                        .where(model.name_id == bindparam('name_id'), model.version <= bindparam('version'),
+                               model.chain == 0).scalar_subquery())
+            return (select(model.version, model.chain, model.data)
+                    .where(model.name_id == bindparam('name_id'), model.version <= bindparam('version'),
+                           model.version >= snapshot).order_by(model.version))
+
+        stmt = cls.get_statement((model, 'chain'), build)
+        result = await session.execute(stmt, {'name_id': name_id, 'version': version})
+        rows = result.all()
+        return rows if rows and rows[-1].version == version else []
+
+    @classmethod
+    async def get_versions(cls, name_id: int, model: ModelType, session: AsyncSession, with_data: bool = False):
+        """ все версии страницы по возрастанию. with_data - с data (компакция) """
+        columns = [model.id, model.version, model.chain, model.size, model.body_hash, model.created_at]
+        if with_data:
+            columns.append(model.data)
+        result = await session.execute(select(*columns).where(model.name_id == name_id).order_by(model.version))
+        return result.all()
+
+    @classmethod
+    async def get_compaction_candidates(
+        cls, cutoff: Optional[datetime], max_chain: int, limit: int, model: ModelType, session: AsyncSession
+    ) -> List[int]:
+        """ страницы с версиями старше cutoff (кроме единственной) или цепочкой дельт длиннее max_chain """
+        condition = func.max(model.chain) > max_chain
+        if cutoff is not None:
+            condition = or_(condition, and_(func.count() > 1, func.min(model.created_at) < cutoff))
+        stmt = select(model.name_id).group_by(model.name_id).having(condition).order_by(model.name_id).limit(limit)
+        result = await session.execute(stmt)
+        return result.scalars().all()
+
+    @classmethod
+    async def rewrite(cls, updates: List[dict], delete_ids: List[int], model: ModelType, session: AsyncSession):
+        """ перезапись версий по id и удаление устаревших одной транзакцией """
+        if delete_ids:
+            await session.execute(delete(model).where(model.id.in_(delete_ids)))
+        if updates:
+            await session.execute(update(model), updates)
+        await session.commit()
 
 
 class ImageRepository(Repository):
-    pass
+    search_fields = ('file_id', 'file_url')
+
+
+class TombstoneRepository(Repository):
+    keyset_orders = {'deleted_at': ('deleted_at', 'id')}
+
+    @classmethod
+    async def purge(cls, before: datetime, model: ModelType, session: AsyncSession) -> int:
+        """ удаление tombstones старше before, возвращает число удаленных """
+        result = await session.execute(delete(model).where(model.deleted_at < before))
+        await session.commit()
+        return result.rowcount
+
+
+class ArchiveOrphanRepository(Repository):
+
+    @classmethod
+    async def get_batch(cls, limit: int, model: ModelType, session: AsyncSession) -> list:
+        """ строки (id, archive_ref) в порядке появления """
+        result = await session.execute(select(model.id, model.archive_ref).order_by(model.id).limit(limit))
+        return result.all()
+
+    @classmethod
+    async def delete_ids(cls, ids: Sequence[int], model: ModelType, session: AsyncSession):
+        await session.execute(delete(model).where(model.id.in_(ids)))
+        await session.commit()
@@ -1,10 +1,23 @@
 # app/routers/base.py
-from typing import List
+import json
+from datetime import datetime
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import inspect
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
-from app.databases.postgres import get_db
+from app import cache
+from app.config import settings
+from app.databases.postgres import get_db, get_sessionmaker
+from app.databases.replicas import get_db_read
+from app.repositories.base import MAX_BIND_PARAMS
+from app.schemas.postgres import BulkAffected, BulkFilter, BulkPatch, BulkResult
+from app.services.export_service import MEDIA_TYPES, ExportService
+from app.utils import aenumerate, make_etag, parse_etag
 
 
 class BaseRouter:
@@ -12,7 +25,7 @@ class BaseRouter:
 
     def __init__(
         self, prefix: str, tags: List[str], service, model, create_schema, read_schema, patch_schema, delete_schema,
-        pagination_schema, read_schema_relation=None
+        pagination_schema, read_schema_relation=None, pagination_schema_relation=None, claim_schema=None
     ):
         self.prefix = prefix
         self.tags = tags
@@ -24,6 +37,11 @@ class BaseRouter:
         self.delete_schema = delete_schema
         self.pagination_schema = pagination_schema
         self.read_schema_relation = read_schema_relation or read_schema
+        self.pagination_schema_relation = pagination_schema_relation or pagination_schema
+        # ответ /claim: запись с lease_token
+        self.claim_schema = claim_schema or read_schema
+        # схемы связей для ответов с fields: имя связи -> TypeAdapter
+        self.relation_adapters = {}
 
         self.router = APIRouter(prefix=prefix, tags=self.tags)
         self.setup_routes()
@@ -35,14 +53,42 @@ class BaseRouter:
             "", self.create, methods=["POST"], response_model=self.read_schema
         )
 
+        # Пакетное создание
+        self.router.add_api_route(
+            "/bulk", self.bulk_create, methods=["POST"], response_model=BulkResult
+        )
+
+        # Массовые PATCH / DELETE по фильтру
+        self.router.add_api_route(
+            "", self.bulk_patch, methods=["PATCH"], response_model=BulkAffected
+        )
+        self.router.add_api_route(
+            "", self.bulk_delete, methods=["DELETE"], response_model=BulkAffected
+        )
+
+        # Очередь обработки: только для моделей со status и lease_expires_at
+        if self.service.repository.is_queue(self.model):
+            self.router.add_api_route(
+                "/claim", self.claim, methods=["POST"], response_model=List[self.claim_schema]
+            )
+            self.router.add_api_route("/reap", self.reap, methods=["POST"], response_model=dict)
+            self.router.add_api_route(
+                "/{id}/complete", self.complete, methods=["POST"], response_model=self.read_schema
+            )
+            self.router.add_api_route(
+                "/{id}/fail", self.fail, methods=["POST"], response_model=self.read_schema
+            )
+
         # Get all с пагинацией
         self.router.add_api_route(
-            "", self.get_all, methods=["GET"], response_model=self.pagination_schema
+            "", self.get_all, methods=["GET"], response_model=self.pagination_schema_relation,
+            response_model_exclude_unset=True
         )
 
         # Search с пагинацией
         self.router.add_api_route(
-            "/search", self.search, methods=["GET"], response_model=self.pagination_schema
+            "/search", self.search, methods=["GET"], response_model=self.pagination_schema_relation,
+            response_model_exclude_unset=True
         )
 
         # Search без пагинации
@@ -50,9 +96,16 @@ class BaseRouter:
             "/search_all", self.search_all, methods=["GET"], response_model=List[self.read_schema]
         )
 
+        # Потоковая выгрузка
+        self.router.add_api_route("/export", self.export, methods=["GET"])
+
+        # Инкрементальная синхронизация: изменения и удаления после курсора
+        self.router.add_api_route("/changes", self.get_changes, methods=["GET"])
+
         # Get by ID
         self.router.add_api_route(
-            "/{id}", self.get_by_id, methods=["GET"], response_model=self.read_schema
+            "/{id}", self.get_by_id, methods=["GET"], response_model=self.read_schema_relation,
+            response_model_exclude_unset=True
         )
 
         # Patch
@@ -65,32 +118,320 @@ class BaseRouter:
         """Создание записи"""
         return await self.service.get_or_create(data, db, self.model)
 
+    async def read_bulk_payload(self, request: Request):
+        """
+        элементы тела пакетного запроса: JSON список или NDJSON (application/x-ndjson).
+        NDJSON читается потоком построчно. нераспознанная строка отдается как исключение
+        """
+        content_type = request.headers.get('content-type', '')
+        if 'ndjson' not in content_type and 'jsonlines' not in content_type:
+            try:
+                payload = await request.json()
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
+            if not isinstance(payload, list):
+                raise HTTPException(status_code=400, detail="Expected a JSON list")
+            for item in payload:
+                yield item
+            return
+        buffer = b''
+        async for data in request.stream():
+            buffer += data
+            *lines, buffer = buffer.split(b'\n')
+            for line in lines:
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except ValueError as e:
+                        yield e
+        if buffer.strip():
+            try:
+                yield json.loads(buffer)
+            except ValueError as e:
+                yield e
+
+    async def bulk_create(
+        self, request: Request,
+        chunk_size: int = Query(settings.BULK_CHUNK_SIZE, ge=1, le=settings.BULK_MAX_CHUNK_SIZE),
+        db: AsyncSession = Depends(get_db)
+    ):
+        """
+        Пакетное создание записей (get_or_create): список *Create объектов JSON или NDJSON.
+        записи пишутся порциями по chunk_size, одна транзакция на порцию
+        """
+        chunk_size = min(chunk_size, MAX_BIND_PARAMS // len(self.create_schema.model_fields))
+        items = []
+        chunk = []
+
+        async def write_chunk():
+            results = await self.service.bulk_get_or_create([row for _, row in chunk], self.model, db)
+            items.extend({'index': index, **result} for (index, _), result in zip(chunk, results))
+            chunk.clear()
+
+        index = -1
+        async for index, payload in aenumerate(self.read_bulk_payload(request)):
+            try:
+                if isinstance(payload, Exception):
+                    raise payload
+                row = self.create_schema.model_validate(payload).model_dump()
+            except (ValueError, ValidationError) as e:
+                items.append({'index': index, 'id': None, 'status': 'invalid', 'error': str(e)})
+                continue
+            chunk.append((index, row))
+            if len(chunk) >= chunk_size:
+                await write_chunk()
+        if chunk:
+            await write_chunk()
+
+        items.sort(key=lambda item: item['index'])
+        created = sum(item['status'] == 'created' for item in items)
+        existing = sum(item['status'] == 'existing' for item in items)
+        return BulkResult(total=index + 1, created=created, existing=existing,
+                          failed=len(items) - created - existing, items=items)
+
+    def get_bulk_filter(self, data: BulkFilter) -> tuple:
+        """ условия массовой операции, 400 если условие некорректно или id больше BULK_MAX_ROWS """
+        if data.ids and len(data.ids) > settings.BULK_MAX_ROWS:
+            raise HTTPException(status_code=400, detail=f"Too many ids, max {settings.BULK_MAX_ROWS}")
+        try:
+            return self.service.get_bulk_filter(
+                self.model, data.ids, [condition.model_dump() for condition in data.where or ()]
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    def bulk_response(self, result: dict):
+        if result['success']:
+            return result
+        status_code = 409 if result['error_type'] in ('unique_constraint_violation', 'foreign_key_violation') else 400
+        raise HTTPException(status_code=status_code, detail=result['message'])
+
+    async def bulk_patch(self, data: BulkPatch, db: AsyncSession = Depends(get_db)):
+        """
+        Обновление записей по списку id или условиям where одним запросом.
+        values проверяются схемой patch, больше BULK_MAX_ROWS записей не изменяется
+        """
+        unknown = set(data.values) - set(self.patch_schema.model_fields)
+        if unknown:
+            raise HTTPException(status_code=422, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+        try:
+            values = self.patch_schema.model_validate(data.values).model_dump(exclude_unset=True)
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=e.errors(include_url=False))
+        where = self.get_bulk_filter(data)
+        result = await self.service.bulk_patch(where, values, self.model, db, settings.BULK_MAX_ROWS)
+        return self.bulk_response(result)
+
+    async def bulk_delete(self, data: BulkFilter, db: AsyncSession = Depends(get_db)):
+        """
+        Удаление записей по списку id или условиям where одним запросом,
+        дочерние записи удаляются каскадом. больше BULK_MAX_ROWS записей не удаляется
+        """
+        where = self.get_bulk_filter(data)
+        result = await self.service.bulk_delete(where, self.model, db, settings.BULK_MAX_ROWS)
+        return self.bulk_response(result)
+
+    async def claim(
+        self, limit: int = Query(10, ge=1, le=settings.QUEUE_MAX_CLAIM),
+        lease_seconds: float = Query(settings.QUEUE_LEASE_SECONDS, gt=0, le=settings.QUEUE_MAX_LEASE_SECONDS),
+        db: AsyncSession = Depends(get_db)
+    ):
+        """
+        Аренда до limit записей со status pending: они переводятся в in_progress на lease_seconds.
+        параллельные обработчики получают разные записи. по окончании - /{id}/complete или /{id}/fail
+        с lease_token записи, неподтвержденные записи по истечении аренды возвращаются в pending
+        """
+        return await self.service.claim(limit, lease_seconds, self.model, db)
+
+    def finish_response(self, result: dict):
+        if result['success']:
+            return result['data']
+        status_code = 404 if result['error_type'] == 'not_found' else 409
+        raise HTTPException(status_code=status_code, detail=result['message'])
+
+    async def complete(
+        self, id: int, lease_token: str = Query(..., description="lease_token из ответа /claim"),
+        db: AsyncSession = Depends(get_db)
+    ):
+        """Запись обработана: in_progress -> done. 409 если запись не в аренде или аренда другая"""
+        result = await self.service.complete(id, lease_token, self.model, db)
+        return self.finish_response(result)
+
+    async def fail(
+        self, id: int, lease_token: str = Query(..., description="lease_token из ответа /claim"),
+        retry: bool = Query(False, description="true - вернуть в очередь (pending), false - error"),
+        db: AsyncSession = Depends(get_db)
+    ):
+        """Ошибка обработки: in_progress -> pending или error. 409 если запись не в аренде или аренда другая"""
+        result = await self.service.fail(id, lease_token, retry, self.model, db)
+        return self.finish_response(result)
+
+    async def reap(self, db: AsyncSession = Depends(get_db)):
+        """Возврат в очередь записей с истекшей арендой (то же делает фоновая задача)"""
+        ids = await self.service.reap(self.model, db)
+        return {'reaped': len(ids), 'ids': ids}
+
+    def parse_include(self, include: Optional[str]) -> tuple:
+        """ список связей из ?include=a,b. 400 если связи нет в модели """
+        if not include:
+            return ()
+        names = tuple(dict.fromkeys(name.strip() for name in include.split(',') if name.strip()))
+        relations = self.service.repository.get_relations(self.model)
+        unknown = [name for name in names if name not in relations]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown relations: {', '.join(unknown)}. "
+                                                        f"Available: {', '.join(relations)}")
+        return names
+
+    def parse_fields(self, fields: Optional[str]) -> tuple:
+        """ список полей из ?fields=a,b. 400 если поля нет в схеме чтения """
+        if not fields:
+            return ()
+        names = tuple(dict.fromkeys(name.strip() for name in fields.split(',') if name.strip()))
+        columns = self.model.__mapper__.column_attrs
+        available = [name for name in self.read_schema.model_fields if name in columns]
+        unknown = [name for name in names if name not in available]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}. "
+                                                        f"Available: {', '.join(available)}")
+        return names
+
+    def get_columns(self, fields: tuple, list_view: bool = False) -> Optional[tuple]:
+        return self.service.repository.get_columns(self.model, fields, list_view)
+
+    def get_relation_adapter(self, name: str) -> TypeAdapter:
+        adapter = self.relation_adapters.get(name)
+        if adapter is None:
+            adapter = self.relation_adapters[name] = TypeAdapter(
+                self.read_schema_relation.model_fields[name].annotation)
+        return adapter
+
+    @classmethod
+    def loaded(cls, value):
+        """ связь include: записи модели -> dict загруженных колонок (незагруженные не читаются) """
+        if isinstance(value, list):
+            return [cls.loaded(item) for item in value]
+        if value is None or not hasattr(value, '__mapper__'):
+            return value
+        unloaded = inspect(value).unloaded
+        return {prop.key: getattr(value, prop.key) for prop in value.__mapper__.column_attrs
+                if prop.key not in unloaded}
+
+    def serialize(self, obj, include: tuple = (), fields: tuple = ()):
+        """
+        запись со связями include. незапрошенные связи и незагруженные колонки не читаются
+        (в async они не загружены) и не попадают в ответ (response_model_exclude_unset).
+        с fields - только запрошенные поля и связи, JSON-совместимый dict для JSONResponse
+        """
+        unloaded = inspect(obj).unloaded if isinstance(obj, self.model) else ()
+        data = {name: getattr(obj, name) for name in self.read_schema.model_fields if name not in unloaded}
+        if fields:
+            data = {name: data[name] for name in fields}
+            for name in include:
+                adapter = self.get_relation_adapter(name)
+                data[name] = adapter.dump_python(adapter.validate_python(self.loaded(getattr(obj, name)),
+                                                                         from_attributes=True),
+                                                 mode='json', exclude_unset=True)
+            return jsonable_encoder(data)
+        data = self.read_schema.model_validate(data).model_dump(exclude_unset=True)
+        for name in include:
+            data[name] = self.loaded(getattr(obj, name))
+        return self.read_schema_relation.model_validate(data)
+
+    def page_response(self, result: dict, include: tuple = (), fields: tuple = ()):
+        """ страница: обычная пагинация или keyset (без total/page/pages). с fields - dict """
+        items = [self.serialize(item, include, fields) for item in result["items"]]
+        if "total" not in result:
+            page = dict(items=items, total=None, page=None, page_size=result["page_size"], pages=None,
+                        next_cursor=result["next_cursor"])
+        else:
+            page = dict(items=items, total=result["total"], page=result["page"], page_size=result["page_size"],
+                        pages=(result["total"] + result["page_size"] - 1) // result["page_size"], next_cursor=None)
+        return page if fields else self.pagination_schema_relation(**page)
+
+    async def cached_response(
+        self, route: str, params: dict, relations: tuple, compute, db: AsyncSession,
+        session_factory: async_sessionmaker
+    ):
+        """
+        ответ маршрута route из кэша ответов (RESPONSE_CACHE_TTL[route]). ключ - маршрут и параметры запроса,
+        ответ действителен пока не изменились таблица модели и таблицы связей include
+        """
+        ttl = settings.RESPONSE_CACHE_TTL.get(route, 0)
+        if not settings.RESPONSE_CACHE_ENABLED or ttl <= 0:
+            return await compute(db)
+        response_cache = cache.get_response_cache(f'response:{self.prefix}', settings.RESPONSE_CACHE_MAXSIZE,
+                                                  settings.RESPONSE_CACHE_STALE_TTL)
+        tables = [self.model.__tablename__] + [self.model.__mapper__.relationships[name].mapper.local_table.name
+                                               for name in relations]
+        key = (route, tuple(sorted(params.items())))
+        return await response_cache.get_or_compute(key, tables, ttl, compute, db, session_factory)
+
     async def get_all(
         self, page: int = Query(1, ge=1), page_size: int = Query(10, ge=1, le=100),
-        db: AsyncSession = Depends(get_db)
+        after: Optional[str] = Query(None, description="Keyset cursor, empty value - first page"),
+        order_by: str = Query("id", pattern="^(id|updated_at)$", description="Keyset order"),
+        include: Optional[str] = Query(None, description="Relations to load, e.g. code,images"),
+        fields: Optional[str] = Query(None, description="Fields to return, e.g. id,updated_at"),
+        db: AsyncSession = Depends(get_db_read), session_factory: async_sessionmaker = Depends(get_sessionmaker)
     ):
-        """Получение всех записей с пагинацией"""
-        result = await self.service.get_all(page, page_size, self.model, db)
-        return self.pagination_schema(
-            items=result["items"], total=result["total"], page=result["page"], page_size=result["page_size"],
-            pages=(result["total"] + result["page_size"] - 1) // result["page_size"]
-        )
+        """Получение всех записей с пагинацией. большие колонки (list_deferred) - только через fields"""
+        relations = self.parse_include(include)
+        names = self.parse_fields(fields)
+        columns = self.get_columns(names, list_view=True)
+
+        async def compute(session: AsyncSession):
+            if after is not None:
+                result = await self.service.get_keyset(after, page_size, self.model, session, order_by,
+                                                       include=relations, columns=columns)
+            else:
+                result = await self.service.get_all(page, page_size, self.model, session, relations, columns)
+            return self.page_response(result, relations, names)
 
-    async def get_by_id(self, id: int, db: AsyncSession = Depends(get_db)):
-        """Получение записи по ID"""
-        result = await self.service.get_by_id(id, self.model, db)
+        params = {'page': page, 'page_size': page_size, 'after': after, 'order_by': order_by,
+                  'include': ','.join(sorted(relations)), 'fields': ','.join(names)}
+        try:
+            result = await self.cached_response('get_all', params, relations, compute, db, session_factory)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return JSONResponse(result) if names else result
+
+    async def get_by_id(
+        self, id: int, response: Response,
+        include: Optional[str] = Query(None, description="Relations to load, e.g. code,images"),
+        fields: Optional[str] = Query(None, description="Fields to return, e.g. id,updated_at"),
+        db: AsyncSession = Depends(get_db_read)
+    ):
+        """Получение записи по ID. ETag - версия записи для If-Match в PATCH"""
+        relations = self.parse_include(include)
+        names = self.parse_fields(fields)
+        result = await self.service.get_by_id(id, self.model, db, relations, self.get_columns(names))
         if not result:
             raise HTTPException(status_code=404, detail="Record not found")
-        return result
+        etag = make_etag(result.updated_at)
+        if names:
+            return JSONResponse(self.serialize(result, relations, names), headers={"ETag": etag})
+        response.headers["ETag"] = etag
+        return self.serialize(result, relations)
 
-    async def patch(self, id: int, data, db: AsyncSession = Depends(get_db)):
+    async def patch(
+        self, id: int, data, response: Response,
+        if_match: Optional[str] = Header(None, description="ETag from GET, update only if record is unchanged"),
+        db: AsyncSession = Depends(get_db)
+    ):
         """Обновление записи"""
-        result = await self.service.patch(id, data, self.model, db)
+        try:
+            version = parse_etag(if_match) if if_match else None
+        except ValueError:
+            raise HTTPException(status_code=412, detail=f'Запись {id} была изменена другим запросом')
+        result = await self.service.patch(id, data, self.model, db, version)
         if result.get('success'):
+            response.headers["ETag"] = make_etag(result['data'].updated_at)
             return result
+        elif result.get('error_type') == 'precondition_failed':
+            raise HTTPException(status_code=412, detail=result['message'])
         else:
             raise HTTPException(status_code=404, detail=result.get('message', 'Неизвестная ошибка'))
-        return result
 
     async def delete(self, id: int, db: AsyncSession = Depends(get_db)):
         """Удаление записи"""
@@ -99,23 +440,89 @@ class BaseRouter:
             raise HTTPException(status_code=404, detail=result.get('message', 'Delete failed'))
         return result
     
+    async def get_changes(
+        self, since: Optional[datetime] = Query(None, description="updated_at >= since, only without cursor"),
+        cursor: Optional[str] = Query(None, description="next_cursor of the previous response"),
+        limit: int = Query(100, ge=1, le=settings.CHANGES_MAX_LIMIT),
+        fields: Optional[str] = Query(None, description="Fields to return, e.g. id,updated_at"),
+        db: AsyncSession = Depends(get_db)
+    ):
+        """
+        Записи, измененные после курсора (порядок updated_at, id), и id удаленных записей (deleted).
+        читается основная БД: отставание реплики сдвинуло бы курсор за еще не видимые изменения
+        """
+        names = self.parse_fields(fields)
+        try:
+            result = await self.service.get_changes(since, cursor, limit, self.model, db,
+                                                    self.get_columns(names, list_view=True))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        result["items"] = [self.serialize(item, (), names) if names else
+                           jsonable_encoder(self.serialize(item), exclude_unset=True) for item in result["items"]]
+        return JSONResponse(result)
+
     async def search(
             self, query: str = Query(..., description="Search query"),
             field: str = Query("code", description="Field to search in"), page: int = Query(1, ge = 1),
-            page_size: int = Query(10, ge = 1, le = 100), db: AsyncSession = Depends(get_db)
+            page_size: int = Query(10, ge = 1, le = 100),
+            mode: str = Query("ilike", pattern="^(ilike|trgm)$", description="ilike - substring, trgm - similarity"),
+            after: Optional[str] = Query(None, description="Keyset cursor, empty value - first page"),
+            order_by: str = Query("id", pattern="^(id|updated_at)$", description="Keyset order"),
+            include: Optional[str] = Query(None, description="Relations to load, e.g. code,images"),
+            fields: Optional[str] = Query(None, description="Fields to return, e.g. id,updated_at"),
+            db: AsyncSession = Depends(get_db_read), session_factory: async_sessionmaker = Depends(get_sessionmaker)
             ):
-        """Поиск с пагинацией"""
-        result = await self.service.search(field, query, page, page_size, self.model, db)
-        
-        return self.pagination_schema(
-                items = result["items"], total = result["total"], page = result["page"],
-                page_size = result["page_size"],
-                pages = (result["total"] + result["page_size"] - 1) // result["page_size"]
-                )
+        """Поиск с пагинацией. большие колонки (list_deferred) - только через fields"""
+        relations = self.parse_include(include)
+        names = self.parse_fields(fields)
+        columns = self.get_columns(names, list_view=True)
+
+        async def compute(session: AsyncSession):
+            if after is not None:
+                result = await self.service.search_keyset(field, query, after, page_size, self.model, session,
+                                                          order_by, mode, relations, columns)
+            else:
+                result = await self.service.search(field, query, page, page_size, self.model, session, mode,
+                                                   relations, columns)
+            return self.page_response(result, relations, names)
+
+        params = {'query': query, 'field': field, 'page': page, 'page_size': page_size, 'mode': mode,
+                  'after': after, 'order_by': order_by, 'include': ','.join(sorted(relations)),
+                  'fields': ','.join(names)}
+        try:
+            result = await self.cached_response('search', params, relations, compute, db, session_factory)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return JSONResponse(result) if names else result
 
     async def search_all(
-        self, query: str = Query(...), db: AsyncSession = Depends(get_db)
+        self, query: str = Query(...), field: str = Query("code", description="Field to search in"),
+        db: AsyncSession = Depends(get_db)
     ):
         """Поиск без пагинации"""
-        # Базовая реализация - возвращаем все записи
-        return await self.service.get(self.model, db)
+        try:
+            return await self.service.search_all(field, query, self.model, db)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    async def export(
+        self, format: str = Query("ndjson", pattern="^(ndjson|csv|arrow)$"),
+        updated_since: Optional[datetime] = Query(None, description="updated_at >= updated_since"),
+        field: Optional[str] = Query(None, description="Filter field (exact match)"),
+        value: Optional[str] = Query(None, description="Filter value"),
+        session_factory: async_sessionmaker = Depends(get_sessionmaker)
+    ):
+        """Потоковая выгрузка таблицы (server-side курсор, память не зависит от размера таблицы)"""
+        if not ExportService.is_supported(format):
+            raise HTTPException(status_code=400, detail=f"Format {format} is not available (pyarrow not installed)")
+        try:
+            where = self.service.get_export_filter(self.model, updated_since, field, value)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        stream = ExportService.export(format, self.model, session_factory, self.service.repository, where,
+                                      self.service.prepare_export)
+        extension = 'arrows' if format == 'arrow' else format
+        return StreamingResponse(
+            stream, media_type=MEDIA_TYPES[format],
+            headers={"Content-Disposition": f'attachment; filename="{self.model.__tablename__}.{extension}"'}
+        )
@@ -8,6 +8,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.config import settings
 from app.databases.mongo import get_database
 from app.databases.postgres import get_db
+from app.databases.replicas import get_db_read
 from app.models.postgres import Image, Name
 from app.repositories.mongo_file_repository import MongoFileRepository
 from app.services.mongo_file_service import MongoFileService
@@ -86,7 +87,7 @@ class CascadeFileRouter:
             raise HTTPException(status_code=500, detail=f"Cascade creation failed: {str(e)}")
 
     async def get_files_by_name(
-            self, name_id: int, db: AsyncSession = Depends(get_db), database=Depends(get_database)
+            self, name_id: int, db: AsyncSession = Depends(get_db_read), database=Depends(get_database)
     ):
         """Получение всех файлов по name_id"""
         try:
@@ -114,7 +115,7 @@ class CascadeFileRouter:
             raise HTTPException(status_code=500, detail=f"Failed to get files: {str(e)}")
 
     async def get_file_by_image(
-            self, image_id: int, db: AsyncSession = Depends(get_db), database=Depends(get_database)
+            self, image_id: int, db: AsyncSession = Depends(get_db_read), database=Depends(get_database)
     ):
         """Получение файла по image_id"""
         try:
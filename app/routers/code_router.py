@@ -1,11 +1,14 @@
 # app/routers/code_router.py
-from fastapi import Depends
+from typing import Optional
+
+from fastapi import Depends, Header, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.databases.postgres import get_db
 from app.models.postgres import Code
 from app.routers.base import BaseRouter
-from app.schemas.postgres import (CodeCreate, CodeDelete, CodePaginationRead, CodePatch, CodeRead)
+from app.schemas.postgres import (CodeClaimRead, CodeCreate, CodeDelete, CodePaginationRead, CodePatch, CodeRead,
+                                  CodeReadRelation, CodePaginationReadRelation)
 from app.services.postgres import CodeService
 
 
@@ -20,7 +23,10 @@ class CodeRouter(BaseRouter):
             read_schema=CodeRead,
             patch_schema=CodePatch,
             delete_schema=CodeDelete,
-            pagination_schema=CodePaginationRead
+            pagination_schema=CodePaginationRead,
+            read_schema_relation=CodeReadRelation,
+            pagination_schema_relation=CodePaginationReadRelation,
+            claim_schema=CodeClaimRead
         )
 
     async def create(self, data: CodeCreate, db: AsyncSession = Depends(get_db)):
@@ -28,6 +34,10 @@ class CodeRouter(BaseRouter):
         # return await self.service.get_or_create(data, db, self.model)
         return await super().create(data, db)
 
-    async def patch(self, id: int, data: CodePatch, db: AsyncSession = Depends(get_db)):
+    async def patch(
+        self, id: int, data: CodePatch, response: Response,
+        if_match: Optional[str] = Header(None, description="ETag from GET, update only if record is unchanged"),
+        db: AsyncSession = Depends(get_db)
+    ):
         """Обновление записи"""
-        return await super().patch(id, data, db)
+        return await super().patch(id, data, response, if_match, db)
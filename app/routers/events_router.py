@@ -0,0 +1,62 @@
+# app/routers/events_router.py
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from app.config import settings
+from app.models.postgres import NOTIFY_TABLES
+from app.services.events_service import RESYNC, change_feed, format_event
+
+
+class EventsRouter:
+    """Лента изменений таблиц (Server-Sent Events)"""
+
+    def __init__(self):
+        self.prefix = "/events"
+        self.tags = ["events"]
+
+        self.router = APIRouter(prefix=self.prefix, tags=self.tags)
+        self.setup_routes()
+
+    def setup_routes(self):
+        self.router.add_api_route("", self.events, methods=["GET"], response_class=StreamingResponse)
+
+    async def events(
+        self, tables: Optional[str] = Query(None, description="Tables, e.g. codes,names"),
+        status: Optional[str] = Query(None, description="Statuses, e.g. pending,error"),
+    ):
+        """
+        События insert / update / delete ({table, op, status, ids}) после фиксации транзакций.
+        resync - события пропущены, данные нужно перечитать (GET /{prefix}/changes) и переподключиться
+        """
+        if not settings.EVENTS_ENABLED:
+            raise HTTPException(status_code=404, detail="Events are disabled")
+        names = [name.strip() for name in (tables or '').split(',') if name.strip()]
+        unknown = [name for name in names if name not in NOTIFY_TABLES]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown tables: {', '.join(unknown)}. "
+                                                        f"Available: {', '.join(NOTIFY_TABLES)}")
+        statuses = [value.strip() for value in (status or '').split(',') if value.strip()]
+        subscriber = change_feed.subscribe(names, statuses)
+
+        async def stream():
+            try:
+                while True:
+                    try:
+                        event = await asyncio.wait_for(subscriber.queue.get(), settings.EVENTS_KEEPALIVE)
+                    except asyncio.TimeoutError:
+                        yield ": keepalive\n\n"
+                        continue
+                    yield format_event(event)
+                    if event is RESYNC:
+                        break
+            finally:
+                change_feed.unsubscribe(subscriber)
+
+        return StreamingResponse(stream(), media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+events_router = EventsRouter().router
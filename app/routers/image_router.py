@@ -1,5 +1,7 @@
 # app/routers/image_router.py
-from fastapi import Depends
+from typing import Optional
+
+from fastapi import Depends, Header, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.databases.postgres import get_db
@@ -7,7 +9,8 @@ from app.routers.base import BaseRouter
 from app.models.postgres import Image
 from app.services.postgres import ImageService
 from app.schemas.postgres import (
-    ImageCreate, ImageRead, ImagePatch, ImageDelete, ImagePaginationRead
+    ImageCreate, ImageRead, ImagePatch, ImageDelete, ImagePaginationRead,
+    ImageReadRelation, ImagePaginationReadRelation
 )
 
 
@@ -22,13 +25,19 @@ class ImageRouter(BaseRouter):
             read_schema=ImageRead,
             patch_schema=ImagePatch,
             delete_schema=ImageDelete,
-            pagination_schema=ImagePaginationRead
+            pagination_schema=ImagePaginationRead,
+            read_schema_relation=ImageReadRelation,
+            pagination_schema_relation=ImagePaginationReadRelation
         )
 
     async def create(self, data: ImageCreate, db: AsyncSession = Depends(get_db)):
         """Создание записи"""
         return await super().create(data, db)
 
-    async def patch(self, id: int, data: ImagePatch, db: AsyncSession = Depends(get_db)):
+    async def patch(
+        self, id: int, data: ImagePatch, response: Response,
+        if_match: Optional[str] = Header(None, description="ETag from GET, update only if record is unchanged"),
+        db: AsyncSession = Depends(get_db)
+    ):
         """Обновление записи"""
-        return await super().patch(id, data, db)
+        return await super().patch(id, data, response, if_match, db)
@@ -0,0 +1,39 @@
+# app/routers/import_router.py
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.databases.postgres import get_db
+from app.services.import_service import CATALOGS, ImportService
+
+
+class ImportRouter:
+    """Загрузка дампов каталога (CSV/NDJSON) через COPY"""
+
+    def __init__(self):
+        self.prefix = "/import"
+        self.tags = ["import"]
+
+        self.router = APIRouter(prefix=self.prefix, tags=self.tags)
+        self.setup_routes()
+
+    def setup_routes(self):
+        self.router.add_api_route("/{table}", self.import_catalog, methods=["POST"], response_model=dict)
+
+    async def import_catalog(
+            self, table: str, file: UploadFile = File(...),
+            format: str = Query(None, pattern="^(csv|ndjson)$", description="по умолчанию - по расширению файла"),
+            db: AsyncSession = Depends(get_db)
+    ):
+        """Загрузка дампа codes/names: COPY во временную таблицу и одно слияние"""
+        if table not in CATALOGS:
+            raise HTTPException(status_code=404, detail=f"Import is not supported for {table}")
+        fmt = format or ('ndjson' if (file.filename or '').endswith(('.ndjson', '.jsonl')) else 'csv')
+        try:
+            return await ImportService.import_file(table, file.file, fmt, db)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Import failed: {str(e)}")
+
+
+import_router = ImportRouter().router
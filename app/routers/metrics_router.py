@@ -0,0 +1,36 @@
+# app/routers/metrics_router.py
+from fastapi import APIRouter
+
+from app.cache import cache_stats
+from app.databases.postgres import engine
+from app.databases.replicas import replicas
+
+
+class MetricsRouter:
+    """Метрики процесса (кэши, пул соединений)"""
+
+    def __init__(self):
+        self.prefix = "/metrics"
+        self.tags = ["metrics"]
+
+        self.router = APIRouter(prefix=self.prefix, tags=self.tags)
+        self.setup_routes()
+
+    def setup_routes(self):
+        self.router.add_api_route("/cache", self.cache, methods=["GET"], response_model=dict)
+        self.router.add_api_route("/pool", self.pool, methods=["GET"], response_model=dict)
+
+    async def cache(self):
+        """Статистика кэшей этого воркера: размер, попадания, промахи, hit_ratio, вытеснения"""
+        return cache_stats()
+
+    async def pool(self):
+        """
+        Пулы соединений postgres этого воркера (primary и реплики): занятые соединения, overflow,
+        время ожидания соединения (среднее, максимум, гистограмма) и таймауты; отставание реплик
+        """
+        return {'primary': engine.sync_engine.pool.stats(), 'replicas': replicas.stats(),
+                'replica_fallbacks': replicas.fallbacks}
+
+
+metrics_router = MetricsRouter().router
@@ -1,5 +1,7 @@
 # app/routers/name_router.py
-from fastapi import Depends
+from typing import Optional
+
+from fastapi import Depends, Header, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.databases.postgres import get_db
@@ -7,7 +9,8 @@ from app.routers.base import BaseRouter
 from app.models.postgres import Name
 from app.services.postgres import NameService
 from app.schemas.postgres import (
-    NameCreate, NameRead, NamePatch, NameDelete, NamePaginationRead
+    NameClaimRead, NameCreate, NameRead, NamePatch, NameDelete, NamePaginationRead,
+    NameReadRelation, NamePaginationReadRelation
 )
 
 
@@ -22,13 +25,20 @@ class NameRouter(BaseRouter):
             read_schema=NameRead,
             patch_schema=NamePatch,
             delete_schema=NameDelete,
-            pagination_schema=NamePaginationRead
+            pagination_schema=NamePaginationRead,
+            read_schema_relation=NameReadRelation,
+            pagination_schema_relation=NamePaginationReadRelation,
+            claim_schema=NameClaimRead
         )
 
     async def create(self, data: NameCreate, db: AsyncSession = Depends(get_db)):
         """Создание записи"""
         return await super().create(data, db)
 
-    async def patch(self, id: int, data: NamePatch, db: AsyncSession = Depends(get_db)):
+    async def patch(
+        self, id: int, data: NamePatch, response: Response,
+        if_match: Optional[str] = Header(None, description="ETag from GET, update only if record is unchanged"),
+        db: AsyncSession = Depends(get_db)
+    ):
         """Обновление записи"""
-        return await super().patch(id, data, db)
+        return await super().patch(id, data, response, if_match, db)
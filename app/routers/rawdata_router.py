@@ -1,13 +1,22 @@
 # app/routers/rawdata_router.py
-from fastapi import Depends
-from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from typing import List, Optional
 
-from app.databases.postgres import get_db
+from fastapi import Depends, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import settings
+from app.databases.postgres import get_db, get_sessionmaker
+from app.databases.replicas import get_db_read
 from app.routers.base import BaseRouter
 from app.models.postgres import Rawdata
 from app.services.postgres import RawService
+from app.services.version_service import VersionService
 from app.schemas.postgres import (
-    RawdataCreate, RawdataRead, RawdataPatch, RawdataDelete, RawdataPaginationRead
+    RawdataCreate, RawdataRead, RawdataPatch, RawdataDelete, RawdataPaginationRead, RawdataFtsPaginationRead,
+    RawdataReadRelation, RawdataPaginationReadRelation, RawdataUpsert, RawdataUpsertResult,
+    RawdataChangedPaginationRead, RawdataVersionRead
 )
 
 
@@ -22,13 +31,174 @@ class RawdataRouter(BaseRouter):
             read_schema=RawdataRead,
             patch_schema=RawdataPatch,
             delete_schema=RawdataDelete,
-            pagination_schema=RawdataPaginationRead
+            pagination_schema=RawdataPaginationRead,
+            read_schema_relation=RawdataReadRelation,
+            pagination_schema_relation=RawdataPaginationReadRelation
+        )
+
+    def setup_routes(self):
+        """Маршруты rawdata регистрируются раньше /{id}"""
+        self.router.add_api_route(
+            "/fts", self.full_text_search, methods=["GET"], response_model=RawdataFtsPaginationRead
+        )
+        self.router.add_api_route("", self.put, methods=["PUT"], response_model=RawdataUpsertResult)
+        self.router.add_api_route(
+            "/changed", self.get_changed, methods=["GET"], response_model=RawdataChangedPaginationRead
+        )
+        self.router.add_api_route("/history/compact", self.compact_history, methods=["POST"], response_model=dict)
+        self.router.add_api_route(
+            "/history/{name_id}", self.get_versions, methods=["GET"], response_model=List[RawdataVersionRead]
         )
+        self.router.add_api_route("/history/{name_id}/diff", self.diff_versions, methods=["GET"])
+        self.router.add_api_route("/history/{name_id}/{version}", self.get_version, methods=["GET"])
+        self.router.add_api_route("/dictionaries", self.train_dictionary, methods=["POST"], response_model=dict)
+        self.router.add_api_route("/dictionaries/{id}", self.get_dictionary, methods=["GET"])
+        self.router.add_api_route("/compress", self.compress, methods=["POST"], response_model=dict)
+        self.router.add_api_route("/archive", self.archive, methods=["POST"], response_model=dict)
+        self.router.add_api_route("/{id}/body", self.get_body, methods=["GET"], response_class=StreamingResponse)
+        super().setup_routes()
+
+    async def full_text_search(
+        self, q: str = Query(..., min_length=1, description="websearch_to_tsquery syntax"),
+        page_size: int = Query(10, ge=1, le=100),
+        after: Optional[str] = Query(None, description="Keyset cursor"),
+        db: AsyncSession = Depends(get_db_read)
+    ):
+        """Полнотекстовый поиск по body_html"""
+        try:
+            return await self.service.full_text_search(q, after, page_size, db)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    async def get_body(
+        self, id: int, accept_encoding: Optional[str] = Header(None),
+        zstd_dictionary: Optional[int] = Header(None, description="Id of a dictionary the client already has"),
+        db: AsyncSession = Depends(get_db_read), session_factory: async_sessionmaker = Depends(get_sessionmaker)
+    ):
+        """
+        body_html записи потоком (text/html) частями RAWDATA_BODY_CHUNK_SIZE символов.
+        сжатая запись отдается как есть с Content-Encoding: zstd, если клиент принимает zstd
+        и у него есть словарь записи (заголовок Zstd-Dictionary, словарь - /rawdata/dictionaries/{id})
+        """
+        packed = await self.service.get_packed_body(id, db)
+        if packed is not None:
+            data, dict_id = packed
+            if 'zstd' in (accept_encoding or '') and dict_id in (None, zstd_dictionary):
+                headers = {"Content-Encoding": "zstd", "Vary": "Accept-Encoding"}
+                if dict_id is not None:
+                    headers["Zstd-Dictionary"] = str(dict_id)
+                return Response(data, media_type="text/html; charset=utf-8", headers=headers)
+            return Response(await self.service.unpack_body(packed, db), media_type="text/html; charset=utf-8",
+                            headers={"Vary": "Accept-Encoding"})
+        archived = await self.service.get_archived_body(id, db)
+        if archived is not None:
+            return Response(archived, media_type="text/html; charset=utf-8")
+        stream = self.service.stream_body(id, session_factory, settings.RAWDATA_BODY_CHUNK_SIZE)
+        try:
+            first = await anext(stream)
+        except StopAsyncIteration:
+            raise HTTPException(status_code=404, detail="Record not found")
+
+        async def body():
+            try:
+                yield first
+                async for chunk in stream:
+                    yield chunk
+            finally:
+                await stream.aclose()
+
+        return StreamingResponse(body(), media_type="text/html; charset=utf-8")
+
+    async def put(self, data: RawdataUpsert, db: AsyncSession = Depends(get_db)):
+        """
+        Создание или замена body_html записи по name_id (повторный обход страницы).
+        changed false - содержимое не изменилось, запись не перезаписывалась
+        """
+        result = await self.service.put(data, db)
+        return self.bulk_response(result)
+
+    async def get_changed(
+        self, since: datetime = Query(..., description="content_changed_at > since"),
+        page_size: int = Query(100, ge=1, le=1000),
+        after: Optional[str] = Query(None, description="Keyset cursor"),
+        db: AsyncSession = Depends(get_db_read)
+    ):
+        """Записи (name_id), содержимое которых действительно изменилось после since"""
+        try:
+            return await self.service.get_changed(since, after, page_size, db)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    async def get_versions(self, name_id: int, db: AsyncSession = Depends(get_db_read)):
+        """История body_html страницы name_id"""
+        return await VersionService.get_versions(name_id, db)
+
+    async def get_version(self, name_id: int, version: int, db: AsyncSession = Depends(get_db_read)):
+        """body_html версии version (снимок и дельты до нее)"""
+        text = await VersionService.get_text(name_id, version, db)
+        if text is None:
+            raise HTTPException(status_code=404, detail="Version not found")
+        return Response(text, media_type="text/html; charset=utf-8")
+
+    async def diff_versions(
+        self, name_id: int, from_version: int = Query(..., ge=1), to_version: int = Query(..., ge=1),
+        db: AsyncSession = Depends(get_db_read)
+    ):
+        """unified diff двух версий body_html, строки - части html по концам тегов"""
+        diff = await VersionService.diff(name_id, from_version, to_version, db)
+        if diff is None:
+            raise HTTPException(status_code=404, detail="Version not found")
+        return Response(diff, media_type="text/plain; charset=utf-8")
+
+    async def compact_history(
+        self, limit: int = Query(settings.RAWDATA_VERSION_COMPACT_BATCH, ge=1, le=10000),
+        db: AsyncSession = Depends(get_db)
+    ):
+        """Компакция истории: удаление версий старше RAWDATA_VERSION_RETENTION_DAYS и перестроение цепочек"""
+        return await VersionService.compact(limit, db)
+
+    async def train_dictionary(
+        self, samples: int = Query(settings.RAWDATA_ZSTD_DICT_SAMPLES, ge=10, le=100000),
+        db: AsyncSession = Depends(get_db)
+    ):
+        """Обучение словаря zstd на последних несжатых записях, словарь становится текущим"""
+        result = await self.service.train_dictionary(samples, db)
+        if not result['success']:
+            raise HTTPException(status_code=400, detail=result['message'])
+        return result
+
+    async def get_dictionary(self, id: int, db: AsyncSession = Depends(get_db_read)):
+        """Словарь zstd для распаковки body_html, полученного с Content-Encoding: zstd"""
+        obj = await self.service.get_dictionary(id, db)
+        if obj is None:
+            raise HTTPException(status_code=404, detail="Dictionary not found")
+        return Response(obj.data, media_type="application/octet-stream",
+                        headers={"Cache-Control": "public, max-age=31536000, immutable"})
+
+    async def compress(self, limit: int = Query(1000, ge=1, le=100000), db: AsyncSession = Depends(get_db)):
+        """Сжатие записей, сохраненных до включения RAWDATA_COMPRESSION"""
+        result = await self.service.compress_existing(limit, db)
+        if not result['success']:
+            raise HTTPException(status_code=400, detail=result['message'])
+        return result
+
+    async def archive(
+        self, limit: int = Query(settings.ARCHIVE_BATCH, ge=1, le=5000), db: AsyncSession = Depends(get_db)
+    ):
+        """Перенос в холодный архив тел записей, не менявшихся ARCHIVE_AFTER_DAYS['rawdata'] дней"""
+        result = await self.service.archive(limit, db)
+        if not result['success']:
+            raise HTTPException(status_code=400, detail=result['message'])
+        return result
 
     async def create(self, data: RawdataCreate, db: AsyncSession = Depends(get_db)):
         """Создание записи"""
         return await super().create(data, db)
 
-    async def patch(self, id: int, data: RawdataPatch, db: AsyncSession = Depends(get_db)):
+    async def patch(
+        self, id: int, data: RawdataPatch, response: Response,
+        if_match: Optional[str] = Header(None, description="ETag from GET, update only if record is unchanged"),
+        db: AsyncSession = Depends(get_db)
+    ):
         """Обновление записи"""
-        return await super().patch(id, data, db)
+        return await super().patch(id, data, response, if_match, db)
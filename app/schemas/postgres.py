@@ -3,17 +3,64 @@
     Pydanctic models - для простых случаев - просто скинь slqalchemy модели в LLM
     она тебе за 2 секунды все сделает
 """
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field, model_validator
+from typing import Any, Dict, Literal, Optional, List
 from datetime import datetime
 
 
 # Базовые классы схем
 class PaginationBase(BaseModel):
-    total: int
-    page: int
+    # в режиме keyset-пагинации (?after=) total/page/pages не считаются
+    total: Optional[int] = None
+    page: Optional[int] = None
     page_size: int
-    pages: int
+    pages: Optional[int] = None
+    next_cursor: Optional[str] = None
+
+
+class BulkItemResult(BaseModel):
+    index: int
+    id: Optional[int] = None
+    # created | existing | invalid | error
+    status: str
+    error: Optional[str] = None
+
+
+class BulkResult(BaseModel):
+    total: int
+    created: int
+    existing: int
+    failed: int
+    items: List[BulkItemResult]
+
+
+# массовые PATCH / DELETE по фильтру
+class FilterCondition(BaseModel):
+    field: str
+    op: Literal['eq', 'ne', 'lt', 'le', 'gt', 'ge', 'in', 'like', 'ilike', 'is_null', 'not_null'] = 'eq'
+    value: Any = None
+
+
+class BulkFilter(BaseModel):
+    # либо список id, либо условия where (объединяются через AND)
+    ids: Optional[List[int]] = Field(None, min_length=1)
+    where: Optional[List[FilterCondition]] = Field(None, min_length=1)
+
+    @model_validator(mode='after')
+    def check_filter(self):
+        if (self.ids is None) == (self.where is None):
+            raise ValueError('exactly one of ids or where is required')
+        return self
+
+
+class BulkPatch(BulkFilter):
+    values: Dict[str, Any] = Field(..., min_length=1)
+
+
+class BulkAffected(BaseModel):
+    success: bool
+    affected: int
+    message: str
 
 
 # Code схемы
@@ -28,6 +75,7 @@ class CodeRead(BaseModel):
     code: str
     url: str
     status: str
+    lease_expires_at: Optional[datetime] = None
     created_at: datetime
     updated_at: datetime
 
@@ -35,6 +83,11 @@ class CodeRead(BaseModel):
         from_attributes = True
 
 
+class CodeClaimRead(CodeRead):
+    # токен аренды только в ответе /claim: complete / fail принимаются с ним
+    lease_token: str
+
+
 class CodePatch(BaseModel):
     code: Optional[str] = None
     url: Optional[str] = None
@@ -63,6 +116,7 @@ class NameRead(BaseModel):
     name: str
     url: str
     status: str
+    lease_expires_at: Optional[datetime] = None
     created_at: datetime
     updated_at: datetime
 
@@ -70,6 +124,10 @@ class NameRead(BaseModel):
         from_attributes = True
 
 
+class NameClaimRead(NameRead):
+    lease_token: str
+
+
 class NamePatch(BaseModel):
     code_id: Optional[int] = None
     name: Optional[str] = None
@@ -94,7 +152,12 @@ class RawdataCreate(BaseModel):
 class RawdataRead(BaseModel):
     id: int
     name_id: int
-    body_html: Optional[str]
+    # в списках не загружается (list_deferred): поле отсутствует в ответе
+    body_html: Optional[str] = None
+    body_hash: Optional[str] = None
+    content_changed_at: Optional[datetime] = None
+    # тело в холодном архиве, body_html читается из архива
+    archived_at: Optional[datetime] = None
     created_at: datetime
     updated_at: datetime
 
@@ -107,6 +170,44 @@ class RawdataPatch(BaseModel):
     body_html: Optional[str] = None
 
 
+class RawdataUpsert(BaseModel):
+    name_id: int
+    body_html: Optional[str] = None
+
+
+class RawdataUpsertResult(BaseModel):
+    success: bool
+    # False - содержимое совпало с сохраненным, запись не изменялась
+    changed: bool
+    data: RawdataRead
+    message: str
+
+
+class RawdataChangedRead(BaseModel):
+    id: int
+    name_id: int
+    body_hash: Optional[str]
+    content_changed_at: datetime
+
+
+class RawdataChangedPaginationRead(BaseModel):
+    items: List[RawdataChangedRead]
+    page_size: int
+    next_cursor: Optional[str] = None
+
+
+class RawdataVersionRead(BaseModel):
+    version: int
+    # 0 - полный снимок, иначе номер дельты после снимка
+    chain: int
+    size: int
+    body_hash: Optional[str]
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
 class RawdataDelete(BaseModel):
     id: int
 
@@ -115,6 +216,19 @@ class RawdataPaginationRead(PaginationBase):
     items: List[RawdataRead]
 
 
+class RawdataFtsRead(BaseModel):
+    id: int
+    name_id: int
+    rank: float
+    headline: Optional[str]
+
+
+class RawdataFtsPaginationRead(BaseModel):
+    items: List[RawdataFtsRead]
+    page_size: int
+    next_cursor: Optional[str] = None
+
+
 # Image схемы
 class ImageCreate(BaseModel):
     name_id: int
@@ -146,3 +260,38 @@ class ImageDelete(BaseModel):
 
 class ImagePaginationRead(PaginationBase):
     items: List[ImageRead]
+
+
+# Схемы со связями (?include=). связи, которые не запрошены, в ответ не попадают
+class CodeReadRelation(CodeRead):
+    names: Optional[List[NameRead]] = None
+
+
+class NameReadRelation(NameRead):
+    code: Optional[CodeRead] = None
+    raw_data: Optional[RawdataRead] = None
+    images: Optional[List[ImageRead]] = None
+
+
+class RawdataReadRelation(RawdataRead):
+    name: Optional[NameRead] = None
+
+
+class ImageReadRelation(ImageRead):
+    name: Optional[NameRead] = None
+
+
+class CodePaginationReadRelation(PaginationBase):
+    items: List[CodeReadRelation]
+
+
+class NamePaginationReadRelation(PaginationBase):
+    items: List[NameReadRelation]
+
+
+class RawdataPaginationReadRelation(PaginationBase):
+    items: List[RawdataReadRelation]
+
+
+class ImagePaginationReadRelation(PaginationBase):
+    items: List[ImageReadRelation]
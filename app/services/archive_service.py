@@ -0,0 +1,96 @@
+# app/services/archive_service.py
+"""
+    холодный архив body_html rawdata: тела записей старше ARCHIVE_AFTER_DAYS дней переносятся в коллекцию
+    Mongo ARCHIVE_COLLECTION (документ на перенос, ключ '{таблица}:{id}:{nonce}'), в postgres остаются archived_at
+    и archive_ref. несжатое тело сжимается zlib, сжатое zstd переносится как есть вместе с id словаря.
+    сжатие и распаковка выполняются в потоке (asyncio.to_thread). ключ каждого переноса свой: удаление документа
+    (перенос не состоялся, запись получила новое содержимое) не затрагивает документ другого переноса
+"""
+import asyncio
+import uuid
+import zlib
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Sequence
+
+from pymongo import ReplaceOne
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import settings
+from app.databases.mongo import get_database, get_mongodb
+from app.services.compression_service import CompressionService
+
+CODEC_ZLIB = 'zlib'
+CODEC_ZSTD = 'zstd'
+
+
+def archive_key(table: str, id: int) -> str:
+    return f'{table}:{id}:{uuid.uuid4().hex}'
+
+
+class ArchiveService:
+    """Перенос тел в архив и чтение из него"""
+
+    @staticmethod
+    async def get_collection():
+        database = await get_database(await get_mongodb())
+        return database[settings.ARCHIVE_COLLECTION]
+
+    @classmethod
+    async def store(cls, table: str, rows: Sequence[Any]) -> List[str]:
+        """
+        документы архива для строк (id, name_id, body_html, body_zstd, body_dict_id, body_hash).
+        :return: ключи новых документов в порядке rows
+        """
+        def run():
+            return [zlib.compress(row.body_html.encode()) if row.body_zstd is None else row.body_zstd
+                    for row in rows]
+
+        archived_at = datetime.now(timezone.utc)
+        keys = [archive_key(table, row.id) for row in rows]
+        requests = [ReplaceOne({'_id': key}, {
+            'table': table, 'row_id': row.id, 'name_id': row.name_id, 'body_hash': row.body_hash,
+            'codec': CODEC_ZLIB if row.body_zstd is None else CODEC_ZSTD, 'dict_id': row.body_dict_id,
+            'data': data, 'archived_at': archived_at
+        }, upsert=True) for key, row, data in zip(keys, rows, await asyncio.to_thread(run))]
+        collection = await cls.get_collection()
+        await collection.bulk_write(requests, ordered=False)
+        return keys
+
+    @classmethod
+    async def remove(cls, keys: Sequence[str]):
+        collection = await cls.get_collection()
+        await collection.delete_many({'_id': {'$in': list(keys)}})
+
+    @classmethod
+    async def load(cls, keys: Sequence[str], session: AsyncSession) -> Dict[str, str]:
+        """ тексты по ключам архива, отсутствующих документов в результате нет """
+        collection = await cls.get_collection()
+        documents = await collection.find({'_id': {'$in': list(keys)}}).to_list(length=None)
+        packed = [document for document in documents if document['codec'] == CODEC_ZSTD]
+        texts = await CompressionService.decompress(
+            [(document['data'], document['dict_id']) for document in packed], session
+        ) if packed else []
+        bodies = {document['_id']: text for document, text in zip(packed, texts)}
+        plain = [document for document in documents if document['codec'] == CODEC_ZLIB]
+
+        def run():
+            return [zlib.decompress(document['data']).decode() for document in plain]
+
+        bodies.update(zip((document['_id'] for document in plain), await asyncio.to_thread(run)))
+        return bodies
+
+
+async def run_archiver(session_factory: async_sessionmaker, interval: float):
+    """ RawService.archive каждые interval секунд, пока задачу не отменят """
+    from app.services.postgres import RawService
+
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with session_factory() as session:
+                result = await RawService.archive(settings.ARCHIVE_BATCH, session)
+                removed = await RawService.remove_archive_orphans(settings.ARCHIVE_BATCH, session)
+            if result.get('archived') or removed:
+                print(f"Rawdata archiver: {result['message']}, orphans removed: {removed}")
+        except Exception as e:
+            print(f"Rawdata archiver error: {e}")
@@ -1,13 +1,18 @@
 # app/services/base.py
 from abc import ABCMeta
-from typing import Any, Dict, List, Optional
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence, Union
 
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.repositories.base import ModelType, Repository
+from app import cache
+from app.config import settings
+from app.models.postgres import Tombstone
+from app.repositories.base import (STATUS_DONE, STATUS_ERROR, STATUS_PENDING, ModelType, Repository)
+from app.repositories.postgres import TombstoneRepository
 from app.service_registry import register_service
-from app.utils import parse_unique_violation2
+from app.utils import EPOCH, check_cursor_key, decode_cursor, encode_cursor, parse_unique_violation2
 
 
 class ServiceMeta(ABCMeta):
@@ -27,6 +32,64 @@ class Service(metaclass=ServiceMeta):
     """
     __abstract__ = True
     repository = Repository
+    # схема чтения записей в кэше get_by_id (app.cache). None - записи не кэшируются
+    read_schema = None
+
+    @classmethod
+    def get_entity_cache(cls, model: ModelType) -> Optional[cache.TTLCache]:
+        if cls.read_schema is None or not settings.ENTITY_CACHE_ENABLED:
+            return None
+        return cache.get_cache(f'entity:{model.__tablename__}', settings.ENTITY_CACHE_MAXSIZE,
+                               settings.ENTITY_CACHE_TTL)
+
+    @classmethod
+    def invalidate(cls, model: ModelType, ids: Optional[Sequence[int]] = None, cascade: bool = False):
+        """
+        после записи: сброс кэша get_by_id (ids None - вся таблица) и новая версия таблицы для кэша ответов.
+        cascade - и таблицы, записи которых удалены каскадом
+        """
+        cache.table_changed(model.__tablename__, ids)
+        if cascade:
+            for table in cls.repository.get_cascade_tables(model):
+                cache.table_changed(table)
+
+    @classmethod
+    async def prepare_write(
+        cls, rows: List[dict], model: ModelType, session: AsyncSession, update: bool = False
+    ) -> List[dict]:
+        """
+        Переопределяемый метод.
+        значения записей перед INSERT (update - перед UPDATE), например сжатие больших колонок.
+        По умолчанию — без изменений.
+        """
+        return rows
+
+    @classmethod
+    async def prepare_read(cls, items: Sequence[Any], model: ModelType, session: AsyncSession):
+        """
+        Переопределяемый метод.
+        обработка прочитанных записей перед ответом, например распаковка сжатых колонок.
+        По умолчанию — без изменений.
+        """
+
+    @classmethod
+    def check_search_field(cls, field_name: str, model: ModelType):
+        """
+        Переопределяемый метод.
+        ValueError, если поиск подстроки по полю не дает полного результата.
+        По умолчанию — без проверки.
+        """
+
+    @classmethod
+    async def prepare_export(
+        cls, rows: Sequence[Any], columns: Sequence[str], model: ModelType, session: AsyncSession
+    ) -> Sequence[Any]:
+        """
+        Переопределяемый метод.
+        порция строк выгрузки (кортежи значений columns) перед кодированием, аналог prepare_read.
+        По умолчанию — без изменений.
+        """
+        return rows
 
     @classmethod
     async def get_or_create(
@@ -41,22 +104,27 @@ class Service(metaclass=ServiceMeta):
             for key, value in data_dict.items():
                 if not key.endswith('s'):  # Исключаем отношения (обычно заканчиваются на 's')
                     search_data[key] = value
+            data_dict, = await cls.prepare_write([data_dict], model, session)
+
+            # вставка или существующая запись по уникальному ключу одним запросом
+            instance = await cls.repository.insert_or_get(data_dict, model, session)
+            if instance is not None:
+                # созданная или существующая - без лишнего запроса не различить, версия таблицы меняется всегда
+                cls.invalidate(model, ())
+                await cls.prepare_read([instance], model, session)
+                return instance
 
             # поиск существующей записи
             instance = await cls.repository.get_by_fields(search_data, model, session)
             if instance:
+                await cls.prepare_read([instance], model, session)
                 return instance
 
             # запись не найдена - создаем новую
             obj = model(**data_dict)
             instance = await cls.repository.create(obj, session)
-            await session.flush()
-            await session.refresh(instance)
-
-            if not instance.id:
-                await session.commit()
-                await session.refresh(instance)
-
+            cls.invalidate(model, ())
+            await cls.prepare_read([instance], model, session)
             return instance
 
         except IntegrityError as e:
@@ -75,26 +143,74 @@ class Service(metaclass=ServiceMeta):
             await session.rollback()
             raise Exception(f"Service error: {str(e)}")
 
+    @classmethod
+    async def bulk_get_or_create(
+        cls, rows: List[dict], model: ModelType, session: AsyncSession
+    ) -> List[Dict[str, Any]]:
+        """
+        get_or_create для порции записей в одной транзакции.
+        ошибка базы данных откатывает всю порцию, все ее записи получают статус error
+        :return:    [{'id':, 'status':, 'error':}, ...] в порядке rows
+        """
+        try:
+            rows = await cls.prepare_write(rows, model, session)
+            statuses = await cls.repository.bulk_insert_or_get(rows, model, session)
+            await session.commit()
+            if any(status == 'created' for _, status in statuses):
+                cls.invalidate(model, ())
+        except Exception as e:
+            await session.rollback()
+            error = str(getattr(e, 'orig', e))
+            return [{'id': None, 'status': 'error', 'error': error} for _ in rows]
+        return [{'id': id, 'status': status, 'error': None} if id is not None else
+                {'id': None, 'status': 'error', 'error': 'conflicting record not found'}
+                for id, status in statuses]
+
     @classmethod
     async def update_or_create(
             cls, lookup: Dict[str, Any], defaults: Dict[str, Any], model: ModelType, session: AsyncSession
             ) -> ModelType:
         """ ищет запись по lookup и обновляет значениями default """
-        result = await cls.repository.get_by_fields(lookup, model, session)
-        if result:
-            return await cls.repository.patch(result, defaults, session)
-        else:
-            data = {**lookup, **defaults}
-            obj = model(**data)
-            return await cls.repository.create(obj, session)
+        result, _ = await cls.upsert(lookup, defaults, model, session)
+        return result
+
+    @classmethod
+    async def upsert(
+            cls, lookup: Dict[str, Any], defaults: Dict[str, Any], model: ModelType, session: AsyncSession
+            ) -> tuple:
+        """
+        update_or_create с признаком изменения: (запись или строка ошибки, changed).
+        changed False - значения совпали с текущими (hash_column репозитория), UPDATE не выполнялся
+        """
+        defaults, = await cls.prepare_write([defaults], model, session, update=True)
+        changed = True
+        # lookup по уникальному ключу - INSERT ... ON CONFLICT DO UPDATE одним запросом
+        result = await cls.repository.upsert(lookup, defaults, model, session)
+        if isinstance(result, tuple):
+            result, changed = result
+        elif result is None:
+            result = await cls.repository.get_by_fields(lookup, model, session)
+            if result:
+                result = await cls.repository.patch(result, defaults, session)
+            else:
+                data = {**lookup, **defaults}
+                obj = model(**data)
+                result = await cls.repository.create(obj, session)
+        if isinstance(result, model):
+            if changed:
+                cls.invalidate(model, [result.id])
+            await cls.prepare_read([result], model, session)
+        return result, changed
     
     @classmethod
     async def get_all(
-            cls, page: int, page_size: int, model: ModelType, session: AsyncSession
+            cls, page: int, page_size: int, model: ModelType, session: AsyncSession, include: Sequence[str] = (),
+            columns: Optional[Sequence[str]] = None
             ) -> Dict[str, Any]:
         """Получение всех записей с пагинацией"""
         skip = (page - 1) * page_size
-        items, total = await cls.repository.get_all(skip, page_size, model, session)
+        items, total = await cls.repository.get_all(skip, page_size, model, session, include, columns)
+        await cls.prepare_read(items, model, session)
         return {"items": items, "total": total, "page": page, "page_size": page_size,
                 "has_next": skip + len(items) < total, "has_prev": page > 1}
     
@@ -107,29 +223,63 @@ class Service(metaclass=ServiceMeta):
 
     @classmethod
     async def get_by_id(
-            cls, id: int, model: ModelType, session: AsyncSession
+            cls, id: int, model: ModelType, session: AsyncSession, include: Sequence[str] = (),
+            columns: Optional[Sequence[str]] = None
             ) -> Optional[ModelType]:
-        """Получение записи по ID"""
-        return await cls.repository.get_by_id(id, model, session)
+        """
+        Получение записи по ID. с read_schema, без include и columns - read_schema (из кэша, если он включен,
+        или из БД) независимо от состояния кэша, иначе - запись модели
+        """
+        if cls.read_schema is None or include or columns is not None:
+            instance = await cls.repository.get_by_id(id, model, session, include, columns)
+            if instance is not None:
+                await cls.prepare_read([instance], model, session)
+            return instance
+        entity_cache = cls.get_entity_cache(model)
+        data = entity_cache.get(id) if entity_cache is not None else None
+        if data is None:
+            generation = entity_cache.generation if entity_cache is not None else None
+            instance = await cls.repository.get_by_id(id, model, session)
+            if instance is None:
+                return None
+            await cls.prepare_read([instance], model, session)
+            data = cls.read_schema.model_validate(instance).model_dump()
+            if entity_cache is not None and not session.info.get('replica'):
+                entity_cache.set(id, data, generation)
+        return cls.read_schema.model_validate(data)
 
     @classmethod
     async def patch(
-        cls, id: int, data: Any, model: ModelType, session: AsyncSession
+        cls, id: int, data: Any, model: ModelType, session: AsyncSession, version: Optional[datetime] = None
     ) -> dict:
         """
-        Редактирование записи по ID
+        Редактирование записи по ID одним запросом UPDATE ... RETURNING.
+        version - ожидаемый updated_at (If-Match), при несовпадении error_type precondition_failed.
+        changed False - значения совпали с текущими (hash_column репозитория), запись не изменялась
         """
-        existing_item = await cls.repository.get_by_id(id, model, session)
-        if not existing_item:
-            return {'success': False, 'message': f'Редактируемая запись {id} не найдена', 'error_type': 'not_found'}
-
         data_dict = data.model_dump(exclude_unset=True)
         if not data_dict:
+            if not await cls.repository.get_by_id(id, model, session):
+                return {'success': False, 'message': f'Редактируемая запись {id} не найдена',
+                        'error_type': 'not_found'}
             return {'success': False, 'message': 'Нет данных для обновления', 'error_type': 'no_data'}
 
-        result = await cls.repository.patch(existing_item, data_dict, session)
+        data_dict, = await cls.prepare_write([data_dict], model, session, update=True)
+        result = await cls.repository.patch_by_id(id, data_dict, model, session, version)
 
-        if result == "unique_constraint_violation":
+        if result is None:
+            # запрос не изменил ни одной строки: записи нет, она изменена после чтения клиентом
+            # или новые значения совпадают с текущими
+            existing = await cls.repository.get_by_id(id, model, session)
+            if existing is None:
+                return {'success': False, 'message': f'Редактируемая запись {id} не найдена',
+                        'error_type': 'not_found'}
+            if version is not None and existing.updated_at != version:
+                return {'success': False, 'message': f'Запись {id} была изменена другим запросом',
+                        'error_type': 'precondition_failed'}
+            await cls.prepare_read([existing], model, session)
+            return {'success': True, 'data': existing, 'changed': False, 'message': f'Запись {id} не изменилась'}
+        elif result == "unique_constraint_violation":
             return {'success': False, 'message': 'Нарушение уникальности', 'error_type': 'unique_constraint_violation'}
         elif result == "foreign_key_violation":
             return {'success': False, 'message': 'Нарушение ссылочной целостности',
@@ -138,7 +288,9 @@ class Service(metaclass=ServiceMeta):
             return {'success': False, 'message': f'Ошибка базы данных: {result.split(":", 1)[1]}',
                     'error_type': 'database_error'}
         elif isinstance(result, model):
-            return {'success': True, 'data': result, 'message': f'Запись {id} успешно обновлена'}
+            cls.invalidate(model, [id])
+            await cls.prepare_read([result], model, session)
+            return {'success': True, 'data': result, 'changed': True, 'message': f'Запись {id} успешно обновлена'}
         else:
             return {'success': False, 'message': f'Неизвестная ошибка', 'error_type': 'unknown_error'}
 
@@ -146,24 +298,113 @@ class Service(metaclass=ServiceMeta):
     async def delete(
             cls, id: int, model: ModelType, session: AsyncSession
             ) -> dict:
-        """Удаление записи"""
-        instance = await cls.repository.get_by_id(id, model, session)
-        if instance:
-            result = await cls.repository.delete(instance, session)
-
-            if result == "foreign_key_violation":
-                return {'success': False, 'deleted_count': 0,
-                        'message': 'Невозможно удалить запись: на неё ссылаются другие объекты'}
-            elif isinstance(result, str) and result.startswith(('integrity_error:', 'database_error:')):
-                return {'success': False, 'deleted_count': 0,
-                        'message': f'Ошибка базы данных: {result.split(":", 1)[1]}'}
-            elif result is True:
-                return {'success': True, 'deleted_count': 1, 'message': f'Запись {id} удалена'}
-            else:
-                return {'success': False, 'deleted_count': 0, 'message': f'Запись {id} обнаружена, но не удалена.'}
-        else:
+        """Удаление записи, дочерние записи удаляются каскадом в базе данных"""
+        result = await cls.repository.delete_by_id(id, model, session)
+        if result is None:
             return {'success': False, 'deleted_count': 0, 'message': f'Запись {id} не найдена'}
+        elif result == "foreign_key_violation":
+            return {'success': False, 'deleted_count': 0,
+                    'message': 'Невозможно удалить запись: на неё ссылаются другие объекты'}
+        elif isinstance(result, str) and result.startswith(('integrity_error:', 'database_error:')):
+            return {'success': False, 'deleted_count': 0,
+                    'message': f'Ошибка базы данных: {result.split(":", 1)[1]}'}
+        elif result is True:
+            cls.invalidate(model, [id], cascade=True)
+            return {'success': True, 'deleted_count': 1, 'message': f'Запись {id} удалена'}
+        else:
+            return {'success': False, 'deleted_count': 0, 'message': f'Запись {id} обнаружена, но не удалена.'}
     
+    @classmethod
+    def get_bulk_filter(
+            cls, model: ModelType, ids: Optional[List[int]] = None, where: Sequence[dict] = ()
+            ) -> tuple:
+        """
+        условия массовой операции: список id или условия [{'field':, 'op':, 'value':}, ...] через AND.
+        ValueError если условие некорректно
+        """
+        if ids:
+            return (model.id.in_(ids),)
+        return tuple(cls.repository.get_filter_condition(condition['field'], condition.get('op', 'eq'),
+                                                         condition.get('value'), model)
+                     for condition in where)
+
+    @classmethod
+    def get_bulk_result(cls, result: Union[int, str], max_rows: int, action: str) -> dict:
+        """ ответ массовой операции в формате patch / delete """
+        if isinstance(result, int):
+            return {'success': True, 'affected': result, 'message': f'{action}: {result}'}
+        if result == 'too_many_rows':
+            return {'success': False, 'affected': 0, 'error_type': 'too_many_rows',
+                    'message': f'Условию соответствует больше {max_rows} записей, изменения отменены'}
+        if result == "unique_constraint_violation":
+            return {'success': False, 'affected': 0, 'error_type': result, 'message': 'Нарушение уникальности'}
+        if result == "foreign_key_violation":
+            return {'success': False, 'affected': 0, 'error_type': result,
+                    'message': 'Нарушение ссылочной целостности'}
+        return {'success': False, 'affected': 0, 'error_type': 'database_error',
+                'message': f'Ошибка базы данных: {result.split(":", 1)[-1]}'}
+
+    @classmethod
+    async def bulk_patch(
+            cls, where: tuple, values: Dict[str, Any], model: ModelType, session: AsyncSession, max_rows: int
+            ) -> dict:
+        """Редактирование всех записей, удовлетворяющих where, одним запросом"""
+        values, = await cls.prepare_write([values], model, session, update=True)
+        result = await cls.repository.bulk_update(where, values, model, session, max_rows)
+        if isinstance(result, int):
+            cls.invalidate(model)
+        return cls.get_bulk_result(result, max_rows, 'Обновлено записей')
+
+    @classmethod
+    async def bulk_delete(
+            cls, where: tuple, model: ModelType, session: AsyncSession, max_rows: int
+            ) -> dict:
+        """Удаление всех записей, удовлетворяющих where, одним запросом"""
+        result = await cls.repository.bulk_delete(where, model, session, max_rows)
+        if isinstance(result, int):
+            cls.invalidate(model, cascade=True)
+        return cls.get_bulk_result(result, max_rows, 'Удалено записей')
+
+    @classmethod
+    async def claim(
+            cls, limit: int, lease_seconds: float, model: ModelType, session: AsyncSession
+            ) -> List[ModelType]:
+        """Аренда до limit ожидающих (pending) записей, каждая запись достается одному обработчику"""
+        items = await cls.repository.claim(limit, lease_seconds, model, session)
+        if items:
+            cls.invalidate(model, [item.id for item in items])
+        return items
+
+    @classmethod
+    async def complete(cls, id: int, lease_token: str, model: ModelType, session: AsyncSession) -> dict:
+        """Запись обработана: in_progress -> done"""
+        return await cls.finish(id, lease_token, STATUS_DONE, model, session)
+
+    @classmethod
+    async def fail(cls, id: int, lease_token: str, retry: bool, model: ModelType, session: AsyncSession) -> dict:
+        """Ошибка обработки: in_progress -> pending (retry) или error"""
+        return await cls.finish(id, lease_token, STATUS_PENDING if retry else STATUS_ERROR, model, session)
+
+    @classmethod
+    async def finish(cls, id: int, lease_token: str, status: str, model: ModelType, session: AsyncSession) -> dict:
+        result = await cls.repository.finish(id, lease_token, status, model, session)
+        if result is not None:
+            cls.invalidate(model, [id])
+            return {'success': True, 'data': result, 'message': f'Запись {id}: {status}'}
+        if not await cls.repository.get_by_id(id, model, session):
+            return {'success': False, 'message': f'Запись {id} не найдена', 'error_type': 'not_found'}
+        return {'success': False,
+                'message': f'Запись {id} не в обработке (аренда истекла, не выдавалась или выдана с другим токеном)',
+                'error_type': 'not_leased'}
+
+    @classmethod
+    async def reap(cls, model: ModelType, session: AsyncSession) -> List[int]:
+        """Возврат в очередь записей с истекшей арендой"""
+        ids = await cls.repository.reap(model, session)
+        if ids:
+            cls.invalidate(model, ids)
+        return ids
+
     @classmethod
     async def get_by_field(
             cls, field_name: str, field_value: Any, session: AsyncSession, model: ModelType
@@ -172,18 +413,135 @@ class Service(metaclass=ServiceMeta):
         result = await cls.repository.get_by_fields({field_name: field_value}, model, session)
         return [result] if result else []
     
-    # app/services/base.py
-    # Добавь этот метод в класс Service
-    
     @classmethod
     async def search(
-            cls, field_name: str, search_value: str, page: int, page_size: int, model: ModelType, session: AsyncSession
+            cls, field_name: str, search_value: str, page: int, page_size: int, model: ModelType, session: AsyncSession,
+            mode: str = 'ilike', include: Sequence[str] = (), columns: Optional[Sequence[str]] = None
             ) -> Dict[str, Any]:
         """
         Упрощенный поиск с пагинацией
         """
+        cls.check_search_field(field_name, model)
         skip = (page - 1) * page_size
-        items, total = await cls.repository.search_by_field(field_name, search_value, skip, page_size, model, session)
+        items, total = await cls.repository.search_by_field(field_name, search_value, skip, page_size, model, session,
+                                                            mode, include, columns)
+        await cls.prepare_read(items, model, session)
         
         return {"items": items, "total": total, "page": page, "page_size": page_size,
-                "has_next": skip + len(items) < total, "has_prev": page > 1}
\ No newline at end of file
+                "has_next": skip + len(items) < total, "has_prev": page > 1}
+
+    @classmethod
+    async def search_all(
+            cls, field_name: str, search_value: str, model: ModelType, session: AsyncSession
+            ) -> List[ModelType]:
+        """
+        Поиск без пагинации
+        """
+        cls.check_search_field(field_name, model)
+        items, _ = await cls.repository.search_by_field(field_name, search_value, 0, None, model, session)
+        await cls.prepare_read(items, model, session)
+        return items
+
+    @classmethod
+    def get_export_filter(
+            cls, model: ModelType, updated_since: Optional[datetime] = None, field_name: Optional[str] = None,
+            value: Optional[str] = None
+            ) -> tuple:
+        """
+        условия выгрузки: updated_at >= updated_since и точное совпадение field_name = value.
+        ValueError если поля нет в модели
+        """
+        where = []
+        if updated_since is not None:
+            where.append(model.updated_at >= updated_since)
+        if field_name is not None:
+            if field_name not in model.__table__.columns:
+                raise ValueError(f'unknown field: {field_name}')
+            column = model.__table__.c[field_name]
+            try:
+                value = column.type.python_type(value) if value is not None else None
+            except (TypeError, ValueError):
+                raise ValueError(f'invalid value for {field_name}: {value}')
+            where.append(column.is_(None) if value is None else column == value)
+        return tuple(where)
+
+    @classmethod
+    async def get_keyset(
+            cls, after: Optional[str], page_size: int, model: ModelType, session: AsyncSession,
+            order_by: str = 'id', where: tuple = (), include: Sequence[str] = (),
+            columns: Optional[Sequence[str]] = None
+            ) -> Dict[str, Any]:
+        """
+        Получение записей с keyset-пагинацией: вместо OFFSET непрозрачный курсор after,
+        пустой курсор - первая страница. ValueError если курсор поврежден или от другой сортировки
+        """
+        if order_by not in cls.repository.keyset_orders:
+            raise ValueError(f'unknown order_by: {order_by}')
+        key = None
+        if after:
+            cursor_order, key = decode_cursor(after)
+            if cursor_order != order_by:
+                raise ValueError(f'cursor was issued for order_by={cursor_order}')
+            check_cursor_key(key, cls.repository.get_key_types(order_by, model))
+        items, next_key = await cls.repository.get_page(page_size, model, session, order_by, key, where, include,
+                                                        columns)
+        await cls.prepare_read(items, model, session)
+        return {"items": items, "page_size": page_size, "has_next": next_key is not None,
+                "next_cursor": encode_cursor(order_by, next_key) if next_key else None}
+
+    @classmethod
+    async def get_changes(
+            cls, since: Optional[datetime], cursor: Optional[str], limit: int, model: ModelType,
+            session: AsyncSession, columns: Optional[Sequence[str]] = None
+            ) -> Dict[str, Any]:
+        """
+        Инкрементальная синхронизация: записи в порядке (updated_at, id) и id удаленных записей (tombstones)
+        после позиции курсора, без курсора - начиная с since (без since - с начала).
+        next_cursor возвращается всегда: следующий запрос с ним вернет только новые изменения.
+        resync_required - позиция старше TOMBSTONE_RETENTION_DAYS, часть удалений могла быть потеряна.
+        ValueError если курсор поврежден
+        """
+        if cursor:
+            cursor_order, key = decode_cursor(cursor)
+            if cursor_order != 'changes':
+                raise ValueError('cursor was not issued for changes')
+            check_cursor_key(key, cls.repository.get_key_types('updated_at', model) +
+                             TombstoneRepository.get_key_types('deleted_at', Tombstone))
+        else:
+            start = since or EPOCH
+            if start.tzinfo is None:
+                start = start.replace(tzinfo=timezone.utc)
+            key = (start, 0, start, 0)
+        lag = settings.CHANGES_SAFETY_LAG
+        items, next_key = await cls.repository.get_page(
+            limit, model, session, 'updated_at', key[:2],
+            (cls.repository.get_settled_condition(model.updated_at, lag),), columns=columns
+        )
+        tombstones, next_deleted = await TombstoneRepository.get_page(
+            limit, Tombstone, session, 'deleted_at', key[2:],
+            (Tombstone.table_name == model.__tablename__,
+             TombstoneRepository.get_settled_condition(Tombstone.deleted_at, lag))
+        )
+        await cls.prepare_read(items, model, session)
+        position = (*((items[-1].updated_at, items[-1].id) if items else key[:2]),
+                    *((tombstones[-1].deleted_at, tombstones[-1].id) if tombstones else key[2:]))
+        cutoff = datetime.now(timezone.utc) - timedelta(days=settings.TOMBSTONE_RETENTION_DAYS)
+        return {"items": items, "deleted": [tombstone.row_id for tombstone in tombstones],
+                "next_cursor": encode_cursor('changes', position),
+                "has_more": next_key is not None or next_deleted is not None,
+                "resync_required": key[2] != EPOCH and key[2] < cutoff}
+
+    @classmethod
+    async def search_keyset(
+            cls, field_name: str, search_value: str, after: Optional[str], page_size: int, model: ModelType,
+            session: AsyncSession, order_by: str = 'id', mode: str = 'ilike', include: Sequence[str] = (),
+            columns: Optional[Sequence[str]] = None
+            ) -> Dict[str, Any]:
+        """
+        Поиск с keyset-пагинацией
+        """
+        cls.check_search_field(field_name, model)
+        condition = cls.repository.get_search_condition(field_name, search_value, model, mode)
+        if condition is None:
+            return {"items": [], "page_size": page_size, "has_next": False, "next_cursor": None}
+        return await cls.get_keyset(after, page_size, model, session, order_by, (condition,), include, columns)
@@ -0,0 +1,32 @@
+# app/services/changes_service.py
+"""
+    фоновая задача GET /{prefix}/changes: удаляет tombstones старше TOMBSTONE_RETENTION_DAYS.
+    клиенты с курсором старше этого срока получают resync_required
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.config import settings
+from app.models.postgres import Tombstone
+from app.repositories.postgres import TombstoneRepository
+
+
+async def purge_tombstones(session_factory: async_sessionmaker) -> int:
+    """ один проход, возвращает число удаленных tombstones """
+    before = datetime.now(timezone.utc) - timedelta(days=settings.TOMBSTONE_RETENTION_DAYS)
+    async with session_factory() as session:
+        return await TombstoneRepository.purge(before, Tombstone, session)
+
+
+async def run_tombstone_purge(session_factory: async_sessionmaker, interval: float):
+    """ purge_tombstones каждые interval секунд, пока задачу не отменят """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            purged = await purge_tombstones(session_factory)
+            if purged:
+                print(f"Tombstone purge: {purged}")
+        except Exception as e:
+            print(f"Tombstone purge error: {e}")
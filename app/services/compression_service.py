@@ -0,0 +1,88 @@
+# app/services/compression_service.py
+"""
+    сжатие body_html rawdata zstd с общим словарем, обученным на самих страницах.
+    сжатие и распаковка выполняются в потоке (asyncio.to_thread) - event loop не блокируется
+"""
+import asyncio
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.postgres import CompressionDict
+
+try:
+    import zstandard
+except ImportError:  # zstandard - опциональная зависимость, нужна только для RAWDATA_COMPRESSION
+    zstandard = None
+
+
+class CompressionService:
+    """Сжатие и распаковка текста zstd"""
+
+    # словари не изменяются: id -> ZstdCompressionDict
+    _dicts: Dict[int, 'zstandard.ZstdCompressionDict'] = {}
+
+    @staticmethod
+    def is_available() -> bool:
+        return zstandard is not None
+
+    @classmethod
+    def is_enabled(cls) -> bool:
+        return settings.RAWDATA_COMPRESSION and zstandard is not None
+
+    @classmethod
+    async def get_dict(cls, dict_id: Optional[int], session: AsyncSession):
+        if dict_id is None:
+            return None
+        zstd_dict = cls._dicts.get(dict_id)
+        if zstd_dict is None:
+            data = (await session.execute(select(CompressionDict.data).where(CompressionDict.id == dict_id))).scalar()
+            if data is None:
+                raise ValueError(f'compression dictionary {dict_id} not found')
+            zstd_dict = cls._dicts[dict_id] = zstandard.ZstdCompressionDict(data)
+        return zstd_dict
+
+    @classmethod
+    async def get_current_dict_id(cls, session: AsyncSession) -> Optional[int]:
+        """ последний обученный словарь, None - сжатие без словаря """
+        return (await session.execute(select(CompressionDict.id).order_by(CompressionDict.id.desc()).limit(1))).scalar()
+
+    @classmethod
+    async def compress(cls, texts: Sequence[str], session: AsyncSession) -> Tuple[List[bytes], Optional[int]]:
+        """ сжатие текстов текущим словарем: (сжатые тексты, id словаря) """
+        dict_id = await cls.get_current_dict_id(session)
+        zstd_dict = await cls.get_dict(dict_id, session)
+
+        def run():
+            compressor = zstandard.ZstdCompressor(level=settings.RAWDATA_ZSTD_LEVEL, dict_data=zstd_dict)
+            return [compressor.compress(text.encode()) for text in texts]
+
+        return await asyncio.to_thread(run), dict_id
+
+    @classmethod
+    async def decompress(cls, items: Sequence[Tuple[bytes, Optional[int]]], session: AsyncSession) -> List[str]:
+        """ распаковка (сжатый текст, id словаря) """
+        if zstandard is None:
+            raise RuntimeError('zstandard is not installed, compressed body_html cannot be read')
+        dicts = {dict_id: await cls.get_dict(dict_id, session) for dict_id in {dict_id for _, dict_id in items}}
+
+        def run():
+            decompressors = {dict_id: zstandard.ZstdDecompressor(dict_data=zstd_dict)
+                             for dict_id, zstd_dict in dicts.items()}
+            return [decompressors[dict_id].decompress(data).decode() for data, dict_id in items]
+
+        return await asyncio.to_thread(run)
+
+    @classmethod
+    async def train(cls, samples: List[str], session: AsyncSession) -> CompressionDict:
+        """ обучение словаря на samples, новый словарь становится текущим для следующих записей """
+        def run():
+            return zstandard.train_dictionary(settings.RAWDATA_ZSTD_DICT_SIZE,
+                                              [sample.encode() for sample in samples]).as_bytes()
+
+        obj = CompressionDict(data=await asyncio.to_thread(run), samples=len(samples))
+        session.add(obj)
+        await session.commit()
+        return obj
@@ -0,0 +1,116 @@
+# app/services/events_service.py
+"""
+    лента изменений таблиц: statement-триггеры (app.models.postgres, NOTIFY_TABLES) отправляют NOTIFY
+    в канал CHANGES_CHANNEL при фиксации транзакции. одно LISTEN-соединение на воркер раздает события
+    подписчикам GET /events и сбрасывает кэши воркера - в том числе после записей других воркеров и импорта
+"""
+import asyncio
+import json
+from typing import Sequence
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app import cache
+from app.config import settings
+from app.models.postgres import CHANGES_CHANNEL, NOTIFY_TABLES
+
+# событие подписчику: пропущены события (переполнение очереди, переподключение LISTEN)
+RESYNC = {'op': 'resync'}
+
+
+class Subscriber:
+    """Подписчик ленты: фильтры и очередь событий"""
+
+    def __init__(self, tables: Sequence[str] = (), statuses: Sequence[str] = ()):
+        self.tables = frozenset(tables)
+        self.statuses = frozenset(statuses)
+        self.queue = asyncio.Queue(maxsize=settings.EVENTS_QUEUE_SIZE)
+
+    def matches(self, event: dict) -> bool:
+        """ пустой фильтр - любые таблицы / статусы. с фильтром статусов события таблиц без статуса не приходят """
+        return ((not self.tables or event['table'] in self.tables) and
+                (not self.statuses or event.get('status') in self.statuses))
+
+
+class ChangeFeed:
+    """LISTEN CHANGES_CHANNEL и рассылка событий подписчикам этого воркера"""
+
+    def __init__(self):
+        self.subscribers = set()
+        self.connected = False
+
+    def subscribe(self, tables: Sequence[str] = (), statuses: Sequence[str] = ()) -> Subscriber:
+        subscriber = Subscriber(tables, statuses)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self.subscribers.discard(subscriber)
+
+    def resync(self, subscriber: Subscriber):
+        """ очередь подписчика заменяется событием resync, подписчик отключается """
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(RESYNC)
+        self.unsubscribe(subscriber)
+
+    def dispatch(self, payload: str):
+        """ событие NOTIFY: {table, op, status, ids} """
+        try:
+            event = json.loads(payload)
+            cache.table_changed(event['table'], event['ids'])
+        except (ValueError, KeyError, TypeError):
+            # не событие триггера (NOTIFY в канал извне) - пропускается, LISTEN продолжает работу
+            return
+        for subscriber in list(self.subscribers):
+            if not subscriber.matches(event):
+                continue
+            try:
+                subscriber.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self.resync(subscriber)
+
+    def disconnected(self):
+        """ события за время без LISTEN потеряны: сброс кэшей таблиц и resync всем подписчикам """
+        for table in NOTIFY_TABLES:
+            cache.table_changed(table)
+        for subscriber in list(self.subscribers):
+            self.resync(subscriber)
+
+    async def listen(self, engine: AsyncEngine, interval: float):
+        """
+        LISTEN на соединении из пула engine, пока задачу не отменят. соединение проверяется каждые interval
+        секунд, при ошибке - переподключение. запросы идут напрямую в asyncpg вне транзакции:
+        внутри транзакции postgres не доставляет уведомления
+        """
+        def listener(connection, pid, channel, payload):
+            self.dispatch(payload)
+
+        while True:
+            try:
+                async with engine.connect() as conn:
+                    driver_connection = (await conn.get_raw_connection()).driver_connection
+                    await driver_connection.add_listener(CHANGES_CHANNEL, listener)
+                    self.connected = True
+                    try:
+                        while True:
+                            await asyncio.sleep(interval)
+                            await driver_connection.execute('SELECT 1')
+                    finally:
+                        self.connected = False
+                        if not driver_connection.is_closed():
+                            await driver_connection.remove_listener(CHANGES_CHANNEL, listener)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Change feed error: {e}")
+                self.disconnected()
+                await asyncio.sleep(interval)
+
+
+change_feed = ChangeFeed()
+
+
+def format_event(event: dict) -> str:
+    """ событие в формате text/event-stream, тип события - op (insert, update, delete, resync) """
+    return f"event: {event['op']}\ndata: {json.dumps(event, separators=(',', ':'))}\n\n"
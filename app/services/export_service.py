@@ -0,0 +1,125 @@
+# app/services/export_service.py
+"""
+    потоковая выгрузка таблиц: строки читаются server-side курсором порциями (yield_per)
+    и сразу кодируются в NDJSON / CSV / Arrow IPC - память не зависит от размера таблицы
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from typing import AsyncIterator, Callable, List, Optional
+
+from sqlalchemy import DateTime, Integer
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import settings
+from app.repositories.base import ModelType, Repository
+
+try:
+    import pyarrow as pa
+except ImportError:  # pyarrow - опциональная зависимость, нужна только для format=arrow
+    pa = None
+
+MEDIA_TYPES = {'ndjson': 'application/x-ndjson',
+               'csv': 'text/csv; charset=utf-8',
+               'arrow': 'application/vnd.apache.arrow.stream'}
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def encode_ndjson(columns: List[str]) -> Callable:
+    def encode(partition) -> bytes:
+        return ''.join(json.dumps(dict(zip(columns, row)), default=_json_default, ensure_ascii=False) + '\n'
+                       for row in partition).encode()
+    return encode
+
+
+def encode_csv(columns: List[str]) -> Callable:
+    header = True
+
+    def encode(partition) -> bytes:
+        nonlocal header
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if header:
+            writer.writerow(columns)
+            header = False
+        writer.writerows([value.isoformat() if isinstance(value, datetime) else value for value in row]
+                         for row in partition)
+        return buffer.getvalue().encode()
+    return encode
+
+
+def arrow_schema(model: ModelType, columns: list):
+    """ схема Arrow по типам колонок модели """
+    fields = []
+    for column in columns:
+        if isinstance(column.type, Integer):
+            arrow_type = pa.int64()
+        elif isinstance(column.type, DateTime):
+            arrow_type = pa.timestamp('us', tz='UTC')
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(column.name, arrow_type))
+    return pa.schema(fields)
+
+
+class ExportService:
+    """Потоковая выгрузка таблиц"""
+
+    @staticmethod
+    def is_supported(fmt: str) -> bool:
+        return fmt in MEDIA_TYPES and (fmt != 'arrow' or pa is not None)
+
+    @classmethod
+    async def export(
+            cls, fmt: str, model: ModelType, session_factory: async_sessionmaker, repository=Repository,
+            where: tuple = (), prepare: Optional[Callable] = None
+    ) -> AsyncIterator[bytes]:
+        """
+        генератор байтов выгрузки. сессия открывается внутри генератора и живет пока отдается ответ.
+        prepare(rows, columns, model, session) - обработка порции (Service.prepare_export) в отдельной сессии:
+        сессия выгрузки занята курсором
+        """
+        columns = repository.get_load_columns(model)
+        names = [column.name for column in columns]
+        async with session_factory() as session, session_factory() as prepare_session:
+            partitions = repository.stream_partitions(model, session, where, settings.EXPORT_YIELD_PER)
+            if prepare is not None:
+                partitions = cls.prepare_partitions(partitions, prepare, names, model, prepare_session)
+            if fmt == 'arrow':
+                async for chunk in cls.export_arrow(partitions, arrow_schema(model, columns)):
+                    yield chunk
+                return
+            encode = encode_ndjson(names) if fmt == 'ndjson' else encode_csv(names)
+            empty = True
+            async for partition in partitions:
+                empty = False
+                yield encode(partition)
+            if empty and fmt == 'csv':
+                yield encode([])
+
+    @staticmethod
+    async def prepare_partitions(partitions, prepare: Callable, names: List[str], model: ModelType,
+                                 session: AsyncSession) -> AsyncIterator[list]:
+        async for partition in partitions:
+            yield await prepare(partition, names, model, session)
+
+    @staticmethod
+    async def export_arrow(partitions, schema) -> AsyncIterator[bytes]:
+        """ Arrow IPC stream: одна record batch на порцию курсора """
+        sink = io.BytesIO()
+        writer = pa.ipc.new_stream(sink, schema)
+        async for partition in partitions:
+            columns = list(zip(*partition))
+            writer.write_batch(pa.record_batch([pa.array(values, type=field.type)
+                                                for values, field in zip(columns, schema)], schema=schema))
+            yield sink.getvalue()
+            sink.seek(0)
+            sink.truncate()
+        writer.close()
+        yield sink.getvalue()
@@ -3,12 +3,13 @@ from app.services.base import Service
 from app.repositories.postgres import ImageRepository
 from app.models.postgres import Image
 from typing import Dict, Any, List
-from app.schemas.postgres import ImageCreate
+from app.schemas.postgres import ImageCreate, ImageRead
 
 
 class ImageService(Service):
     """Service для работы с изображениями (PostgreSQL)"""
     repository = ImageRepository
+    read_schema = ImageRead
 
     @classmethod
     async def create_image(cls, image_data: ImageCreate, db, model=Image):
@@ -0,0 +1,201 @@
+# app/services/import_service.py
+"""
+    загрузка дампов каталога (codes, names) из CSV/NDJSON:
+    COPY во временную таблицу и слияние в целевую одним INSERT ... ON CONFLICT
+"""
+import asyncio
+import codecs
+import csv
+import json
+from typing import Any, BinaryIO, Dict, Iterator, List
+
+from sqlalchemy import BigInteger, Column, MetaData, Table, Text, insert, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.schema import CreateTable
+
+from app import cache
+from app.config import settings
+
+_metadata = MetaData()
+
+
+def staging_table(name: str, columns: List[str]) -> Table:
+    """ временная таблица для COPY, удаляется при commit. n - порядок строк во входном файле """
+    return Table(f'import_{name}', _metadata,
+                 Column('n', BigInteger, primary_key=True, autoincrement=True),
+                 *(Column(column, Text) for column in columns),
+                 prefixes=['TEMPORARY'], postgresql_on_commit='DROP')
+
+
+# описание импортируемых таблиц: колонки входного файла, обязательные колонки, ключ слияния
+CATALOGS: Dict[str, Dict[str, Any]] = {
+    'codes': {'columns': ['code', 'url', 'status'], 'required': ['code', 'url'], 'key': 'code',
+              'table': staging_table('codes', ['code', 'url', 'status'])},
+    'names': {'columns': ['code', 'name', 'url', 'status'], 'required': ['code', 'name', 'url'], 'key': 'name',
+              'table': staging_table('names', ['code', 'name', 'url', 'status'])},
+}
+
+# слияние staging -> codes. {update} - SET только для колонок, которые есть во входном файле
+MERGE_CODES = """
+WITH src AS (
+    SELECT DISTINCT ON (code) code, url, status
+    FROM import_codes WHERE code IS NOT NULL AND url IS NOT NULL
+    ORDER BY code, n DESC
+),
+valid AS (
+    SELECT * FROM src s
+    WHERE NOT EXISTS (SELECT 1 FROM codes c WHERE c.url = s.url AND c.code <> s.code)
+      AND NOT EXISTS (SELECT 1 FROM src d WHERE d.url = s.url AND d.code <> s.code)
+),
+merged AS (
+    INSERT INTO codes (code, url, status, created_at, updated_at)
+    SELECT code, url, coalesce(nullif(status, ''), 'pending'), now(), now() FROM valid
+    ON CONFLICT (code) DO UPDATE SET {update}, updated_at = now()
+    WHERE ({compare_target}) IS DISTINCT FROM ({compare_excluded})
+    RETURNING (xmax = 0) AS inserted
+)
+SELECT (SELECT count(*) FROM import_codes) AS staged,
+       (SELECT count(*) FROM import_codes WHERE code IS NULL OR url IS NULL) AS skipped,
+       (SELECT count(*) FROM src) AS distinct_rows,
+       (SELECT count(*) FROM valid) AS valid,
+       0 AS unresolved,
+       count(*) FILTER (WHERE inserted) AS inserted,
+       count(*) FILTER (WHERE NOT inserted) AS updated
+FROM merged
+"""
+
+# слияние staging -> names, code разрешается в code_id через join с codes
+MERGE_NAMES = """
+WITH src AS (
+    SELECT DISTINCT ON (s.name) s.name, s.url, s.status, c.id AS code_id
+    FROM import_names s LEFT JOIN codes c ON c.code = s.code
+    WHERE s.code IS NOT NULL AND s.name IS NOT NULL AND s.url IS NOT NULL
+    ORDER BY s.name, s.n DESC
+),
+valid AS (
+    SELECT * FROM src s
+    WHERE s.code_id IS NOT NULL
+      AND NOT EXISTS (SELECT 1 FROM names n WHERE n.url = s.url AND n.name <> s.name)
+      AND NOT EXISTS (SELECT 1 FROM src d WHERE d.url = s.url AND d.name <> s.name)
+),
+merged AS (
+    INSERT INTO names (code_id, name, url, status, created_at, updated_at)
+    SELECT code_id, name, url, coalesce(nullif(status, ''), 'pending'), now(), now() FROM valid
+    ON CONFLICT (name) DO UPDATE SET code_id = EXCLUDED.code_id, {update}, updated_at = now()
+    WHERE (names.code_id, {compare_target}) IS DISTINCT FROM (EXCLUDED.code_id, {compare_excluded})
+    RETURNING (xmax = 0) AS inserted
+)
+SELECT (SELECT count(*) FROM import_names) AS staged,
+       (SELECT count(*) FROM import_names WHERE code IS NULL OR name IS NULL OR url IS NULL) AS skipped,
+       (SELECT count(*) FROM src) AS distinct_rows,
+       (SELECT count(*) FROM valid) AS valid,
+       (SELECT count(*) FROM src WHERE code_id IS NULL) AS unresolved,
+       count(*) FILTER (WHERE inserted) AS inserted,
+       count(*) FILTER (WHERE NOT inserted) AS updated
+FROM merged
+"""
+
+MERGES = {'codes': MERGE_CODES, 'names': MERGE_NAMES}
+
+
+class ImportService:
+    """Загрузка дампов каталога через COPY"""
+
+    @staticmethod
+    def read_header(stream, fmt: str, catalog: dict) -> tuple:
+        """
+        колонки входного файла, которые есть в каталоге, и итератор строк-словарей
+        :raises: ValueError если нет обязательных колонок
+        """
+        if fmt == 'csv':
+            rows = csv.DictReader(stream)
+            fields = rows.fieldnames or []
+        else:
+            rows = (json.loads(line) for line in stream if line.strip())
+            first = next(rows, None)
+            fields = list(first) if first else []
+            rows = _chain_first(first, rows)
+        missing = [column for column in catalog['required'] if column not in fields]
+        if missing:
+            raise ValueError(f'missing required columns: {", ".join(missing)}')
+        return [column for column in catalog['columns'] if column in fields], rows
+
+    @staticmethod
+    def take_batch(rows: Iterator[dict], columns: List[str], size: int) -> List[tuple]:
+        """ очередная порция записей для COPY (пустые строки CSV -> NULL) """
+        batch = []
+        for row in rows:
+            batch.append(tuple(_text(row.get(column)) for column in columns))
+            if len(batch) >= size:
+                break
+        return batch
+
+    @classmethod
+    async def copy_records(cls, table: Table, columns: List[str], records: List[tuple], session: AsyncSession):
+        """
+        COPY порции во временную таблицу через asyncpg copy_records_to_table,
+        для других драйверов - многострочный INSERT
+        """
+        connection = await session.connection()
+        raw_connection = await connection.get_raw_connection()
+        driver_connection = raw_connection.driver_connection
+        if hasattr(driver_connection, 'copy_records_to_table'):
+            await driver_connection.copy_records_to_table(table.name, records=records, columns=columns)
+        else:
+            await session.execute(insert(table), [dict(zip(columns, record)) for record in records])
+
+    @classmethod
+    async def import_file(cls, name: str, file: BinaryIO, fmt: str, session: AsyncSession) -> Dict[str, Any]:
+        """
+        Загрузка дампа в codes/names одной транзакцией: файл читается порциями в отдельном потоке,
+        каждая порция копируется во временную таблицу, затем одно слияние в целевую таблицу.
+        :return:    отчет staged/skipped/duplicates/inserted/updated/unchanged/conflicting/unresolved
+        """
+        catalog = CATALOGS.get(name)
+        if catalog is None:
+            raise ValueError(f'import is not supported for {name}')
+        stream = codecs.getreader('utf-8-sig')(file)
+        columns, rows = await asyncio.to_thread(cls.read_header, stream, fmt, catalog)
+        try:
+            await session.execute(CreateTable(catalog['table']))
+            while True:
+                records = await asyncio.to_thread(cls.take_batch, rows, columns, settings.IMPORT_BATCH_SIZE)
+                if not records:
+                    break
+                await cls.copy_records(catalog['table'], columns, records, session)
+            result = await session.execute(text(cls.merge_sql(name, columns)))
+            report = result.one()._asdict()
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+        cache.table_changed(name)
+        return {'table': name, 'staged': report['staged'], 'skipped': report['skipped'],
+                'duplicates': report['staged'] - report['skipped'] - report['distinct_rows'],
+                'inserted': report['inserted'], 'updated': report['updated'],
+                'unchanged': report['valid'] - report['inserted'] - report['updated'],
+                'conflicting': report['distinct_rows'] - report['valid'] - report['unresolved'],
+                'unresolved': report['unresolved']}
+
+    @staticmethod
+    def merge_sql(name: str, columns: List[str]) -> str:
+        """ SQL слияния: обновляются только колонки, которые есть во входном файле """
+        updated = [column for column in ('url', 'status') if column in columns]
+        update = ', '.join(f'{column} = EXCLUDED.{column}' for column in updated)
+        compare_target = ', '.join(f'{name}.{column}' for column in updated)
+        compare_excluded = ', '.join(f'EXCLUDED.{column}' for column in updated)
+        return MERGES[name].format(update=update, compare_target=compare_target, compare_excluded=compare_excluded)
+
+
+def _chain_first(first, rows):
+    """ возвращает прочитанную первую строку обратно в итератор """
+    if first is not None:
+        yield first
+    yield from rows
+
+
+def _text(value):
+    """ значение колонки staging-таблицы: пустая строка и None -> NULL """
+    if value is None or value == '':
+        return None
+    return value if isinstance(value, str) else str(value)
@@ -0,0 +1,148 @@
+# app/services/partition_service.py
+"""
+    обслуживание секционированных по месяцам created_at таблиц (PARTITIONED_TABLES): секции создаются
+    на PARTITION_PREMAKE_MONTHS вперед, секции старше PARTITION_RETENTION_MONTHS удаляются целиком -
+    DROP TABLE вместо построчного DELETE. строки вне созданных секций попадают в секцию {table}_default
+    и переносятся в секцию месяца при ее создании
+"""
+import asyncio
+import re
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from app import cache
+from app.config import settings
+from app.models.postgres import Base
+
+PARTITION_RE = re.compile(r'_p(\d{4})_(\d{2})$')
+
+
+def add_months(month: date, months: int) -> date:
+    """ первое число месяца через months месяцев """
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f'{table}_p{month:%Y_%m}'
+
+
+async def is_partitioned(table: str, conn: AsyncConnection) -> bool:
+    """ таблица в БД действительно секционирована (init_db не преобразует созданные раньше таблицы) """
+    result = await conn.execute(text('SELECT EXISTS (SELECT 1 FROM pg_partitioned_table p '
+                                     'JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = :table)'),
+                                {'table': table})
+    return result.scalar()
+
+
+async def get_partitions(table: str, conn: AsyncConnection) -> List[str]:
+    result = await conn.execute(text('SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+                                     'JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = :table '
+                                     'ORDER BY c.relname'), {'table': table})
+    return list(result.scalars())
+
+
+async def create_partitions(table: str, conn: AsyncConnection, today: date) -> List[str]:
+    """
+    секции с текущего месяца на PARTITION_PREMAKE_MONTHS вперед и секция по умолчанию.
+    строки месяца, уже попавшие в секцию по умолчанию, переносятся в созданную секцию
+    """
+    existing = set(await get_partitions(table, conn))
+    created = []
+    if f'{table}_default' not in existing:
+        await conn.execute(text(f'CREATE TABLE {table}_default PARTITION OF {table} DEFAULT'))
+        created.append(f'{table}_default')
+    month = today.replace(day=1)
+    for i in range(settings.PARTITION_PREMAKE_MONTHS + 1):
+        start = add_months(month, i)
+        name = partition_name(table, start)
+        if name in existing:
+            continue
+        # границы в UTC независимо от TimeZone сессии
+        lower, upper = f'{start} 00:00+00', f'{add_months(start, 1)} 00:00+00'
+        bounds = f"FROM ('{lower}') TO ('{upper}')"
+        condition = f"created_at >= '{lower}' AND created_at < '{upper}'"
+        if await has_default_rows(table, condition, conn):
+            await move_default_rows(table, name, bounds, condition, conn)
+        else:
+            await conn.execute(text(f'CREATE TABLE {name} PARTITION OF {table} FOR VALUES {bounds}'))
+        created.append(name)
+    return created
+
+
+async def has_default_rows(table: str, condition: str, conn: AsyncConnection) -> bool:
+    result = await conn.execute(text(f'SELECT EXISTS (SELECT 1 FROM {table}_default WHERE {condition})'))
+    return result.scalar()
+
+
+async def move_default_rows(table: str, name: str, bounds: str, condition: str, conn: AsyncConnection):
+    """
+    строки месяца в секции по умолчанию (вставлены, пока секции месяца не было): CREATE TABLE ... PARTITION OF
+    для такого диапазона завершится ошибкой. строки переносятся в новую таблицу, затем она подключается
+    секцией - в той же транзакции, триггеры таблицы при переносе не срабатывают
+    """
+    await conn.execute(text(f'CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'))
+    await conn.execute(text(f'WITH moved AS (DELETE FROM {table}_default WHERE {condition} RETURNING *) '
+                            f'INSERT INTO {name} SELECT * FROM moved'))
+    await conn.execute(text(f'ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES {bounds}'))
+
+
+async def drop_expired_partitions(table: str, engine: AsyncEngine, today: date) -> List[str]:
+    """
+    удаление секций, все строки которых старше PARTITION_RETENTION_MONTHS[table] месяцев.
+    id строк записываются в tombstones (GET /{prefix}/changes), ссылки на холодный архив - в archive_orphans,
+    каждая секция - в своей транзакции
+    """
+    months = settings.PARTITION_RETENTION_MONTHS.get(table, 0)
+    if months <= 0:
+        return []
+    cutoff = add_months(today.replace(day=1), -months)
+    archived = 'archive_ref' in Base.metadata.tables[table].c
+    async with engine.connect() as conn:
+        partitions = await get_partitions(table, conn)
+    dropped = []
+    for name in partitions:
+        match = PARTITION_RE.search(name)
+        if not match or add_months(date(int(match[1]), int(match[2]), 1), 1) > cutoff:
+            continue
+        async with engine.begin() as conn:
+            await conn.execute(text(f'INSERT INTO tombstones (table_name, row_id) SELECT :table, id FROM {name}'),
+                               {'table': table})
+            if archived:
+                # DROP TABLE не вызывает триггеры DELETE - документы архива строк секции удалит архиватор
+                await conn.execute(text(f'INSERT INTO archive_orphans (archive_ref) '
+                                        f'SELECT archive_ref FROM {name} WHERE archive_ref IS NOT NULL'))
+            await conn.execute(text(f'DROP TABLE {name}'))
+        dropped.append(name)
+    if dropped:
+        cache.table_changed(table)
+    return dropped
+
+
+async def maintain_partitions(engine: AsyncEngine, today: Optional[date] = None) -> Dict[str, dict]:
+    """ один проход по PARTITIONED_TABLES: {таблица: {'created': [...], 'dropped': [...]}} """
+    today = today or datetime.now(timezone.utc).date()
+    report = {}
+    for table in settings.PARTITIONED_TABLES:
+        async with engine.begin() as conn:
+            if not await is_partitioned(table, conn):
+                print(f"⚠️ {table} is not partitioned, recreate it to enable partitioning")
+                continue
+            created = await create_partitions(table, conn, today)
+        report[table] = {'created': created, 'dropped': await drop_expired_partitions(table, engine, today)}
+    return report
+
+
+async def run_partition_maintenance(engine: AsyncEngine, interval: float):
+    """ maintain_partitions каждые interval секунд, пока задачу не отменят """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            report = await maintain_partitions(engine)
+            if any(item['created'] or item['dropped'] for item in report.values()):
+                print(f"Partition maintenance: {report}")
+        except Exception as e:
+            print(f"Partition maintenance error: {e}")
@@ -1,21 +1,332 @@
 # app/services/postgres.py
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, inspect
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.config import settings
+from app.services.archive_service import ArchiveService
 from app.services.base import Service
-from app.models.postgres import Image, Name
+from app.services.compression_service import CompressionService
+from app.services.version_service import VersionService
+from app.models.postgres import ArchiveOrphan, CompressionDict, Image, Name, Rawdata
+from app.repositories.base import ModelType
+from app.repositories.postgres import (ArchiveOrphanRepository, CodeRepository, ImageRepository, NameRepository,
+                                       RawRepository)
+from app.schemas.postgres import CodeRead, ImageRead, NameRead
+from app.utils import check_cursor_key, content_hash, decode_cursor, encode_cursor
 
 
 class CodeService(Service):
-    pass
+    repository = CodeRepository
+    read_schema = CodeRead
 
 
 class NameService(Service):
-    pass
+    repository = NameRepository
+    read_schema = NameRead
+
+    @classmethod
+    async def prepare_read(cls, items: Sequence[Any], model: ModelType, session: AsyncSession):
+        """ body_html загруженной связи raw_data (include): распаковка сжатых и чтение архивных, как в RawService """
+        raw = [item.raw_data for item in items
+               if isinstance(item, model) and 'raw_data' not in inspect(item).unloaded and item.raw_data is not None]
+        if raw:
+            await RawService.prepare_read(raw, Rawdata, session)
 
 
 class RawService(Service):
-    pass
+    repository = RawRepository
+    # body_html может быть большим - записи rawdata в кэш get_by_id не попадают
+    read_schema = None
+
+    @classmethod
+    async def full_text_search(
+            cls, query: str, after: Optional[str], page_size: int, session: AsyncSession, model=Rawdata
+            ) -> Dict[str, Any]:
+        """
+        Полнотекстовый поиск по тексту body_html с ранжированием и keyset-пагинацией
+        """
+        key = None
+        if after:
+            cursor_order, key = decode_cursor(after)
+            if cursor_order != 'rank':
+                raise ValueError(f'cursor was issued for order_by={cursor_order}')
+            check_cursor_key(key, (float, int))
+        rows, next_key = await cls.repository.full_text_search(query, page_size, model, session, key)
+        items = [row._asdict() for row in rows]
+        # у сжатых и архивных записей body_html NULL - фрагменты по тексту, прочитанному приложением
+        bodies = await cls.load_bodies([item['id'] for item in items if not item['headline']], model, session)
+        if bodies:
+            headlines = dict(zip(bodies, await cls.repository.get_headlines(list(bodies.values()), query, session)))
+            for item in items:
+                item['headline'] = headlines.get(item['id'], item['headline'])
+        return {"items": items, "page_size": page_size,
+                "next_cursor": encode_cursor('rank', next_key) if next_key else None}
+
+    @classmethod
+    def check_search_field(cls, field_name: str, model: ModelType):
+        """ у сжатых и архивных записей body_html NULL - поиск подстроки их не находит, нужен /rawdata/fts """
+        archived = settings.ARCHIVE_AFTER_DAYS.get(model.__tablename__, 0) > 0
+        if field_name == 'body_html' and (settings.RAWDATA_COMPRESSION or archived):
+            raise ValueError('body_html substring search skips compressed and archived rows, use /rawdata/fts')
+
+    @classmethod
+    async def prepare_write(
+            cls, rows: List[dict], model: ModelType, session: AsyncSession, update: bool = False
+            ) -> List[dict]:
+        """
+        хеш body_html (body_hash) для пропуска записи того же содержимого.
+        при RAWDATA_COMPRESSION body_html сохраняется сжатым в body_zstd (body_html NULL) вместе с body_tsv
+        из текста, иначе при обновлении body_html сжатая копия сбрасывается (body_tsv считает триггер)
+        """
+        if not any('body_html' in row for row in rows):
+            return rows
+        compress = CompressionService.is_enabled()
+        hashes = iter(await asyncio.to_thread(lambda: [content_hash(row['body_html']) for row in rows
+                                                       if 'body_html' in row]))
+        texts = [row['body_html'] for row in rows if compress and row.get('body_html') is not None]
+        bodies, dict_id = await CompressionService.compress(texts, session) if texts else ([], None)
+        bodies = iter(bodies)
+        result = []
+        for row in rows:
+            if 'body_html' in row:
+                row = {**row, 'body_hash': next(hashes)}
+            if compress and 'body_html' in row:
+                packed = row['body_html'] is not None
+                row = {**row, 'body_html': None, 'body_zstd': next(bodies) if packed else None,
+                       'body_dict_id': dict_id if packed else None,
+                       'body_tsv': func.rawdata_tsvector(row['body_html']) if packed else None}
+            elif update and 'body_html' in row:
+                row = {**row, 'body_zstd': None, 'body_dict_id': None}
+            result.append(row)
+        return result
+
+    @classmethod
+    async def prepare_read(cls, items: Sequence[Any], model: ModelType, session: AsyncSession):
+        """
+        распаковка body_html сжатых записей и чтение из архива архивных, если body_html загружен
+        (не отложен в списке)
+        """
+        ids = [item.id for item in items
+               if isinstance(item, model) and 'body_html' not in inspect(item).unloaded and item.body_html is None]
+        bodies = await cls.load_bodies(ids, model, session)
+        for item in items:
+            if isinstance(item, model) and item.id in bodies:
+                set_committed_value(item, 'body_html', bodies[item.id])
+
+    @classmethod
+    async def prepare_export(
+            cls, rows: Sequence[Any], columns: Sequence[str], model: ModelType, session: AsyncSession
+            ) -> Sequence[Any]:
+        """ body_html сжатых и архивных строк выгрузки """
+        if 'body_html' not in columns:
+            return rows
+        index = columns.index('body_html')
+        bodies = await cls.load_bodies([row.id for row in rows if row[index] is None], model, session)
+        if not bodies:
+            return rows
+        return [(*row[:index], bodies[row.id], *row[index + 1:]) if row.id in bodies else row for row in rows]
+
+    @classmethod
+    async def load_bodies(cls, ids: Sequence[int], model: ModelType, session: AsyncSession) -> Dict[int, str]:
+        """ body_html сжатых (распаковка) и архивных (чтение из архива) записей из ids: {id: текст} """
+        if not ids:
+            return {}
+        rows = await cls.repository.get_packed_bodies(ids, model, session)
+        packed = [row for row in rows if row.body_zstd is not None]
+        texts = await CompressionService.decompress(
+            [(row.body_zstd, row.body_dict_id) for row in packed], session
+        ) if packed else []
+        bodies = {row.id: text for row, text in zip(packed, texts)}
+        archived = {row.archive_ref: row.id for row in rows if row.body_zstd is None}
+        if archived:
+            texts = await ArchiveService.load(list(archived), session)
+            bodies.update({archived[ref]: text for ref, text in texts.items()})
+        return bodies
+
+    @classmethod
+    async def record_version(cls, instance: Any, session: AsyncSession):
+        """ версия body_html в истории (RAWDATA_VERSIONS_ENABLED). ошибка истории не отменяет запись rawdata """
+        if not settings.RAWDATA_VERSIONS_ENABLED or instance.body_html is None:
+            return
+        try:
+            await VersionService.record(instance.name_id, instance.body_html, instance.body_hash, session)
+        except Exception as e:
+            await session.rollback()
+            print(f"Warning: rawdata version is not recorded: {instance.name_id=}, {e}")
+
+    @classmethod
+    async def get_or_create(cls, data: Any, session: AsyncSession, model=Rawdata):
+        instance = await super().get_or_create(data, session, model)
+        await cls.record_version(instance, session)
+        return instance
+
+    @classmethod
+    async def upsert(
+            cls, lookup: Dict[str, Any], defaults: Dict[str, Any], model: ModelType, session: AsyncSession
+            ) -> tuple:
+        result, changed = await super().upsert(lookup, defaults, model, session)
+        if changed and isinstance(result, model):
+            await cls.record_version(result, session)
+        return result, changed
+
+    @classmethod
+    async def patch(
+            cls, id: int, data: Any, model: ModelType, session: AsyncSession, version: Optional[datetime] = None
+            ) -> dict:
+        result = await super().patch(id, data, model, session, version)
+        if result.get('changed'):
+            await cls.record_version(result['data'], session)
+        return result
+
+    @classmethod
+    async def put(cls, data: Any, session: AsyncSession, model=Rawdata) -> dict:
+        """
+        Создание или замена содержимого записи по name_id. тот же body_html (по хешу) запись не изменяет:
+        changed False, updated_at и content_changed_at прежние
+        """
+        values = data.model_dump()
+        result, changed = await cls.upsert({'name_id': values.pop('name_id')}, values, model, session)
+        if not isinstance(result, model):
+            error_type = result if result in ('unique_constraint_violation', 'foreign_key_violation') \
+                else 'database_error'
+            return {'success': False, 'message': f'Ошибка базы данных: {result}', 'error_type': error_type}
+        return {'success': True, 'changed': changed, 'data': result,
+                'message': f'Запись {result.id} ' + ('сохранена' if changed else 'не изменилась')}
+
+    @classmethod
+    async def get_changed(
+            cls, since: datetime, after: Optional[str], page_size: int, session: AsyncSession, model=Rawdata
+            ) -> Dict[str, Any]:
+        """
+        Записи, содержимое которых изменилось после since, в порядке изменения (keyset по content_changed_at)
+        """
+        columns = cls.repository.get_columns(model, ('id', 'name_id', 'body_hash', 'content_changed_at'))
+        return await cls.get_keyset(after, page_size, model, session, 'content_changed_at',
+                                    (model.content_changed_at > since,), columns=columns)
+
+    @classmethod
+    async def get_packed_body(
+            cls, id: int, session: AsyncSession, model=Rawdata
+            ) -> Optional[Tuple[bytes, Optional[int]]]:
+        """ (body_zstd, id словаря) сжатой записи, None - записи нет или она не сжата """
+        rows = await cls.repository.get_packed_bodies([id], model, session)
+        return (rows[0].body_zstd, rows[0].body_dict_id) if rows and rows[0].body_zstd is not None else None
+
+    @classmethod
+    async def get_archived_body(cls, id: int, session: AsyncSession, model=Rawdata) -> Optional[str]:
+        """ body_html записи из холодного архива, None - запись не в архиве """
+        rows = await cls.repository.get_packed_bodies([id], model, session)
+        if not rows or rows[0].archive_ref is None:
+            return None
+        texts = await ArchiveService.load([rows[0].archive_ref], session)
+        return texts.get(rows[0].archive_ref)
+
+    @classmethod
+    async def archive(cls, limit: int, session: AsyncSession, model=Rawdata) -> dict:
+        """
+        Перенос в холодный архив тел до limit записей, содержимое которых не менялось
+        ARCHIVE_AFTER_DAYS дней (старые первыми). сначала пишется архив, затем очищаются тела в postgres;
+        документы записей, измененных за это время или перенесенных параллельным архиватором, удаляются
+        """
+        days = settings.ARCHIVE_AFTER_DAYS.get(model.__tablename__, 0)
+        if days <= 0:
+            return {'success': False, 'message': f'Архив выключен (ARCHIVE_AFTER_DAYS[{model.__tablename__}])',
+                    'error_type': 'not_available'}
+        before = datetime.now(timezone.utc) - timedelta(days=days)
+        rows = await cls.repository.get_archive_candidates(before, limit, model, session)
+        archived = []
+        if rows:
+            keys = await ArchiveService.store(model.__tablename__, rows)
+            archived = await cls.repository.mark_archived(rows, keys, model, session)
+            cleared = set(archived)
+            skipped = [key for row, key in zip(rows, keys) if row.id not in cleared]
+            if skipped:
+                await ArchiveService.remove(skipped)
+            cls.invalidate(model, archived)
+        return {'success': True, 'archived': len(archived), 'message': f'Перенесено в архив: {len(archived)}'}
+
+    @classmethod
+    async def remove_archive_orphans(cls, limit: int, session: AsyncSession, model=ArchiveOrphan) -> int:
+        """ удаление из Mongo до limit документов архива, на которые больше не ссылается rawdata """
+        rows = await ArchiveOrphanRepository.get_batch(limit, model, session)
+        if not rows:
+            return 0
+        await ArchiveService.remove([row.archive_ref for row in rows])
+        await ArchiveOrphanRepository.delete_ids([row.id for row in rows], model, session)
+        return len(rows)
+
+    @classmethod
+    async def unpack_body(cls, packed: Tuple[bytes, Optional[int]], session: AsyncSession) -> str:
+        texts = await CompressionService.decompress([packed], session)
+        return texts[0]
+
+    @classmethod
+    async def get_dictionary(cls, id: int, session: AsyncSession) -> Optional[CompressionDict]:
+        return await session.get(CompressionDict, id)
+
+    @classmethod
+    async def train_dictionary(cls, samples: int, session: AsyncSession, model=Rawdata) -> dict:
+        """Обучение словаря zstd на последних samples несжатых записях"""
+        if not CompressionService.is_available():
+            return {'success': False, 'message': 'zstandard не установлен', 'error_type': 'not_available'}
+        rows = await cls.repository.get_plain_bodies(samples, model, session)
+        try:
+            obj = await CompressionService.train([row.body_html for row in rows], session)
+        except Exception as e:
+            await session.rollback()
+            return {'success': False, 'message': f'Словарь не обучен ({len(rows)} записей): {e}',
+                    'error_type': 'training_failed'}
+        return {'success': True, 'id': obj.id, 'samples': obj.samples, 'size': len(obj.data),
+                'message': f'Словарь {obj.id} обучен на {obj.samples} записях'}
+
+    @classmethod
+    async def compress_existing(cls, limit: int, session: AsyncSession, model=Rawdata) -> dict:
+        """
+        Сжатие до limit несжатых записей (последние первыми) текущим словарем.
+        updated_at не меняется: содержимое записи то же
+        """
+        if not CompressionService.is_enabled():
+            return {'success': False, 'message': 'Сжатие выключено (RAWDATA_COMPRESSION) или zstandard не установлен',
+                    'error_type': 'not_available'}
+        rows = await cls.repository.get_plain_bodies(limit, model, session)
+        if rows:
+            bodies, dict_id = await CompressionService.compress([row.body_html for row in rows], session)
+            await cls.repository.update_by_ids(
+                [{'id': row.id, 'body_html': None, 'body_zstd': body, 'body_dict_id': dict_id,
+                  'updated_at': row.updated_at} for row, body in zip(rows, bodies)], model, session
+            )
+            cls.invalidate(model, [row.id for row in rows])
+        return {'success': True, 'compressed': len(rows), 'message': f'Сжато записей: {len(rows)}'}
+
+    @classmethod
+    async def stream_body(
+            cls, id: int, session_factory: async_sessionmaker, chunk_size: int, model=Rawdata
+            ) -> AsyncIterator[str]:
+        """
+        body_html записи частями по chunk_size символов, в памяти только одна часть.
+        части читаются в одной транзакции REPEATABLE READ - все из одной версии записи.
+        записи нет - ничего не отдается, пустое тело - одна пустая строка
+        """
+        async with session_factory() as session:
+            await session.connection(execution_options={'isolation_level': 'REPEATABLE READ'})
+            length = await cls.repository.get_body_length(id, model, session)
+            if length is None:
+                return
+            if not length:
+                yield ''
+                return
+            for start in range(1, length + 1, chunk_size):
+                yield await cls.repository.get_body_chunk(id, start, chunk_size, model, session)
 
 
 class ImageService(Service):
+    repository = ImageRepository
+    read_schema = ImageRead
 
     @classmethod
     async def create_image(cls, image_data: dict, session, model=Image):
@@ -0,0 +1,36 @@
+# app/services/queue_service.py
+"""
+    фоновая задача очереди обработки: возвращает в pending записи, аренда которых истекла
+    (обработчик упал, не вызвав complete / fail)
+"""
+import asyncio
+from typing import Dict
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.models.postgres import Code, Name
+from app.services.postgres import CodeService, NameService
+
+# очереди: сервис и модель
+QUEUES = ((CodeService, Code), (NameService, Name))
+
+
+async def reap_expired_leases(session_factory: async_sessionmaker) -> Dict[str, int]:
+    """ один проход по всем очередям, возвращает число возвращенных записей по таблицам """
+    reaped = {}
+    for service, model in QUEUES:
+        async with session_factory() as session:
+            reaped[model.__tablename__] = len(await service.reap(model, session))
+    return reaped
+
+
+async def run_reaper(session_factory: async_sessionmaker, interval: float):
+    """ reap_expired_leases каждые interval секунд, пока задачу не отменят """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            reaped = await reap_expired_leases(session_factory)
+            if any(reaped.values()):
+                print(f"Queue reaper: {reaped}")
+        except Exception as e:
+            print(f"Queue reaper error: {e}")
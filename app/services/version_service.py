@@ -0,0 +1,201 @@
+# app/services/version_service.py
+"""
+    история body_html страниц (rawdata_versions): каждые RAWDATA_VERSION_MAX_CHAIN версий полный снимок,
+    между ними дельты к предыдущей версии. html разбивается на части по концам тегов ('>'),
+    дельта - части предыдущей версии, которые копируются, и новые части (difflib).
+    снимки и дельты сжаты zlib, вычисления выполняются в потоке (asyncio.to_thread)
+"""
+import asyncio
+import difflib
+import json
+import re
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import settings
+from app.models.postgres import RawdataVersion
+from app.repositories.postgres import RawVersionRepository
+
+TOKEN_RE = re.compile(r'(?<=>)')
+
+
+def tokenize(text: str) -> List[str]:
+    """ части html, каждая заканчивается '>' (кроме последней) """
+    return TOKEN_RE.split(text)
+
+
+def make_delta(base: List[str], tokens: List[str]) -> list:
+    """ дельта tokens к base: [i1, i2] - части base[i1:i2], строка - новая часть """
+    ops = []
+    matcher = difflib.SequenceMatcher(None, base, tokens, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append(''.join(tokens[j1:j2]))
+    return ops
+
+
+def apply_delta(base: List[str], ops: list) -> str:
+    return ''.join(''.join(base[op[0]:op[1]]) if isinstance(op, list) else op for op in ops)
+
+
+def encode_snapshot(text: str) -> bytes:
+    return zlib.compress(text.encode())
+
+
+def encode_delta(ops: list) -> bytes:
+    return zlib.compress(json.dumps(ops, ensure_ascii=False, separators=(',', ':')).encode())
+
+
+def reconstruct(rows: Sequence[Any]) -> str:
+    """ текст последней из строк (chain, data): снимок и дельты по порядку """
+    text = ''
+    for row in rows:
+        data = zlib.decompress(row.data).decode()
+        text = data if row.chain == 0 else apply_delta(tokenize(text), json.loads(data))
+    return text
+
+
+def encode_version(base: Optional[str], text: str, chain: int) -> tuple:
+    """
+    (chain, data) новой версии: дельта к base, если цепочка не длиннее RAWDATA_VERSION_MAX_CHAIN
+    и дельта меньше снимка, иначе снимок (chain 0)
+    """
+    snapshot = encode_snapshot(text)
+    if base is None or chain > settings.RAWDATA_VERSION_MAX_CHAIN:
+        return 0, snapshot
+    delta = encode_delta(make_delta(tokenize(base), tokenize(text)))
+    return (chain, delta) if len(delta) < len(snapshot) else (0, snapshot)
+
+
+class VersionService:
+    """История body_html по name_id"""
+    repository = RawVersionRepository
+
+    @classmethod
+    async def record(
+            cls, name_id: int, text: str, body_hash: Optional[str], session: AsyncSession, model=RawdataVersion
+            ) -> Optional[int]:
+        """
+        новая версия страницы, если содержимое отличается от последней версии.
+        :return:    номер версии или None если содержимое не изменилось
+        """
+        last = await cls.repository.get_last(name_id, model, session)
+        if last is not None and body_hash is not None and last.body_hash == body_hash:
+            return None
+        base = None
+        if last is not None and last.chain < settings.RAWDATA_VERSION_MAX_CHAIN:
+            rows = await cls.repository.get_chain(name_id, last.version, model, session)
+            base = await asyncio.to_thread(reconstruct, rows)
+        chain, data = await asyncio.to_thread(encode_version, base, text, last.chain + 1 if last else 0)
+        version = last.version + 1 if last else 1
+        obj = model(name_id=name_id, version=version, chain=chain, data=data, size=len(text), body_hash=body_hash)
+        try:
+            await cls.repository.create(obj, session)
+        except IntegrityError:
+            # версию с этим номером записал параллельный запрос
+            await session.rollback()
+            return None
+        return version
+
+    @classmethod
+    async def get_versions(cls, name_id: int, session: AsyncSession, model=RawdataVersion) -> list:
+        return await cls.repository.get_versions(name_id, model, session)
+
+    @classmethod
+    async def get_text(cls, name_id: int, version: int, session: AsyncSession, model=RawdataVersion) -> Optional[str]:
+        """ текст версии: последний снимок до нее и дельты, None если версии нет """
+        rows = await cls.repository.get_chain(name_id, version, model, session)
+        if not rows:
+            return None
+        return await asyncio.to_thread(reconstruct, rows)
+
+    @classmethod
+    async def diff(
+            cls, name_id: int, from_version: int, to_version: int, session: AsyncSession
+            ) -> Optional[str]:
+        """ unified diff двух версий (строки - части html по концам тегов), None если версии нет """
+        old = await cls.get_text(name_id, from_version, session)
+        new = await cls.get_text(name_id, to_version, session)
+        if old is None or new is None:
+            return None
+
+        def run():
+            return '\n'.join(difflib.unified_diff(tokenize(old), tokenize(new), f'v{from_version}', f'v{to_version}',
+                                                  lineterm=''))
+
+        return await asyncio.to_thread(run)
+
+    @classmethod
+    async def compact_name(cls, name_id: int, cutoff: Optional[datetime], session: AsyncSession,
+                           model=RawdataVersion) -> int:
+        """
+        компакция истории страницы: версии старше cutoff удаляются (последняя остается),
+        первая оставшаяся становится снимком, цепочки длиннее RAWDATA_VERSION_MAX_CHAIN разбиваются снимками.
+        :return:    число удаленных и перезаписанных версий
+        """
+        rows = await cls.repository.get_versions(name_id, model, session, with_data=True)
+        if not rows:
+            return 0
+        keep_from = 0
+        if cutoff is not None:
+            keep_from = next((i for i, row in enumerate(rows) if row.created_at >= cutoff), len(rows) - 1)
+
+        def run():
+            updates = []
+            texts = [reconstruct(rows[:1])]
+            for i in range(1, len(rows)):
+                texts.append(reconstruct([rows[i]]) if rows[i].chain == 0 else
+                             apply_delta(tokenize(texts[-1]), json.loads(zlib.decompress(rows[i].data).decode())))
+            chain = 0
+            for i in range(keep_from, len(rows)):
+                row = rows[i]
+                # первая оставшаяся версия, прежние снимки и версии после слишком длинной цепочки - снимки
+                if i == keep_from or row.chain == 0 or chain >= settings.RAWDATA_VERSION_MAX_CHAIN:
+                    chain = 0
+                else:
+                    chain += 1
+                if chain == 0 and row.chain != 0:
+                    updates.append({'id': row.id, 'chain': 0, 'data': encode_snapshot(texts[i])})
+                elif chain != row.chain:
+                    # база дельты - та же предыдущая версия, меняется только номер в цепочке
+                    updates.append({'id': row.id, 'chain': chain})
+            return updates
+
+        updates = await asyncio.to_thread(run)
+        delete_ids = [row.id for row in rows[:keep_from]]
+        if updates or delete_ids:
+            await cls.repository.rewrite(updates, delete_ids, model, session)
+        return len(updates) + len(delete_ids)
+
+    @classmethod
+    async def compact(cls, limit: int, session: AsyncSession, model=RawdataVersion) -> Dict[str, int]:
+        """ компакция до limit страниц с устаревшими версиями или длинными цепочками дельт """
+        cutoff = None
+        if settings.RAWDATA_VERSION_RETENTION_DAYS > 0:
+            cutoff = datetime.now(timezone.utc) - timedelta(days=settings.RAWDATA_VERSION_RETENTION_DAYS)
+        name_ids = await cls.repository.get_compaction_candidates(
+            cutoff, settings.RAWDATA_VERSION_MAX_CHAIN, limit, model, session
+        )
+        rewritten = 0
+        for name_id in name_ids:
+            rewritten += await cls.compact_name(name_id, cutoff, session)
+        return {'names': len(name_ids), 'versions': rewritten}
+
+
+async def run_compaction(session_factory: async_sessionmaker, interval: float):
+    """ VersionService.compact каждые interval секунд, пока задачу не отменят """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with session_factory() as session:
+                result = await VersionService.compact(settings.RAWDATA_VERSION_COMPACT_BATCH, session)
+            if result['names']:
+                print(f"Rawdata history compaction: {result}")
+        except Exception as e:
+            print(f"Rawdata history compaction error: {e}")
@@ -1,7 +1,14 @@
 # app/utils.py
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
+from typing import Optional, Sequence
+import base64
+import hashlib
+import json
 import re
 
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
 
 def get_path_to_root(name: str = '.env'):
     """
@@ -72,3 +79,90 @@ def replace_commas_in_parentheses(match, rep: str = '@'):
     inner_replaced = inner.replace(',', '@')
     # Возвращаем скобки с изменённым содержимым
     return f"({inner_replaced})"
+
+
+def encode_cursor(order_by: str, values) -> str:
+    """
+    упаковывает ключ keyset-пагинации (порядок сортировки и значения ключа последней записи)
+    в непрозрачную url-safe строку
+    """
+    def default(value):
+        if isinstance(value, datetime):
+            return {'dt': value.isoformat()}
+        raise TypeError(f'cursor value {value!r} is not serializable')
+
+    payload = json.dumps({'o': order_by, 'k': list(values)}, default=default, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """
+    распаковывает курсор encode_cursor
+    :return:    (order_by, tuple значений ключа)
+    :raises:    ValueError если курсор поврежден
+    """
+    def object_hook(obj):
+        if 'dt' in obj:
+            return datetime.fromisoformat(obj['dt'])
+        return obj
+
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()), object_hook=object_hook)
+        return payload['o'], tuple(payload['k'])
+    except Exception as e:
+        raise ValueError(f'invalid cursor: {e}')
+
+
+def check_cursor_key(key: tuple, types: Sequence[type]) -> tuple:
+    """
+    проверяет ключ курсора decode_cursor: число значений и их типы (float допускает int,
+    datetime - только с часовым поясом, как в encode_cursor)
+    :raises:    ValueError если ключ не соответствует types
+    """
+    if len(key) != len(types):
+        raise ValueError(f'invalid cursor: expected {len(types)} key values, got {len(key)}')
+    for value, expected in zip(key, types):
+        allowed = (int, float) if expected is float else expected
+        if isinstance(value, bool) or not isinstance(value, allowed):
+            raise ValueError(f'invalid cursor: {value!r} is not {expected.__name__}')
+        if isinstance(value, datetime) and value.tzinfo is None:
+            raise ValueError(f'invalid cursor: {value!r} has no timezone')
+    return key
+
+
+async def aenumerate(iterable, start: int = 0):
+    """ enumerate для асинхронных итераторов """
+    index = start
+    async for item in iterable:
+        yield index, item
+        index += 1
+
+
+def content_hash(text: Optional[str]) -> Optional[str]:
+    """ sha256 текста (hex), None для None """
+    return None if text is None else hashlib.sha256(text.encode()).hexdigest()
+
+
+def make_etag(updated_at: datetime) -> str:
+    """ ETag записи - версия по updated_at с точностью до микросекунд """
+    if updated_at.tzinfo is None:
+        updated_at = updated_at.replace(tzinfo=timezone.utc)
+    return f'"{(updated_at - EPOCH) // timedelta(microseconds=1)}"'
+
+
+def parse_etag(value: str) -> Optional[datetime]:
+    """
+    версия (updated_at) из заголовка If-Match. None для If-Match: *
+    :raises:    ValueError если значение не выдано make_etag
+    """
+    value = value.strip()
+    if value == '*':
+        return None
+    if value.startswith('W/'):
+        value = value[2:]
+    try:
+        micros = int(value.strip('"'))
+    except ValueError:
+        raise ValueError(f'invalid ETag: {value}')
+    return EPOCH + timedelta(microseconds=micros)
@@ -12,4 +12,5 @@ pytest tests/test_cascade_delete.py
 pytest tests/test_cleanup_service.py
 pytest tests/test_mongo_files.py
 pytest tests/test_cascade_files.py
-
+# секционированный режим: отдельный запуск, схема создается заново
+PARTITIONED_TABLES='["rawdata", "images"]' pytest tests/test_partitions.py tests/test_rawdata.py
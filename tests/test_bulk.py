@@ -0,0 +1,119 @@
+# tests/test_bulk.py
+# flake8: NOQA: E251 E123 W293
+import json
+
+import pytest
+from httpx import AsyncClient
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_bulk_create_codes(async_client: AsyncClient):
+    """Тест пакетного создания Codes списком JSON"""
+    existing = {"code": "test_bulk_existing", "url": "http://example.com/bulk_existing", "status": "pending"}
+    existing_id = (await async_client.post("/codes", json = existing)).json()["id"]
+
+    payload = [{"code": f"test_bulk_{i}", "url": f"http://example.com/bulk_{i}", "status": "pending"}
+               for i in range(5)]
+    payload.append(existing)
+    payload.append({"code": "test_bulk_invalid"})  # нет url
+    response = await async_client.post("/codes/bulk", json = payload, params = {"chunk_size": 2})
+    assert response.status_code == 200, response.text
+    result = response.json()
+    assert result["total"] == 7
+    assert result["created"] == 5
+    assert result["existing"] == 1
+    assert result["failed"] == 1
+    statuses = {item["index"]: item for item in result["items"]}
+    assert statuses[5]["id"] == existing_id
+    assert statuses[6]["status"] == "invalid"
+
+
+async def test_bulk_create_codes_without_on_conflict(async_client: AsyncClient, monkeypatch):
+    """Тест пакетного создания, если диалект не поддерживает ON CONFLICT: поиск и вставка по строкам"""
+    from app.repositories.postgres import CodeRepository
+    monkeypatch.setattr(CodeRepository, "get_insert", classmethod(lambda cls, model, session: None))
+    existing = {"code": "test_bulk_no_conflict_existing", "url": "http://example.com/bulk_no_conflict_existing",
+                "status": "pending"}
+    existing_id = (await async_client.post("/codes", json = existing)).json()["id"]
+
+    payload = [{"code": f"test_bulk_no_conflict_{i}", "url": f"http://example.com/bulk_no_conflict_{i}",
+                "status": "pending"} for i in range(2)]
+    payload += [existing, payload[0]]
+    response = await async_client.post("/codes/bulk", json = payload)
+    assert response.status_code == 200, response.text
+    result = response.json()
+    assert (result["created"], result["existing"], result["failed"]) == (2, 2, 0)
+    statuses = {item["index"]: item for item in result["items"]}
+    assert statuses[2]["id"] == existing_id
+    assert statuses[3]["id"] == statuses[0]["id"]
+
+
+async def test_bulk_create_names_ndjson(async_client: AsyncClient):
+    """Тест пакетного создания Names потоком NDJSON"""
+    code = {"code": "test_bulk_ndjson", "url": "http://example.com/bulk_ndjson", "status": "pending"}
+    code_id = (await async_client.post("/codes", json = code)).json()["id"]
+    lines = [json.dumps({"code_id": code_id, "name": f"test_bulk_name_{i}", "url": f"http://example.com/bulk_name_{i}"})
+             for i in range(3)]
+    lines.append("{not json")
+    response = await async_client.post("/names/bulk", content = "\n".join(lines),
+                                       headers = {"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 200, response.text
+    result = response.json()
+    assert result["created"] == 3
+    assert result["items"][3]["status"] == "invalid"
+
+
+async def test_bulk_create_foreign_key_error(async_client: AsyncClient):
+    """Тест отката порции при ошибке внешнего ключа"""
+    payload = [{"code_id": 999999, "name": "test_bulk_fk", "url": "http://example.com/bulk_fk"}]
+    response = await async_client.post("/names/bulk", json = payload)
+    assert response.status_code == 200, response.text
+    assert response.json()["items"][0]["status"] == "error"
+
+
+async def test_bulk_patch_and_delete_by_filter(async_client: AsyncClient):
+    """Тест массовых PATCH / DELETE по условию и по списку id"""
+    ids = []
+    for i in range(3):
+        code = {"code": f"test_bulk_filter_{i}", "url": f"http://example.com/bulk_filter_{i}", "status": "bulk_new"}
+        ids.append((await async_client.post("/codes", json = code)).json()["id"])
+
+    body = {"where": [{"field": "status", "op": "eq", "value": "bulk_new"},
+                      {"field": "code", "op": "like", "value": "test_bulk_filter_%"}],
+            "values": {"status": "bulk_done"}}
+    response = await async_client.patch("/codes", json = body)
+    assert response.status_code == 200, response.text
+    assert response.json()["affected"] == 3
+    assert (await async_client.get(f"/codes/{ids[0]}")).json()["status"] == "bulk_done"
+
+    # некорректные поля фильтра и значений
+    bad = {"where": [{"field": "unknown", "value": 1}], "values": {"status": "x"}}
+    assert (await async_client.patch("/codes", json = bad)).status_code == 400
+    bad = {"ids": ids, "values": {"unknown": 1}}
+    assert (await async_client.patch("/codes", json = bad)).status_code == 422
+
+    response = await async_client.request("DELETE", "/codes", json = {"ids": ids[:2]})
+    assert response.status_code == 200, response.text
+    assert response.json()["affected"] == 2
+    assert (await async_client.get(f"/codes/{ids[0]}")).status_code == 404
+    assert (await async_client.get(f"/codes/{ids[2]}")).status_code == 200
+
+
+async def test_bulk_create_images_without_unique_key(async_client: AsyncClient):
+    """Тест пакетного создания Images (нет уникального ключа): повторный пакет не создает дубликаты"""
+    code = {"code": "test_bulk_images", "url": "http://example.com/bulk_images", "status": "pending"}
+    code_id = (await async_client.post("/codes", json = code)).json()["id"]
+    name = {"code_id": code_id, "name": "test_bulk_images", "url": "http://example.com/bulk_images_name"}
+    name_id = (await async_client.post("/names", json = name)).json()["id"]
+    payload = [{"name_id": name_id, "file_id": "bulk_a", "file_url": None},
+               {"name_id": name_id, "file_id": "bulk_b", "file_url": None},
+               {"name_id": name_id, "file_id": "bulk_a", "file_url": None}]
+
+    first = (await async_client.post("/images/bulk", json = payload)).json()
+    assert first["created"] == 2 and first["existing"] == 1
+    assert first["items"][0]["id"] == first["items"][2]["id"]
+
+    second = (await async_client.post("/images/bulk", json = payload)).json()
+    assert second["created"] == 0 and second["existing"] == 3
+    assert [item["id"] for item in second["items"]] == [item["id"] for item in first["items"]]
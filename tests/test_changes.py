@@ -0,0 +1,52 @@
+# tests/test_changes.py
+# flake8: NOQA: E251 E123 W293
+import pytest
+from httpx import AsyncClient
+
+from app.config import settings
+
+pytestmark = pytest.mark.asyncio
+
+
+async def changes_until_done(async_client: AsyncClient, params: dict) -> dict:
+    """ все страницы /codes/changes: (items, deleted, последний курсор) """
+    items, deleted = [], []
+    while True:
+        response = await async_client.get("/codes/changes", params = params)
+        assert response.status_code == 200, response.text
+        data = response.json()
+        items += data["items"]
+        deleted += data["deleted"]
+        params = {"cursor": data["next_cursor"], "limit": params.get("limit", 100)}
+        if not data["has_more"]:
+            return {"items": items, "deleted": deleted, "cursor": data["next_cursor"]}
+
+
+async def test_codes_changes(async_client: AsyncClient, monkeypatch):
+    """Тест /changes: изменения после курсора, удаления как tombstones"""
+    monkeypatch.setattr(settings, "CHANGES_SAFETY_LAG", 0)
+    initial = await changes_until_done(async_client, {"limit": 2})
+    assert initial["cursor"]
+
+    ids = []
+    for i in range(3):
+        code = {"code": f"test_changes_{i}", "url": f"http://example.com/changes_{i}"}
+        ids.append((await async_client.post("/codes", json = code)).json()["id"])
+    changes = await changes_until_done(async_client, {"cursor": initial["cursor"], "limit": 2})
+    assert [item["id"] for item in changes["items"]] == ids
+    assert changes["deleted"] == []
+
+    response = await async_client.patch(f"/codes/{ids[0]}", json = {"url": "http://example.com/changes_0_new"})
+    assert response.status_code == 200, response.text
+    assert (await async_client.delete(f"/codes/{ids[1]}")).status_code == 200
+    changes = await changes_until_done(async_client, {"cursor": changes["cursor"]})
+    assert [item["id"] for item in changes["items"]] == [ids[0]]
+    assert changes["items"][0]["url"] == "http://example.com/changes_0_new"
+    assert changes["deleted"] == [ids[1]]
+
+    # повтор с последним курсором - новых изменений нет
+    repeat = await changes_until_done(async_client, {"cursor": changes["cursor"], "fields": "id"})
+    assert repeat["items"] == [] and repeat["deleted"] == []
+
+    response = await async_client.get("/codes/changes", params = {"cursor": "broken"})
+    assert response.status_code == 400
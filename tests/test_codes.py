@@ -151,3 +151,204 @@ async def test_search_codes(async_client):
     # Проверяем что найденная запись содержит "apple"
     if result["items"]:
         assert "apple" in result["items"][0]["code"].lower()
+
+
+async def test_get_all_codes_keyset(async_client):
+    """Тест keyset-пагинации Codes (?after=)"""
+    for i in range(5):
+        data = {"code": f"test_code_keyset_{i}", "url": f"http://example.com/keyset_{i}", "status": "pending"}
+        await async_client.post("/codes", json=data)
+
+    seen = []
+    cursor = ""
+    while cursor is not None:
+        response = await async_client.get("/codes", params={"after": cursor, "page_size": 2})
+        assert response.status_code == 200, response.text
+        result = response.json()
+        assert result["total"] is None
+        seen.extend(item["id"] for item in result["items"])
+        cursor = result["next_cursor"]
+    # порядок по id, без повторов и пропусков
+    assert seen == sorted(set(seen))
+    assert len(seen) >= 5
+
+
+async def test_get_all_codes_bad_cursor(async_client):
+    """Тест поврежденного курсора"""
+    response = await async_client.get("/codes", params={"after": "not-a-cursor"})
+    assert response.status_code == 400, response.text
+
+    # курсор распаковывается, но ключ не соответствует сортировке
+    from app.utils import encode_cursor
+    for order_by, key in (("id", []), ("id", [1, 2]), ("id", ["1"]), ("updated_at", [5, 1]),
+                          ("updated_at", ["2024-01-01", 1])):
+        cursor = encode_cursor(order_by, key)
+        response = await async_client.get("/codes", params={"after": cursor, "order_by": order_by})
+        assert response.status_code == 400, response.text
+    response = await async_client.get("/codes/changes", params={"cursor": encode_cursor("changes", [1, 2])})
+    assert response.status_code == 400, response.text
+
+
+async def test_search_codes_trgm(async_client):
+    """Тест поиска Codes по похожести (pg_trgm)"""
+    for code in ("strawberry_trgm", "raspberry_trgm"):
+        await async_client.post("/codes", json={"code": code, "url": f"http://example.com/{code}", "status": "pending"})
+
+    # опечатка: подстрока не найдется, а по похожести - да
+    response = await async_client.get("/codes/search", params={"query": "strawbery_trgm", "field": "code",
+                                                               "mode": "trgm"})
+    assert response.status_code == 200, response.text
+    result = response.json()
+    assert result["total"] >= 1
+    assert result["items"][0]["code"] == "strawberry_trgm"
+
+
+async def test_search_codes_field_not_allowed(async_client):
+    """Тест поиска по полю вне списка search_fields"""
+    response = await async_client.get("/codes/search", params={"query": "1", "field": "created_at"})
+    assert response.status_code == 200, response.text
+    assert response.json()["total"] == 0
+
+
+async def test_patch_code_if_match(async_client):
+    """Тест PATCH с предусловием If-Match"""
+    code_data = {"code": "test_if_match", "url": "http://example.com/if_match", "status": "pending"}
+    code_id = (await async_client.post("/codes", json=code_data)).json()["id"]
+
+    etag = (await async_client.get(f"/codes/{code_id}")).headers["etag"]
+    response = await async_client.patch(f"/codes/{code_id}", json={"status": "done"}, headers={"If-Match": etag})
+    assert response.status_code == 200, response.text
+    assert response.headers["etag"] != etag
+
+    # версия устарела - запись не изменяется
+    response = await async_client.patch(f"/codes/{code_id}", json={"status": "error"}, headers={"If-Match": etag})
+    assert response.status_code == 412, response.text
+    assert (await async_client.get(f"/codes/{code_id}")).json()["status"] == "done"
+
+
+async def test_delete_code_cascade(async_client):
+    """Тест каскадного удаления Code вместе с Names (ON DELETE CASCADE в базе данных)"""
+    code_data = {"code": "test_delete_cascade", "url": "http://example.com/delete_cascade", "status": "pending"}
+    code_id = (await async_client.post("/codes", json=code_data)).json()["id"]
+    name_data = {"code_id": code_id, "name": "test_delete_cascade_name", "url": "http://example.com/delete_cascade_n",
+                 "status": "pending"}
+    name_id = (await async_client.post("/names", json=name_data)).json()["id"]
+
+    response = await async_client.delete(f"/codes/{code_id}")
+    assert response.status_code == 200, response.text
+    assert response.json()["deleted_count"] == 1
+    assert (await async_client.get(f"/names/{name_id}")).status_code == 404
+
+
+async def test_get_code_cache_invalidation(async_client):
+    """Тест кэша get_by_id: повторное чтение из кэша, PATCH и DELETE сбрасывают запись"""
+    code_data = {"code": "test_entity_cache", "url": "http://example.com/entity_cache", "status": "pending"}
+    code_id = (await async_client.post("/codes", json=code_data)).json()["id"]
+
+    await async_client.get(f"/codes/{code_id}")
+    hits = (await async_client.get("/metrics/cache")).json()["entity:codes"]["hits"]
+    assert (await async_client.get(f"/codes/{code_id}")).json()["status"] == "pending"
+    assert (await async_client.get("/metrics/cache")).json()["entity:codes"]["hits"] == hits + 1
+
+    await async_client.patch(f"/codes/{code_id}", json={"status": "done"})
+    assert (await async_client.get(f"/codes/{code_id}")).json()["status"] == "done"
+
+    await async_client.delete(f"/codes/{code_id}")
+    assert (await async_client.get(f"/codes/{code_id}")).status_code == 404
+
+
+async def test_get_all_codes_response_cache(async_client):
+    """Тест кэша ответов: повторный запрос из кэша, запись в таблицу сбрасывает ответ"""
+    params = {"page": 1, "page_size": 5}
+    total = (await async_client.get("/codes", params=params)).json()["total"]
+    hits = (await async_client.get("/metrics/cache")).json()["response:/codes"]["hits"]
+    assert (await async_client.get("/codes", params=params)).json()["total"] == total
+    assert (await async_client.get("/metrics/cache")).json()["response:/codes"]["hits"] == hits + 1
+
+    code_data = {"code": "test_response_cache", "url": "http://example.com/response_cache", "status": "pending"}
+    await async_client.post("/codes", json=code_data)
+    assert (await async_client.get("/codes", params=params)).json()["total"] == total + 1
+
+
+async def test_insert_or_get_code(async_client, test_db_session):
+    """Тест insert_or_get: конфликт по уникальному ключу возвращает существующую запись"""
+    from app.models.postgres import Code
+    from app.repositories.postgres import CodeRepository
+    code_data = {"code": "test_insert_or_get", "url": "http://example.com/insert_or_get", "status": "pending"}
+
+    created = await CodeRepository.insert_or_get(code_data, Code, test_db_session)
+    assert created.id is not None
+    existing = await CodeRepository.insert_or_get({**code_data, "status": "done"}, Code, test_db_session)
+    assert existing.id == created.id
+    assert existing.status == "pending"
+    # конфликт по одному из уникальных ключей
+    existing = await CodeRepository.insert_or_get({"code": "test_insert_or_get", "url": "http://example.com/other",
+                                                   "status": "pending"}, Code, test_db_session)
+    assert existing.id == created.id
+
+    # без уникального ключа в данных - None, уникальность проверяет сервис
+    assert await CodeRepository.insert_or_get({"status": "pending"}, Code, test_db_session) is None
+
+
+async def test_upsert_code(async_client, test_db_session):
+    """Тест upsert: вставка, обновление существующей записи с новым updated_at"""
+    from app.models.postgres import Code
+    from app.repositories.postgres import CodeRepository
+    lookup = {"code": "test_upsert"}
+
+    created, changed = await CodeRepository.upsert(lookup, {"url": "http://example.com/upsert", "status": "pending"},
+                                                   Code, test_db_session)
+    assert changed is True
+    code_id, updated_at = created.id, created.updated_at
+
+    updated, changed = await CodeRepository.upsert(lookup, {"status": "done"}, Code, test_db_session)
+    assert changed is True
+    assert updated.id == code_id
+    assert updated.status == "done"
+    assert updated.url == "http://example.com/upsert"
+    assert updated.updated_at > updated_at
+
+    response = await async_client.get(f"/codes/{code_id}")
+    assert response.json()["status"] == "done"
+
+
+async def test_upsert_code_not_unique_lookup(async_client, test_db_session):
+    """Тест upsert: lookup не совпадает с уникальным ключом - поиск и patch / create в сервисе"""
+    from app.models.postgres import Code
+    from app.repositories.postgres import CodeRepository
+    from app.services.postgres import CodeService
+    lookup = {"code": "test_upsert_fallback", "url": "http://example.com/upsert_fallback"}
+
+    assert await CodeRepository.upsert(lookup, {"status": "pending"}, Code, test_db_session) is None
+
+    created, changed = await CodeService.upsert(lookup, {"status": "pending"}, Code, test_db_session)
+    assert changed is True
+    assert created.code == "test_upsert_fallback"
+    assert created.status == "pending"
+    code_id = created.id
+
+    updated, changed = await CodeService.upsert(lookup, {"status": "done"}, Code, test_db_session)
+    assert updated.id == code_id
+    assert updated.status == "done"
+    response = await async_client.get(f"/codes/{code_id}")
+    assert response.json()["status"] == "done"
+
+
+async def test_get_code_by_id_same_type(async_client, test_db_session, monkeypatch):
+    """Тест Service.get_by_id: промах, попадание в кэш и выключенный кэш возвращают проверенную read_schema"""
+    from app.config import settings
+    from app.models.postgres import Code
+    from app.schemas.postgres import CodeRead
+    from app.services.postgres import CodeService
+    code_data = {"code": "test_get_by_id_type", "url": "http://example.com/get_by_id_type", "status": "pending"}
+    code_id = (await async_client.post("/codes", json=code_data)).json()["id"]
+
+    miss = await CodeService.get_by_id(code_id, Code, test_db_session)
+    hit = await CodeService.get_by_id(code_id, Code, test_db_session)
+    monkeypatch.setattr(settings, "ENTITY_CACHE_ENABLED", False)
+    uncached = await CodeService.get_by_id(code_id, Code, test_db_session)
+    for result in (miss, hit, uncached):
+        assert type(result) is CodeRead
+        assert result.model_fields_set == set(CodeRead.model_fields)
+        assert result.code == "test_get_by_id_type"
+    assert miss == hit == uncached
@@ -0,0 +1,48 @@
+# tests/test_export.py
+# flake8: NOQA: E251 E123 W293
+import csv
+import io
+import json
+
+import pytest
+from httpx import AsyncClient
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_export_codes_ndjson(async_client: AsyncClient):
+    """Тест потоковой выгрузки Codes в NDJSON с фильтром"""
+    for i in range(3):
+        data = {"code": f"test_export_{i}", "url": f"http://example.com/export_{i}", "status": "exported"}
+        await async_client.post("/codes", json = data)
+
+    response = await async_client.get("/codes/export", params = {"field": "status", "value": "exported"})
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert {row["code"] for row in rows} >= {"test_export_0", "test_export_1", "test_export_2"}
+    assert all(row["status"] == "exported" for row in rows)
+
+
+async def test_export_codes_csv(async_client: AsyncClient):
+    """Тест потоковой выгрузки Codes в CSV"""
+    response = await async_client.get("/codes/export", params = {"format": "csv",
+                                                                 "updated_since": "2000-01-01T00:00:00Z"})
+    assert response.status_code == 200, response.text
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert rows and {"id", "code", "url", "status"} <= set(rows[0])
+
+
+async def test_export_unknown_field(async_client: AsyncClient):
+    """Тест выгрузки с фильтром по несуществующему полю"""
+    response = await async_client.get("/codes/export", params = {"field": "nope", "value": "1"})
+    assert response.status_code == 400, response.text
+
+
+async def test_search_all_uses_query(async_client: AsyncClient):
+    """Тест поиска без пагинации - учитывает query"""
+    await async_client.post("/codes", json = {"code": "test_search_all_unique", "url": "http://example.com/sa",
+                                              "status": "pending"})
+    response = await async_client.get("/codes/search_all", params = {"query": "search_all_unique", "field": "code"})
+    assert response.status_code == 200, response.text
+    assert [item["code"] for item in response.json()] == ["test_search_all_unique"]
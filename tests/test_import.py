@@ -0,0 +1,62 @@
+# tests/test_import.py
+# flake8: NOQA: E251 E123 W293
+import json
+
+import pytest
+from httpx import AsyncClient
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_import_codes_csv(async_client: AsyncClient):
+    """Тест загрузки дампа codes из CSV"""
+    existing = {"code": "test_import_existing", "url": "http://example.com/import_existing", "status": "pending"}
+    await async_client.post("/codes", json = existing)
+    owner = {"code": "test_import_owner", "url": "http://example.com/import_taken", "status": "pending"}
+    await async_client.post("/codes", json = owner)
+
+    csv_data = ("code,url,status\n"
+                "test_import_1,http://example.com/import_1,pending\n"
+                "test_import_2,http://example.com/import_2,pending\n"
+                "test_import_2,http://example.com/import_2,done\n"             # дубликат, побеждает последняя
+                "test_import_existing,http://example.com/import_existing,done\n"  # обновление
+                "test_import_3,http://example.com/import_taken,pending\n"      # url занят другим code
+                ",http://example.com/import_no_code,pending\n")                # нет code
+    files = {"file": ("codes.csv", csv_data.encode(), "text/csv")}
+    response = await async_client.post("/import/codes", files = files)
+    assert response.status_code == 200, response.text
+    report = response.json()
+    assert report["staged"] == 6
+    assert report["skipped"] == 1
+    assert report["duplicates"] == 1
+    assert report["inserted"] == 2
+    assert report["updated"] == 1
+    assert report["conflicting"] == 1
+
+    search = await async_client.get("/codes/search", params = {"query": "test_import_2", "field": "code"})
+    assert search.json()["items"][0]["status"] == "done"
+
+
+async def test_import_names_ndjson(async_client: AsyncClient):
+    """Тест загрузки дампа names из NDJSON с разрешением code -> code_id"""
+    code = {"code": "test_import_names_code", "url": "http://example.com/import_names_code", "status": "pending"}
+    code_id = (await async_client.post("/codes", json = code)).json()["id"]
+    lines = [{"code": "test_import_names_code", "name": "test_import_name_1", "url": "http://example.com/in_1"},
+             {"code": "test_import_unknown_code", "name": "test_import_name_2", "url": "http://example.com/in_2"}]
+    body = "\n".join(json.dumps(line) for line in lines)
+    files = {"file": ("names.ndjson", body.encode(), "application/x-ndjson")}
+    response = await async_client.post("/import/names", files = files)
+    assert response.status_code == 200, response.text
+    report = response.json()
+    assert report["inserted"] == 1
+    assert report["unresolved"] == 1
+
+    search = await async_client.get("/names/search", params = {"query": "test_import_name_1", "field": "name"})
+    assert search.json()["items"][0]["code_id"] == code_id
+
+
+async def test_import_missing_columns(async_client: AsyncClient):
+    """Тест дампа без обязательных колонок"""
+    files = {"file": ("codes.csv", b"code\nonly_code\n", "text/csv")}
+    response = await async_client.post("/import/codes", files = files)
+    assert response.status_code == 400, response.text
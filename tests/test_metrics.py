@@ -0,0 +1,15 @@
+# tests/test_metrics.py
+# flake8: NOQA: E251 E123 W293
+import pytest
+from httpx import AsyncClient
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_pool_metrics(async_client: AsyncClient):
+    """Тест метрик пула соединений"""
+    response = await async_client.get("/metrics/pool")
+    assert response.status_code == 200, response.text
+    primary = response.json()["primary"]
+    for key in ("size", "checked_out", "overflow", "checkouts", "timeouts", "wait_max", "wait_histogram"):
+        assert key in primary
@@ -82,4 +82,29 @@ class TestNameRouter:
         
         # Проверяем что удален
         get_response = await async_client.get(f"/names/{name_id}")
-        assert get_response.status_code == 404
\ No newline at end of file
+        assert get_response.status_code == 404
+    
+    async def test_get_name_include_relations(self, async_client: AsyncClient, test_name_data: dict):
+        """Тест загрузки связей через include"""
+        create_response = await async_client.post("/names", json = test_name_data)
+        name_id = create_response.json()["id"]
+        
+        # без include связи в ответ не попадают
+        response = await async_client.get(f"/names/{name_id}")
+        assert "code" not in response.json()
+        
+        response = await async_client.get(f"/names/{name_id}", params = {"include": "code,images"})
+        assert response.status_code == 200
+        result = response.json()
+        assert result["code"]["id"] == test_name_data["code_id"]
+        assert result["images"] == []
+        
+        response = await async_client.get("/names", params = {"include": "code"})
+        assert response.status_code == 200
+        assert all(item["code"]["id"] == item["code_id"] for item in response.json()["items"])
+        
+        response = await async_client.get(f"/codes/{test_name_data['code_id']}", params = {"include": "names"})
+        assert [name["id"] for name in response.json()["names"]] == [name_id]
+        
+        response = await async_client.get(f"/names/{name_id}", params = {"include": "unknown"})
+        assert response.status_code == 400
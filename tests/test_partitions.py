@@ -0,0 +1,137 @@
+# tests/test_partitions.py
+# flake8: NOQA: E251 E123 W293
+import asyncio
+from datetime import date
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from app.config import settings
+from app.models.postgres import Image, Rawdata
+from app.repositories.postgres import RawRepository
+from app.services.partition_service import add_months, create_partitions, drop_expired_partitions, partition_name
+
+pytestmark = pytest.mark.asyncio
+
+# тесты секционированного режима: PARTITIONED_TABLES='["rawdata", "images"]' pytest tests/test_partitions.py
+partitioned = pytest.mark.skipif(not RawRepository.is_partitioned(Rawdata),
+                                 reason="rawdata is not in PARTITIONED_TABLES")
+
+
+async def create_name(async_client: AsyncClient, suffix: str) -> int:
+    """Создает Code и Name, возвращает id Name"""
+    code = {"code": f"test_part_code_{suffix}", "url": f"http://example.com/part_code_{suffix}", "status": "pending"}
+    code_id = (await async_client.post("/codes", json = code)).json()["id"]
+    name = {"code_id": code_id, "name": f"test_part_name_{suffix}", "url": f"http://example.com/part_name_{suffix}",
+            "status": "pending"}
+    return (await async_client.post("/names", json = name)).json()["id"]
+
+
+async def test_partition_months():
+    """Тест границ месячных секций"""
+    assert add_months(date(2026, 11, 1), 1) == date(2026, 12, 1)
+    assert add_months(date(2026, 12, 1), 1) == date(2027, 1, 1)
+    assert add_months(date(2026, 1, 1), -13) == date(2024, 12, 1)
+    assert partition_name("rawdata", date(2026, 3, 1)) == "rawdata_p2026_03"
+
+
+async def test_orm_primary_key():
+    """Ключ ORM - id и в секционированной таблице (первичный ключ (id, created_at))"""
+    for model in (Rawdata, Image):
+        assert [column.name for column in model.__mapper__.primary_key] == ["id"]
+    assert RawRepository.is_partitioned(Rawdata) == ("rawdata" in settings.PARTITIONED_TABLES)
+
+
+@partitioned
+async def test_partitioned_insert_or_get_concurrent(async_client: AsyncClient, test_db_session):
+    """Тест уникальности name_id без уникального индекса: параллельные вставки под advisory-блокировкой"""
+    name_id = await create_name(async_client, "concurrent")
+    responses = await asyncio.gather(*(async_client.post("/rawdata", json = {"name_id": name_id,
+                                                                             "body_html": f"<p>{i}</p>"})
+                                       for i in range(10)))
+    assert all(response.status_code == 200 for response in responses), [r.text for r in responses]
+    assert len({response.json()["id"] for response in responses}) == 1
+    count = await test_db_session.execute(text("SELECT count(*) FROM rawdata WHERE name_id = :id"), {"id": name_id})
+    assert count.scalar() == 1
+
+    # вставка в обход репозитория - ошибку дает триггер rawdata_unique_name
+    with pytest.raises(IntegrityError, match="rawdata_name_id_key"):
+        await test_db_session.execute(text("INSERT INTO rawdata (name_id, created_at, updated_at) "
+                                           "VALUES (:id, now(), now())"), {"id": name_id})
+    await test_db_session.rollback()
+
+
+@partitioned
+async def test_partitioned_upsert_and_bulk(async_client: AsyncClient):
+    """Тест PUT (upsert) и POST /bulk в секционированной таблице"""
+    name_id = await create_name(async_client, "upsert")
+    first = (await async_client.put("/rawdata", json = {"name_id": name_id, "body_html": "<p>v1</p>"})).json()
+    assert first["changed"] is True
+    same = (await async_client.put("/rawdata", json = {"name_id": name_id, "body_html": "<p>v1</p>"})).json()
+    assert same["changed"] is False
+    assert same["data"]["updated_at"] == first["data"]["updated_at"]
+    changed = (await async_client.put("/rawdata", json = {"name_id": name_id, "body_html": "<p>v2</p>"})).json()
+    assert changed["changed"] is True
+    assert changed["data"]["id"] == first["data"]["id"]
+    assert changed["data"]["updated_at"] != first["data"]["updated_at"]
+
+    other_id = await create_name(async_client, "bulk")
+    payload = [{"name_id": name_id, "body_html": "<p>x</p>"}, {"name_id": other_id, "body_html": "<p>a</p>"},
+               {"name_id": other_id, "body_html": "<p>b</p>"}]
+    response = await async_client.post("/rawdata/bulk", json = payload)
+    assert response.status_code == 200, response.text
+    result = response.json()
+    assert result["created"] == 1 and result["existing"] == 2
+    items = result["items"]
+    assert items[0]["id"] == first["data"]["id"]
+    assert items[1]["id"] == items[2]["id"]
+
+
+@partitioned
+async def test_create_partition_moves_default_rows(async_client: AsyncClient, test_db_session):
+    """Тест создания секции месяца, строки которого уже в секции по умолчанию"""
+    name_id = await create_name(async_client, "default")
+    await test_db_session.execute(text("INSERT INTO rawdata (name_id, body_html, created_at, updated_at) "
+                                       "VALUES (:id, '<p>future</p>', '2031-05-15 12:00+00', now())"),
+                                  {"id": name_id})
+    await test_db_session.commit()
+    where = {"id": name_id}
+    table = await test_db_session.execute(text("SELECT tableoid::regclass::text FROM rawdata WHERE name_id = :id"),
+                                          where)
+    assert table.scalar() == "rawdata_default"
+
+    async with test_db_session.bind.begin() as conn:
+        created = await create_partitions("rawdata", conn, date(2031, 5, 1))
+    assert "rawdata_p2031_05" in created
+    table = await test_db_session.execute(text("SELECT tableoid::regclass::text, body_tsv IS NOT NULL AS tsv "
+                                               "FROM rawdata WHERE name_id = :id"), where)
+    assert tuple(table.one()) == ("rawdata_p2031_05", True)
+
+
+@partitioned
+async def test_drop_expired_partitions(async_client: AsyncClient, test_db_session, monkeypatch):
+    """Тест удаления устаревших секций: строки попадают в tombstones, ссылки на архив - в archive_orphans"""
+    name_id = await create_name(async_client, "expired")
+    engine = test_db_session.bind
+    async with engine.begin() as conn:
+        await create_partitions("rawdata", conn, date(2020, 1, 1))
+    result = await test_db_session.execute(text(
+        "INSERT INTO rawdata (name_id, archive_ref, archived_at, created_at, updated_at) "
+        "VALUES (:id, 'rawdata:expired:1', now(), '2020-01-15 12:00+00', now()) RETURNING id"), {"id": name_id})
+    raw_id = result.scalar()
+    await test_db_session.commit()
+
+    monkeypatch.setattr(settings, "PARTITION_RETENTION_MONTHS", {"rawdata": 12})
+    dropped = await drop_expired_partitions("rawdata", engine, date(2026, 10, 19))
+    assert "rawdata_p2020_01" in dropped
+    assert not any(name.startswith("rawdata_p2026") for name in dropped)
+    rows = await test_db_session.execute(text("SELECT count(*) FROM rawdata WHERE id = :id"), {"id": raw_id})
+    assert rows.scalar() == 0
+    tombstone = await test_db_session.execute(text("SELECT count(*) FROM tombstones "
+                                                   "WHERE table_name = 'rawdata' AND row_id = :id"), {"id": raw_id})
+    assert tombstone.scalar() == 1
+    orphan = await test_db_session.execute(text("SELECT count(*) FROM archive_orphans "
+                                                "WHERE archive_ref = 'rawdata:expired:1'"))
+    assert orphan.scalar() == 1
@@ -0,0 +1,86 @@
+# tests/test_queue.py
+# flake8: NOQA: E251 E123 W293
+import asyncio
+
+import pytest
+from httpx import AsyncClient
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_claim_complete_fail_codes(async_client: AsyncClient):
+    """Тест очереди: параллельные claim получают разные записи, complete / fail завершают аренду"""
+    ids = []
+    for i in range(3):
+        code = {"code": f"test_queue_{i}", "url": f"http://example.com/queue_{i}", "status": "pending"}
+        ids.append((await async_client.post("/codes", json = code)).json()["id"])
+
+    first, second = await asyncio.gather(async_client.post("/codes/claim", params = {"limit": 1000}),
+                                         async_client.post("/codes/claim", params = {"limit": 1000}))
+    assert first.status_code == 200, first.text
+    claimed = [item["id"] for item in first.json() + second.json()]
+    tokens = {item["id"]: item["lease_token"] for item in first.json() + second.json()}
+    assert len(claimed) == len(set(claimed))
+    assert set(ids) <= set(claimed)
+    assert all(item["status"] == "in_progress" and item["lease_expires_at"] and item["lease_token"]
+               for item in first.json() + second.json())
+    assert len(set(tokens.values())) == len(tokens)
+
+    assert (await async_client.post(f"/codes/{ids[0]}/complete")).status_code == 422
+    assert (await async_client.post(f"/codes/{ids[0]}/complete",
+                                    params = {"lease_token": tokens[ids[1]]})).status_code == 409
+    response = await async_client.post(f"/codes/{ids[0]}/complete", params = {"lease_token": tokens[ids[0]]})
+    assert response.status_code == 200, response.text
+    assert response.json()["status"] == "done"
+    assert "lease_token" not in response.json()
+    # токен аренды не виден в чтении записей
+    assert "lease_token" not in (await async_client.get(f"/codes/{ids[1]}")).json()
+    assert all("lease_token" not in item for item in (await async_client.get("/codes")).json()["items"])
+    assert (await async_client.post(f"/codes/{ids[0]}/complete",
+                                    params = {"lease_token": tokens[ids[0]]})).status_code == 409
+    assert (await async_client.post("/codes/999999/complete", params = {"lease_token": "x"})).status_code == 404
+
+    response = await async_client.post(f"/codes/{ids[1]}/fail", params = {"lease_token": tokens[ids[1]],
+                                                                          "retry": False})
+    assert response.json()["status"] == "error"
+
+    # остальные записи возвращаются в очередь
+    for id in claimed:
+        if id not in ids[:2]:
+            response = await async_client.post(f"/codes/{id}/fail", params = {"lease_token": tokens[id],
+                                                                              "retry": True})
+            assert response.json()["status"] == "pending"
+            assert response.json()["lease_expires_at"] is None
+
+
+async def claim_one(async_client: AsyncClient, id: int) -> dict:
+    """ аренда записи id, остальные полученные записи возвращаются в очередь """
+    claimed = (await async_client.post("/codes/claim", params = {"limit": 1000})).json()
+    for item in claimed:
+        if item["id"] != id:
+            await async_client.post(f"/codes/{item['id']}/fail", params = {"lease_token": item["lease_token"],
+                                                                           "retry": True})
+    return next(item for item in claimed if item["id"] == id)
+
+
+async def test_finish_after_lease_expired(async_client: AsyncClient, test_db_session):
+    """Тест аренды: после истечения аренды и повторной выдачи прежний обработчик запись не завершит"""
+    from sqlalchemy import text
+    code = {"code": "test_queue_expired", "url": "http://example.com/queue_expired", "status": "pending"}
+    id = (await async_client.post("/codes", json = code)).json()["id"]
+    stale = await claim_one(async_client, id)
+
+    # аренда истекла, запись еще не возвращена в очередь
+    await test_db_session.execute(text("UPDATE codes SET lease_expires_at = now() - interval '1 second' "
+                                       "WHERE id = :id"), {"id": id})
+    await test_db_session.commit()
+    assert (await async_client.post(f"/codes/{id}/complete",
+                                    params = {"lease_token": stale["lease_token"]})).status_code == 409
+
+    assert id in (await async_client.post("/codes/reap")).json()["ids"]
+    fresh = await claim_one(async_client, id)
+    assert fresh["lease_token"] != stale["lease_token"]
+    assert (await async_client.post(f"/codes/{id}/complete",
+                                    params = {"lease_token": stale["lease_token"]})).status_code == 409
+    response = await async_client.post(f"/codes/{id}/complete", params = {"lease_token": fresh["lease_token"]})
+    assert response.status_code == 200, response.text
@@ -0,0 +1,248 @@
+# tests/test_rawdata.py
+# flake8: NOQA: E251 E123 W293
+import json
+
+import pytest
+from httpx import AsyncClient
+
+pytestmark = pytest.mark.asyncio
+
+
+async def create_name(async_client: AsyncClient, suffix: str) -> int:
+    """Создает Code и Name, возвращает id Name"""
+    code_data = {"code": f"test_raw_code_{suffix}", "url": f"http://example.com/raw_code_{suffix}",
+                 "status": "pending"}
+    code_id = (await async_client.post("/codes", json = code_data)).json()["id"]
+    name_data = {"code_id": code_id, "name": f"test_raw_name_{suffix}", "url": f"http://example.com/raw_name_{suffix}",
+                 "status": "pending"}
+    return (await async_client.post("/names", json = name_data)).json()["id"]
+
+
+async def test_rawdata_full_text_search(async_client: AsyncClient):
+    """Тест полнотекстового поиска по body_html"""
+    bodies = ["<html><body><p>Chateau Margaux vintage wine</p><script>var wine = 1;</script></body></html>",
+              "<html><body><div>Margaux red wine, Bordeaux</div></body></html>",
+              "<html><body><div>Nothing relevant here</div></body></html>"]
+    for i, body in enumerate(bodies):
+        name_id = await create_name(async_client, f"fts_{i}")
+        response = await async_client.post("/rawdata", json = {"name_id": name_id, "body_html": body})
+        assert response.status_code == 200, response.text
+
+    found = []
+    cursor = None
+    while True:
+        params = {"q": "margaux wine", "page_size": 1}
+        if cursor:
+            params["after"] = cursor
+        response = await async_client.get("/rawdata/fts", params = params)
+        assert response.status_code == 200, response.text
+        result = response.json()
+        found.extend(result["items"])
+        cursor = result["next_cursor"]
+        if not cursor:
+            break
+
+    assert len(found) == 2
+    # ранги не возрастают, в сниппете нет html разметки
+    assert found[0]["rank"] >= found[1]["rank"]
+    assert all("<div>" not in item["headline"] and "<b>" in item["headline"] for item in found)
+
+
+async def test_rawdata_fields_and_body(async_client: AsyncClient):
+    """Тест проекции fields, отложенной загрузки body_html в списках и потоковой выдачи тела"""
+    name_id = await create_name(async_client, "body")
+    body = "<html><body>" + "x" * 1000 + "</body></html>"
+    raw_id = (await async_client.post("/rawdata", json = {"name_id": name_id, "body_html": body})).json()["id"]
+
+    # в списке body_html не загружается
+    response = await async_client.get("/rawdata", params = {"after": "", "page_size": 100})
+    assert response.status_code == 200, response.text
+    assert all("body_html" not in item for item in response.json()["items"])
+
+    # fields - только запрошенные поля, body_html по явному запросу
+    response = await async_client.get("/rawdata", params = {"after": "", "page_size": 100, "fields": "id,body_html"})
+    assert response.status_code == 200, response.text
+    item = next(item for item in response.json()["items"] if item["id"] == raw_id)
+    assert item == {"id": raw_id, "body_html": body}
+
+    response = await async_client.get(f"/rawdata/{raw_id}", params = {"fields": "name_id"})
+    assert response.status_code == 200, response.text
+    assert response.json() == {"name_id": name_id}
+    assert response.headers["etag"]
+
+    response = await async_client.get("/rawdata", params = {"fields": "id,unknown"})
+    assert response.status_code == 400
+
+    response = await async_client.get(f"/rawdata/{raw_id}/body")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/html")
+    assert response.text == body
+
+    response = await async_client.get("/rawdata/999999999/body")
+    assert response.status_code == 404
+
+
+async def test_rawdata_include_in_name_list(async_client: AsyncClient):
+    """Тест include=raw_data: в списках Name body_html связи не загружается, в записи по id - загружается"""
+    name_id = await create_name(async_client, "include")
+    body = "<html><body>" + "y" * 1000 + "</body></html>"
+    raw_id = (await async_client.post("/rawdata", json = {"name_id": name_id, "body_html": body})).json()["id"]
+
+    params = {"query": "test_raw_name_include", "field": "name", "include": "raw_data"}
+    for extra in ({}, {"after": ""}, {"fields": "id,name"}):
+        response = await async_client.get("/names/search", params = {**params, **extra})
+        assert response.status_code == 200, response.text
+        item = next(item for item in response.json()["items"] if item["id"] == name_id)
+        assert item["raw_data"]["id"] == raw_id
+        assert "body_html" not in item["raw_data"]
+
+    response = await async_client.get(f"/names/{name_id}", params = {"include": "raw_data"})
+    assert response.status_code == 200, response.text
+    assert response.json()["raw_data"]["body_html"] == body
+
+
+async def test_rawdata_compression(async_client: AsyncClient, monkeypatch):
+    """Тест хранения body_html сжатым zstd: API принимает и отдает текст, тело можно получить сжатым"""
+    pytest.importorskip("zstandard")
+    from app.config import settings
+    monkeypatch.setattr(settings, "RAWDATA_COMPRESSION", True)
+    name_id = await create_name(async_client, "zstd")
+    body = "<html><body>" + "<p>compressed page</p>" * 200 + "</body></html>"
+    response = await async_client.post("/rawdata", json = {"name_id": name_id, "body_html": body})
+    assert response.status_code == 200, response.text
+    raw_id = response.json()["id"]
+    assert response.json()["body_html"] == body
+
+    response = await async_client.get(f"/rawdata/{raw_id}")
+    assert response.json()["body_html"] == body
+    response = await async_client.get(f"/names/{name_id}", params = {"include": "raw_data"})
+    assert response.json()["raw_data"]["body_html"] == body
+
+    response = await async_client.get(f"/rawdata/{raw_id}/body", headers = {"Accept-Encoding": "identity"})
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+    assert response.text == body
+
+    response = await async_client.get(f"/rawdata/{raw_id}/body", headers = {"Accept-Encoding": "zstd"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "zstd"
+
+    # полнотекстовый поиск находит сжатую запись, фрагмент - из распакованного текста
+    response = await async_client.get("/rawdata/fts", params = {"q": "compressed page", "page_size": 100})
+    assert response.status_code == 200, response.text
+    found = [item for item in response.json()["items"] if item["id"] == raw_id]
+    assert found and "<b>compressed</b>" in found[0]["headline"]
+    # поиск подстроки сжатые тела не видит - отклоняется
+    response = await async_client.get("/rawdata/search", params = {"query": "compressed", "field": "body_html"})
+    assert response.status_code == 400, response.text
+
+    # выгрузка отдает распакованный текст
+    response = await async_client.get("/rawdata/export", params = {"field": "id", "value": str(raw_id)})
+    assert response.status_code == 200, response.text
+    assert [json.loads(line)["body_html"] for line in response.text.splitlines()] == [body]
+
+
+async def test_rawdata_put_skips_unchanged(async_client: AsyncClient):
+    """Тест PUT по name_id: тот же body_html не перезаписывает запись"""
+    name_id = await create_name(async_client, "put")
+    since = "2000-01-01T00:00:00Z"
+    response = await async_client.put("/rawdata", json = {"name_id": name_id, "body_html": "<p>v1</p>"})
+    assert response.status_code == 200, response.text
+    first = response.json()
+    assert first["changed"] is True
+
+    response = await async_client.put("/rawdata", json = {"name_id": name_id, "body_html": "<p>v1</p>"})
+    second = response.json()
+    assert second["changed"] is False
+    assert second["data"]["updated_at"] == first["data"]["updated_at"]
+    assert second["data"]["body_hash"] == first["data"]["body_hash"]
+
+    response = await async_client.patch(f"/rawdata/{first['data']['id']}", json = {"body_html": "<p>v1</p>"})
+    assert response.status_code == 200, response.text
+    assert response.json()["changed"] is False
+
+    response = await async_client.put("/rawdata", json = {"name_id": name_id, "body_html": "<p>v2</p>"})
+    third = response.json()
+    assert third["changed"] is True
+    assert third["data"]["body_hash"] != first["data"]["body_hash"]
+    assert third["data"]["content_changed_at"] > first["data"]["content_changed_at"]
+
+    response = await async_client.get("/rawdata/changed", params = {"since": since, "page_size": 1000})
+    assert response.status_code == 200, response.text
+    assert name_id in [item["name_id"] for item in response.json()["items"]]
+    response = await async_client.get("/rawdata/changed", params = {"since": third["data"]["content_changed_at"]})
+    assert name_id not in [item["name_id"] for item in response.json()["items"]]
+
+
+async def test_rawdata_history(async_client: AsyncClient):
+    """Тест истории body_html: версии, восстановление версии и diff"""
+    name_id = await create_name(async_client, "history")
+    bodies = ["<html><body>" + "".join(f"<p>row {i}</p>" for i in range(50)) + "</body></html>"]
+    bodies.append(bodies[0].replace("<p>row 10</p>", "<p>row 10 changed</p>"))
+    bodies.append(bodies[1].replace("<p>row 20</p>", ""))
+    for body in bodies + [bodies[-1]]:
+        response = await async_client.put("/rawdata", json = {"name_id": name_id, "body_html": body})
+        assert response.status_code == 200, response.text
+
+    response = await async_client.get(f"/rawdata/history/{name_id}")
+    assert response.status_code == 200, response.text
+    versions = response.json()
+    # повтор того же содержимого версию не добавляет
+    assert [item["version"] for item in versions] == [1, 2, 3]
+    assert versions[0]["chain"] == 0
+
+    for version, body in enumerate(bodies, start = 1):
+        response = await async_client.get(f"/rawdata/history/{name_id}/{version}")
+        assert response.status_code == 200
+        assert response.text == body
+
+    response = await async_client.get(f"/rawdata/history/{name_id}/diff",
+                                      params = {"from_version": 1, "to_version": 3})
+    assert response.status_code == 200
+    assert "+<p>row 10 changed</p>" in response.text
+    assert "-<p>row 20</p>" in response.text
+
+    response = await async_client.get(f"/rawdata/history/{name_id}/99")
+    assert response.status_code == 404
+
+
+async def test_rawdata_archive(async_client: AsyncClient, test_db_session, test_mongo_url, test_mongo_db,
+                               monkeypatch):
+    """Тест холодного архива: старое тело переносится в Mongo и читается из архива прозрачно"""
+    from sqlalchemy import text
+    from app.config import settings
+    from app.databases.mongo import mongodb
+    await mongodb.connect(test_mongo_url, test_mongo_db)
+    monkeypatch.setattr(settings, "ARCHIVE_AFTER_DAYS", {"rawdata": 30})
+    name_id = await create_name(async_client, "archive")
+    body = "<html><body>" + "<p>cold page</p>" * 100 + "</body></html>"
+    raw_id = (await async_client.post("/rawdata", json = {"name_id": name_id, "body_html": body})).json()["id"]
+    await test_db_session.execute(text("UPDATE rawdata SET content_changed_at = now() - interval '60 days' "
+                                       "WHERE id = :id"), {"id": raw_id})
+    await test_db_session.commit()
+
+    response = await async_client.post("/rawdata/archive", params = {"limit": 1000})
+    assert response.status_code == 200, response.text
+    assert response.json()["archived"] >= 1
+    row = (await test_db_session.execute(text("SELECT body_html, archive_ref FROM rawdata WHERE id = :id"),
+                                         {"id": raw_id})).one()
+    assert row.body_html is None and row.archive_ref.startswith(f"rawdata:{raw_id}:")
+
+    response = await async_client.get(f"/rawdata/{raw_id}")
+    assert response.json()["body_html"] == body
+    assert response.json()["archived_at"] is not None
+    assert (await async_client.get(f"/rawdata/{raw_id}/body")).text == body
+    response = await async_client.get(f"/names/{name_id}", params = {"include": "raw_data"})
+    assert response.json()["raw_data"]["body_html"] == body
+
+    # новое содержимое снова хранится в postgres
+    response = await async_client.put("/rawdata", json = {"name_id": name_id, "body_html": "<p>fresh</p>"})
+    assert response.json()["changed"] is True
+    assert response.json()["data"]["archived_at"] is None
+
+    # документ старого переноса удаляет архиватор
+    from app.services.archive_service import ArchiveService
+    from app.services.postgres import RawService
+    assert await RawService.remove_archive_orphans(1000, test_db_session) >= 1
+    collection = await ArchiveService.get_collection()
+    assert await collection.find_one({"_id": row.archive_ref}) is None
@@ -0,0 +1,92 @@
+# tests/test_schema_upgrade.py
+# flake8: NOQA: E251 E123 W293
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import text
+
+from app.models.postgres import Base
+
+pytestmark = pytest.mark.asyncio
+
+
+async def get_columns(conn, table: str) -> set:
+    result = await conn.execute(text("SELECT column_name FROM information_schema.columns "
+                                     "WHERE table_schema = current_schema() AND table_name = :table"),
+                                {"table": table})
+    return set(result.scalars())
+
+
+async def get_indexes(conn, table: str) -> set:
+    result = await conn.execute(text("SELECT indexname FROM pg_indexes WHERE tablename = :table"), {"table": table})
+    return set(result.scalars())
+
+
+async def test_upgrade_queue_columns(async_client: AsyncClient, test_db_session):
+    """Тест create_all для таблицы, созданной до очереди: колонки аренды и индексы добавляются"""
+    engine = test_db_session.bind
+    async with engine.begin() as conn:
+        await conn.execute(text("ALTER TABLE codes DROP COLUMN lease_expires_at, DROP COLUMN lease_token"))
+        await conn.execute(text("DROP INDEX ix_codes_pending"))
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        assert {"lease_expires_at", "lease_token"} <= await get_columns(conn, "codes")
+        assert {"ix_codes_pending", "ix_codes_lease"} <= await get_indexes(conn, "codes")
+
+    code = {"code": "test_upgrade_queue", "url": "http://example.com/upgrade_queue", "status": "pending"}
+    assert (await async_client.post("/codes", json = code)).status_code == 200
+    claimed = (await async_client.post("/codes/claim", params = {"limit": 1000})).json()
+    assert all(item["lease_token"] for item in claimed)
+    for item in claimed:
+        await async_client.post(f"/codes/{item['id']}/fail", params = {"lease_token": item["lease_token"],
+                                                                       "retry": True})
+
+
+async def create_rawdata(async_client: AsyncClient, suffix: str, body_html: str) -> int:
+    code = {"code": f"test_upgrade_{suffix}", "url": f"http://example.com/upgrade_{suffix}", "status": "pending"}
+    code_id = (await async_client.post("/codes", json = code)).json()["id"]
+    name = {"code_id": code_id, "name": f"test_upgrade_{suffix}", "url": f"http://example.com/upgrade_name_{suffix}",
+            "status": "pending"}
+    name_id = (await async_client.post("/names", json = name)).json()["id"]
+    return (await async_client.post("/rawdata", json = {"name_id": name_id, "body_html": body_html})).json()["id"]
+
+
+async def test_upgrade_rawdata_body_tsv(async_client: AsyncClient, test_db_session):
+    """Тест create_all для rawdata с вычисляемой body_tsv и без нее: обычная колонка, заполнена, поиск работает"""
+    engine = test_db_session.bind
+    rawdata_id = await create_rawdata(async_client, "tsv", "<html><body><p>Upgraded quokka page</p></body></html>")
+    generated = "body_tsv tsvector GENERATED ALWAYS AS (to_tsvector('simple', coalesce(body_html, ''))) STORED"
+    for column in (generated, None):
+        async with engine.begin() as conn:
+            await conn.execute(text("ALTER TABLE rawdata DROP COLUMN body_tsv"))
+            if column:
+                await conn.execute(text(f"ALTER TABLE rawdata ADD COLUMN {column}"))
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            result = await conn.execute(text("SELECT is_generated FROM information_schema.columns "
+                                             "WHERE table_schema = current_schema() AND table_name = 'rawdata' "
+                                             "AND column_name = 'body_tsv'"))
+            assert result.scalar() == "NEVER"
+            assert "ix_rawdata_body_tsv" in await get_indexes(conn, "rawdata")
+        response = await async_client.get("/rawdata/fts", params = {"q": "quokka", "page_size": 100})
+        assert response.status_code == 200, response.text
+        assert rawdata_id in [item["id"] for item in response.json()["items"]]
+
+
+async def test_upgrade_rawdata_body_hash(async_client: AsyncClient, test_db_session):
+    """Тест create_all для rawdata без body_hash и content_changed_at: хеш как у приложения, PUT без изменений"""
+    engine = test_db_session.bind
+    body_html = "<p>Привет, upgraded hash</p>"
+    rawdata_id = await create_rawdata(async_client, "hash", body_html)
+    before = (await async_client.get(f"/rawdata/{rawdata_id}")).json()
+    async with engine.begin() as conn:
+        await conn.execute(text("ALTER TABLE rawdata DROP COLUMN body_hash, DROP COLUMN content_changed_at"))
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        assert "ix_rawdata_content_changed" in await get_indexes(conn, "rawdata")
+
+    after = (await async_client.get(f"/rawdata/{rawdata_id}")).json()
+    assert after["body_hash"] == before["body_hash"]
+    assert after["content_changed_at"] == after["updated_at"]
+    response = await async_client.put("/rawdata", json = {"name_id": after["name_id"], "body_html": body_html})
+    assert response.status_code == 200, response.text
+    assert response.json()["changed"] is False
@@ -0,0 +1,51 @@
+# tests/test_statements.py
+# flake8: NOQA: E251 E123 W293
+from collections import OrderedDict
+
+import pytest
+from httpx import AsyncClient
+
+from app.config import settings
+from app.repositories.base import Repository
+
+pytestmark = pytest.mark.asyncio
+
+
+def get_by_id_statements() -> dict:
+    return {key: stmt for key, stmt in Repository._statements.items() if 'get_by_id' in key}
+
+
+async def test_statement_cache_reuse(async_client: AsyncClient, monkeypatch):
+    """Тест кэша statement репозитория: повторный запрос - тот же statement, другие fields / include - другой"""
+    monkeypatch.setattr(Repository, "_statements", OrderedDict())
+    code = {"code": "test_statement_cache", "url": "http://example.com/statement_cache", "status": "pending"}
+    code_id = (await async_client.post("/codes", json = code)).json()["id"]
+
+    assert (await async_client.get(f"/codes/{code_id}", params = {"fields": "code"})).status_code == 200
+    first = get_by_id_statements()
+    assert len(first) == 1
+    await async_client.get(f"/codes/{code_id}", params = {"fields": "code"})
+    second = get_by_id_statements()
+    assert second.keys() == first.keys()
+    assert all(second[key] is first[key] for key in first)
+
+    await async_client.get(f"/codes/{code_id}", params = {"fields": "url"})
+    await async_client.get(f"/codes/{code_id}", params = {"fields": "code", "include": "names"})
+    statements = get_by_id_statements()
+    assert len(statements) == 3
+    assert len({id(stmt) for stmt in statements.values()}) == 3
+
+
+async def test_statement_cache_bounded(async_client: AsyncClient, monkeypatch):
+    """Тест кэша statement репозитория: число ключей ограничено, вытесняются давно не использованные"""
+    monkeypatch.setattr(Repository, "_statements", OrderedDict())
+    monkeypatch.setattr(settings, "REPOSITORY_STATEMENT_CACHE_SIZE", 2)
+    code = {"code": "test_statement_bounded", "url": "http://example.com/statement_bounded", "status": "pending"}
+    code_id = (await async_client.post("/codes", json = code)).json()["id"]
+
+    for fields in ("code", "url", "status", "code"):
+        response = await async_client.get(f"/codes/{code_id}", params = {"fields": fields})
+        assert response.status_code == 200, response.text
+        assert len(Repository._statements) <= 2
+    # последний запрос (fields=code) собран заново и остался в кэше вместе с предыдущим
+    assert len(get_by_id_statements()) == 2